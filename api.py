@@ -2,49 +2,103 @@
 Optional FastAPI backend for programmatic integration (MVP).
 
 Endpoints:
+- POST /datasets (upload once, returns a dataset_id usable by every endpoint below)
+- DELETE /datasets/{dataset_id}
 - POST /profile
 - POST /suggestions
-- POST /clean
+- POST /clean (output=csv|parquet|arrow streams the whole cleaned dataset)
 - POST /charts/hist
 - POST /charts/corr
+- POST /jobs, GET /jobs/{job_id}, GET /jobs/{job_id}/result (queued batch cleans, utils.jobs)
+- GET /audit/stats (audit queue depth and dropped/spilled counters)
 
 Security: Bearer token or JWT; roles via X-Role header (admin/editor/viewer).
-Audit: logs to logs/audit.log and optional SQLite store.
+Audit: logs to logs/audit.log and optional SQLite store, written in batches by a
+background thread (utils.audit_writer) so handlers never wait on audit I/O.
+Responses: JSON via a NumPy-aware encoder (NaN/inf -> null); /profile and /charts/*
+answer with an Arrow IPC stream for Accept: application/vnd.apache.arrow.stream.
+Execution: parsing and pandas work run in a bounded worker pool (utils.executor);
+saturated endpoints answer 429/503 and slow ones 504 instead of stalling the loop.
+Databases: one pooled engine per connection URL, results read in chunks through
+server-side cursors (utils.db_stream).
 """
 
 import os
 import json
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import hashlib
+import functools
+import tempfile
+import uuid
+from typing import Dict, Any, Optional
 
+import numpy as np
 import pandas as pd
-from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Depends, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 
-from utils.data_analyzer import DataAnalyzer
-from utils.data_cleaner import DataCleaner
-from utils.db_io import read_from_database
-from utils.audit import write_audit
+from utils.cleaning_plan import compile_plan, execute_plan
+from utils.compaction import CompactionReport, compact_on_load, memory_report, stored_memory_report
+from utils.profile import get_profile
+from utils.histogram import get_histograms, BINNING_METHODS
+from utils.dataset_cache import DatasetCache
+from utils.executor import WorkerPool, PoolBusyError, PoolTimeoutError
+from utils.jobs import JobQueue, supported_upload
+from utils.serialization import FastJSONResponse, arrow_response, histogram_table, matrix_table, profile_frame, wants_arrow
+from utils.db_stream import dispose_engines, read_from_database
+from utils.audit_writer import get_audit_writer
+from utils.ingest import read_csv_fast, read_columnar, iter_export, COLUMNAR_EXTENSIONS, STREAM_FORMATS
 
 try:
     import jwt  # PyJWT
 except Exception:
     jwt = None
 
-# Optional DB persistence for audit
-try:
-    from utils.audit_store import write_audit_db
-except Exception:
-    def write_audit_db(*args, **kwargs):
-        return None
-
 API_TOKEN = os.getenv("DATA_CLEANER_API_TOKEN", "")
 JWT_SECRET = os.getenv("DATA_CLEANER_JWT_SECRET", "")
 JWT_ALG = os.getenv("DATA_CLEANER_JWT_ALG", "HS256")
+# Longest X-Clean-Log header on streamed /clean responses; later entries are dropped
+CLEAN_LOG_HEADER_BYTES = int(os.getenv("DATA_CLEANER_CLEAN_LOG_HEADER_BYTES", "4096"))
 
 app = FastAPI(title="AI Data Cleaning Assistant API", version="0.2.0")
 
+# Ingested datasets: memory-budgeted LRU with Parquet spill and idle TTL
+DATASETS = DatasetCache(
+    max_bytes=int(float(os.getenv("DATA_CLEANER_API_STORE_MB", "2048")) * 1024 * 1024),
+    spill_dir=os.getenv("DATA_CLEANER_API_STORE_DIR") or os.path.join(tempfile.gettempdir(), "data_cleaner_api"),
+    ttl_seconds=float(os.getenv("DATA_CLEANER_API_STORE_TTL", "3600")),
+)
+
+# Blocking pandas work runs here, never on the event loop
+POOL = WorkerPool.from_env()
+
+# Long-running cleans: persistent SQLite queue drained by local worker threads
+JOBS = JobQueue.from_env()
+
+
+@app.exception_handler(PoolBusyError)
+async def _pool_busy_handler(request: Request, exc: PoolBusyError):
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.exception_handler(PoolTimeoutError)
+async def _pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+
+
+@app.on_event("startup")
+def _start_jobs():
+    JOBS.start()
+
+
+@app.on_event("shutdown")
+def _shutdown_pool():
+    JOBS.stop()
+    POOL.shutdown()
+    dispose_engines()
+    get_audit_writer().close()
+
 # CORS
 origins = os.getenv("DATA_CLEANER_CORS_ORIGINS", "http://localhost, http://localhost:5173, http://127.0.0.1:5173").split(",")
 app.add_middleware(
@@ -85,11 +139,8 @@ def require_auth(authorization: Optional[str] = Header(None)):
 
 
 def audit_log(user_role: str, action: str, details: Dict[str, Any]):
-    write_audit(user_role, action, details)
-    try:
-        write_audit_db(user_role, action, details)
-    except Exception:
-        pass
+    # Queued; file and optional SQLite writes happen on the audit writer thread
+    get_audit_writer().submit(user_role, action, details)
 
 
 def _load_dataframe(
@@ -97,42 +148,180 @@ def _load_dataframe(
     connection_url: Optional[str],
     table: Optional[str],
     query: Optional[str],
+    dataset_id: Optional[str] = None,
 ) -> pd.DataFrame:
+    if dataset_id:
+        df = DATASETS.get(dataset_id)
+        if df is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired dataset_id")
+        return df
+    # Fresh loads are dtype-compacted once here; cached datasets already are
     if file is not None:
         if file.filename.endswith(".csv"):
-            return pd.read_csv(file.file)
+            return compact_on_load(read_csv_fast(file.file))
         elif file.filename.endswith((".xlsx", ".xls")):
-            return pd.read_excel(file.file)
+            return compact_on_load(pd.read_excel(file.file))
         elif file.filename.endswith(".json"):
-            return pd.read_json(file.file)
+            return compact_on_load(pd.read_json(file.file))
+        elif file.filename.rsplit(".", 1)[-1].lower() in COLUMNAR_EXTENSIONS:
+            return compact_on_load(read_columnar(file.file, file.filename.rsplit(".", 1)[-1]))
         else:
             raise HTTPException(status_code=400, detail="Unsupported file format")
     if connection_url:
-        return read_from_database(connection_url, table=table, query=query)
-    raise HTTPException(status_code=400, detail="Provide a file or database connection")
+        return compact_on_load(read_from_database(connection_url, table=table, query=query))
+    raise HTTPException(status_code=400, detail="Provide a dataset_id, a file or a database connection")
+
+
+async def _dataframe_for(
+    file: Optional[UploadFile],
+    connection_url: Optional[str],
+    table: Optional[str],
+    query: Optional[str],
+    dataset_id: Optional[str] = None,
+) -> pd.DataFrame:
+    # Upload handles cannot be pickled, so parsing runs on the thread side of the pool;
+    # stored datasets may be reloaded from their Parquet spill, so they go there too
+    return await POOL.run("ingest", _load_dataframe, file, connection_url, table, query, dataset_id, in_thread=True)
+
+
+def _stored(dataset_id: Optional[str]) -> bool:
+    """Work on a stored dataset runs on threads: its cached profile and
+    histograms live on the frame object in this process, and a worker process
+    would get a pickled copy (and rebuild them on every call)."""
+    return bool(dataset_id)
+
+
+# --- Pool tasks: module-level so they can be shipped to worker processes ---
+
+def _profile_task(df: pd.DataFrame, memory: Optional[CompactionReport] = None) -> Dict[str, Any]:
+    result = get_profile(df, with_analyzer=True).to_dict()
+    # Reports are attached to the frame object, which does not survive the trip to a worker process
+    result["memory"] = (memory or memory_report(df)).to_dict()
+    return result
+
+
+def _suggestions_task(df: pd.DataFrame) -> Dict[str, Any]:
+    return get_profile(df, with_analyzer=True).suggestions_copy()
+
+
+def _clean_frame_task(df: pd.DataFrame):
+    sugs = get_profile(df, with_analyzer=True).suggestions_copy()
+    # Requests already run in parallel in the API pool; keep per-request work on threads
+    result = execute_plan(df, compile_plan(df, sugs), parallel="thread")
+    cleaned = result.df
+    return cleaned, {
+        "rows_in": int(df.shape[0]),
+        "rows": int(cleaned.shape[0]),
+        "cols": int(cleaned.shape[1]),
+        "log": result.log,
+        "plan": result.report_frame().to_dict(orient="records"),
+    }
+
+
+def _clean_task(df: pd.DataFrame) -> Dict[str, Any]:
+    cleaned, summary = _clean_frame_task(df)
+    return {**summary, "head": cleaned.head(10).to_dict(orient="records")}
+
+
+def _clean_headers(summary: Dict[str, Any]) -> Dict[str, str]:
+    """Counts and log of a streamed clean as response headers (ASCII JSON, size-capped)."""
+    log = list(summary["log"])
+    headers = {
+        "X-Clean-Rows-In": str(summary["rows_in"]),
+        "X-Clean-Rows": str(summary["rows"]),
+        "X-Clean-Cols": str(summary["cols"]),
+        "X-Clean-Log-Entries": str(len(log)),
+    }
+    encoded = json.dumps(log)
+    while len(encoded) > CLEAN_LOG_HEADER_BYTES and log:
+        log.pop()
+        encoded = json.dumps(log)
+        headers["X-Clean-Log-Truncated"] = "true"
+    headers["X-Clean-Log"] = encoded
+    return headers
+
+
+def _hist_task(df: pd.DataFrame, columns: Optional[str], bins: int, binning: str = "fixed") -> Dict[str, Any]:
+    cols = [c.strip() for c in columns.split(",") if c.strip() in df.columns] if columns else None
+    # Arrays stay NumPy: the response encoders write them without boxing every value
+    return {c: {"counts": h.counts, "bin_edges": h.edges} for c, h in get_histograms(df, cols, bins, binning).items()}
+
+
+def _corr_task(df: pd.DataFrame) -> Dict[str, Any]:
+    num = df.select_dtypes(include=['number'])
+    if num.shape[1] < 2:
+        return {"columns": num.columns.tolist(), "matrix": np.empty((0, 0))}
+    corr = num.corr(numeric_only=True)
+    return {"columns": corr.columns.tolist(), "matrix": corr.to_numpy()}
+
+
+def _upload_digest(file: UploadFile) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(file.filename.encode("utf-8"))
+    for block in iter(lambda: file.file.read(1024 * 1024), b""):
+        h.update(block)
+    file.file.seek(0)
+    return "ds_" + h.hexdigest()
+
+
+@app.post("/datasets")
+async def create_dataset(
+    auth=Depends(require_auth),
+    role: str = Header("viewer", alias="X-Role"),
+    file: Optional[UploadFile] = File(None),
+    connection_url: Optional[str] = Form(None),
+    table: Optional[str] = Form(None),
+    query: Optional[str] = Form(None),
+):
+    # Files are keyed by content so re-posting the same upload is free; DB loads get a fresh id
+    if file is not None:
+        dataset_id = await POOL.run("ingest", _upload_digest, file, in_thread=True)
+    else:
+        dataset_id = "ds_" + uuid.uuid4().hex
+    # Simultaneous uploads of one file parse it once; inserting may spill older entries to Parquet
+    loader = functools.partial(_load_dataframe, file, connection_url, table, query)
+    df = await POOL.run("ingest", DATASETS.get_or_load, dataset_id, loader, in_thread=True)
+    await POOL.run("ingest", DATASETS.purge_expired, in_thread=True)
+    audit_log(role, "create_dataset", {"rows": int(df.shape[0]), "cols": int(df.shape[1])})
+    return JSONResponse({
+        "dataset_id": dataset_id,
+        "rows": int(df.shape[0]),
+        "cols": int(df.shape[1]),
+        "ttl_seconds": DATASETS.ttl_seconds,
+    })
+
+
+@app.delete("/datasets/{dataset_id}")
+async def delete_dataset(
+    dataset_id: str,
+    auth=Depends(require_auth),
+    role: str = Header("editor", alias="X-Role"),
+):
+    if not await POOL.run("ingest", DATASETS.invalidate, dataset_id, in_thread=True):
+        raise HTTPException(status_code=404, detail="Unknown or expired dataset_id")
+    audit_log(role, "delete_dataset", {"dataset_id": dataset_id})
+    return JSONResponse({"deleted": dataset_id})
 
 
 @app.post("/profile")
 async def profile(
     auth=Depends(require_auth),
     role: str = Header("viewer", alias="X-Role"),
+    accept: Optional[str] = Header(None),
     file: Optional[UploadFile] = File(None),
     connection_url: Optional[str] = Form(None),
     table: Optional[str] = Form(None),
     query: Optional[str] = Form(None),
+    dataset_id: Optional[str] = Form(None),
 ):
-    df = _load_dataframe(file, connection_url, table, query)
-    analyzer = DataAnalyzer(df)
-    profile_json = {
-        "shape": list(df.shape),
-        "dtypes": {c: str(t) for c, t in df.dtypes.items()},
-        "missing_total": int(df.isnull().sum().sum()),
-        "duplicates": int(df.duplicated().sum()),
-        "cardinality": {c: int(df[c].nunique()) for c in df.columns},
-        "quality_score": analyzer.get_data_quality_score(),
-    }
+    df = await _dataframe_for(file, connection_url, table, query, dataset_id)
+    profile_json = await POOL.run("profile", _profile_task, df, stored_memory_report(df), in_thread=_stored(dataset_id))
     audit_log(role, "profile", {"cols": df.shape[1], "rows": df.shape[0]})
-    return JSONResponse(profile_json)
+    if wants_arrow(accept):
+        summary = {k: v for k, v in profile_json.items()
+                   if k not in ("dtypes", "missing", "cardinality", "numeric_stats", "outliers")}
+        return arrow_response(profile_frame(profile_json), {"profile": summary})
+    return FastJSONResponse(profile_json)
 
 
 @app.post("/suggestions")
@@ -143,12 +332,12 @@ async def suggestions(
     connection_url: Optional[str] = Form(None),
     table: Optional[str] = Form(None),
     query: Optional[str] = Form(None),
+    dataset_id: Optional[str] = Form(None),
 ):
-    df = _load_dataframe(file, connection_url, table, query)
-    analyzer = DataAnalyzer(df)
-    sugs = analyzer.generate_suggestions()
+    df = await _dataframe_for(file, connection_url, table, query, dataset_id)
+    sugs = await POOL.run("suggestions", _suggestions_task, df, in_thread=_stored(dataset_id))
     audit_log(role, "suggestions", {"count": len(sugs)})
-    return JSONResponse(sugs)
+    return FastJSONResponse(sugs)
 
 
 @app.post("/clean")
@@ -159,86 +348,139 @@ async def clean(
     connection_url: Optional[str] = Form(None),
     table: Optional[str] = Form(None),
     query: Optional[str] = Form(None),
+    dataset_id: Optional[str] = Form(None),
+    output: str = Form("json"),  # json (summary + head) | csv | parquet | arrow (full cleaned data)
 ):
-    df = _load_dataframe(file, connection_url, table, query)
-    analyzer = DataAnalyzer(df)
-    sugs = analyzer.generate_suggestions()
-    cleaner = DataCleaner(df)
-    for key, suggestion in sugs.items():
-        t = suggestion.get("type")
-        col = suggestion.get("column")
-        if t == "missing_numeric":
-            cleaner.fill_missing_numeric(col)
-        elif t == "missing_categorical":
-            cleaner.fill_missing_categorical(col)
-        elif t == "duplicates":
-            cleaner.remove_duplicates()
-        elif t == "outliers":
-            cleaner.remove_outliers(col)
-        elif t == "data_type":
-            cleaner.convert_data_type(col)
-        elif t == "whitespace":
-            cleaner.trim_whitespace([col])
-        elif t == "text_case":
-            cleaner.standardize_text_case([col])
-        elif t == "datetime_parse":
-            cleaner.parse_datetime(col)
-        elif t == "constant_column":
-            cleaner.remove_columns([col])
-        elif t == "boolean_text":
-            cleaner.convert_boolean_text(col)
-        elif t == "percentage_string":
-            cleaner.convert_percentage_strings(col)
-    audit_log(role, "clean", {"ops": len(cleaner.get_cleaning_log())})
-    cleaned = cleaner.get_cleaned_data()
-    return JSONResponse({
-        "rows": int(cleaned.shape[0]),
-        "cols": int(cleaned.shape[1]),
-        "log": cleaner.get_cleaning_log(),
-        "head": cleaned.head(10).to_dict(orient="records"),
-    })
+    if output != "json" and output not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"output must be json or one of {', '.join(STREAM_FORMATS)}")
+    df = await _dataframe_for(file, connection_url, table, query, dataset_id)
+    if output == "json":
+        result = await POOL.run("clean", _clean_task, df, in_thread=_stored(dataset_id))
+        audit_log(role, "clean", {"ops": len(result["log"])})
+        return FastJSONResponse(result)
+
+    # Thread side: the cleaned frame stays in this process and is encoded slice by slice
+    cleaned, summary = await POOL.run("clean", _clean_frame_task, df, in_thread=True)
+    audit_log(role, "clean", {"ops": len(summary["log"]), "output": output})
+    ext, media_type = STREAM_FORMATS[output]
+    headers = _clean_headers(summary)
+    headers["Content-Disposition"] = f'attachment; filename="cleaned.{ext}"'
+    # Parquet and Arrow also carry the full log in their schema metadata
+    metadata = {"data_cleaner": json.dumps(summary)}
+    return StreamingResponse(iterate_in_threadpool(iter_export(cleaned, output, metadata=metadata)),
+                             media_type=media_type, headers=headers)
 
 
 @app.post("/charts/hist")
 async def charts_hist(
     auth=Depends(require_auth),
     role: str = Header("viewer", alias="X-Role"),
+    accept: Optional[str] = Header(None),
     file: Optional[UploadFile] = File(None),
     connection_url: Optional[str] = Form(None),
     table: Optional[str] = Form(None),
     query: Optional[str] = Form(None),
     columns: Optional[str] = Form(None),  # comma-separated
     bins: int = Form(30),
+    binning: str = Form("fixed"),  # fixed | quantile | fd
+    dataset_id: Optional[str] = Form(None),
 ):
-    df = _load_dataframe(file, connection_url, table, query)
-    cols = [c.strip() for c in (columns.split(",") if columns else df.select_dtypes(include=["number"]).columns.tolist()) if c.strip() in df.columns]
-    result: Dict[str, Any] = {}
-    for c in cols:
-        try:
-            s = pd.to_numeric(df[c], errors='coerce').dropna()
-            if s.empty:
-                continue
-            counts, edges = pd.np.histogram(s, bins=bins)  # pandas bundles numpy
-            result[c] = {"counts": counts.tolist(), "bin_edges": edges.tolist()}
-        except Exception:
-            continue
+    if binning not in BINNING_METHODS:
+        raise HTTPException(status_code=400, detail=f"binning must be one of {', '.join(BINNING_METHODS)}")
+    df = await _dataframe_for(file, connection_url, table, query, dataset_id)
+    # Thread pool: histograms are cached on the stored frame, which lives in this process
+    result = await POOL.run("charts", _hist_task, df, columns, bins, binning, in_thread=True)
     audit_log(role, "charts_hist", {"cols": len(result)})
-    return JSONResponse(result)
+    if wants_arrow(accept):
+        return arrow_response(histogram_table(result), {"binning": binning, "bins": bins})
+    return FastJSONResponse(result)
 
 
 @app.post("/charts/corr")
 async def charts_corr(
     auth=Depends(require_auth),
     role: str = Header("viewer", alias="X-Role"),
+    accept: Optional[str] = Header(None),
     file: Optional[UploadFile] = File(None),
     connection_url: Optional[str] = Form(None),
     table: Optional[str] = Form(None),
     query: Optional[str] = Form(None),
+    dataset_id: Optional[str] = Form(None),
 ):
-    df = _load_dataframe(file, connection_url, table, query)
-    num = df.select_dtypes(include=['number'])
-    if num.shape[1] < 2:
-        return JSONResponse({"columns": num.columns.tolist(), "matrix": []})
-    corr = num.corr(numeric_only=True)
-    audit_log(role, "charts_corr", {"cols": int(num.shape[1])})
-    return JSONResponse({"columns": corr.columns.tolist(), "matrix": corr.values.tolist()})
+    df = await _dataframe_for(file, connection_url, table, query, dataset_id)
+    result = await POOL.run("charts", _corr_task, df, in_thread=_stored(dataset_id))
+    if result["matrix"].size:
+        audit_log(role, "charts_corr", {"cols": len(result["columns"])})
+    if wants_arrow(accept):
+        return arrow_response(matrix_table(result["columns"], result["matrix"]))
+    return FastJSONResponse(result)
+
+
+@app.post("/jobs")
+async def submit_job(
+    auth=Depends(require_auth),
+    role: str = Header("editor", alias="X-Role"),
+    file: Optional[UploadFile] = File(None),
+    connection_url: Optional[str] = Form(None),
+    table: Optional[str] = Form(None),
+    query: Optional[str] = Form(None),
+    dataset_id: Optional[str] = Form(None),
+):
+    # Only the input is persisted here; loading and cleaning happen on the job workers
+    if dataset_id:
+        df = await _dataframe_for(None, None, None, None, dataset_id)
+        job = await POOL.run("jobs", JOBS.submit_frame, df, dataset_id, in_thread=True)
+    elif file is not None:
+        if not supported_upload(file.filename):
+            raise HTTPException(status_code=400, detail="Unsupported file format")
+        job = await POOL.run("jobs", JOBS.submit_file, file.file, file.filename, in_thread=True)
+    elif connection_url:
+        job = JOBS.submit_database(connection_url, table, query)
+    else:
+        raise HTTPException(status_code=400, detail="Provide a dataset_id, a file or a database connection")
+    audit_log(role, "submit_job", {"job_id": job.id, "source": job.source["kind"]})
+    return JSONResponse({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result",
+    }, status_code=202)
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(
+    job_id: str,
+    auth=Depends(require_auth),
+    role: str = Header("viewer", alias="X-Role"),
+):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+    return JSONResponse(job.to_dict())
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(
+    job_id: str,
+    auth=Depends(require_auth),
+    role: str = Header("viewer", alias="X-Role"),
+):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+    if job.status != "done":
+        detail = job.error if job.status == "failed" else f"Job is {job.status}"
+        raise HTTPException(status_code=409, detail=detail)
+    path = JOBS.result_path(job_id)
+    if path is None:
+        raise HTTPException(status_code=410, detail="Result no longer available")
+    audit_log(role, "job_result", {"job_id": job_id})
+    return FileResponse(path, media_type="application/vnd.apache.parquet", filename=f"{job_id}.parquet")
+
+
+@app.get("/audit/stats")
+async def audit_stats(
+    auth=Depends(require_auth),
+    role: str = Header("viewer", alias="X-Role"),
+):
+    return JSONResponse(get_audit_writer().stats())
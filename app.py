@@ -18,11 +18,10 @@ warnings.filterwarnings('ignore')
 
 # Import custom utilities
 from utils.data_analyzer import DataAnalyzer
-from utils.data_cleaner import DataCleaner
 from utils.ai_assistant import AIAssistant
 # Guard DB import so app can run without sqlalchemy installed
 try:
-    from utils.db_io import read_from_database  # type: ignore
+    from utils.db_stream import read_from_database  # type: ignore
     _DB_AVAILABLE = True
 except Exception:
     read_from_database = None  # type: ignore
@@ -32,7 +31,18 @@ from utils.recipe_export import to_python as recipe_to_python, to_sql as recipe_
 from plugins.registry import get_rules
 from plugins.registry import get_db_connectors
 from utils.diff_ops import create_manual_edit_ops
-from utils.audit import save_ui_auth, load_ui_auth, write_audit
+from utils.ingest import read_csv_fast, read_columnar, export_dataframe, COLUMNAR_EXTENSIONS, EXPORT_FORMATS
+from utils.profile import frame_cached, get_profile
+from utils.incremental_profile import update_profile
+from utils.history import HistoryManager
+from utils.histogram import get_histograms, BINNING_METHODS
+from utils.cleaning_plan import compile_plan, execute_plan
+from utils.compaction import compact_on_load, editable, memory_report
+from utils.missingness import get_missingness
+from utils.near_dedup import get_near_duplicates
+from utils.dataset_cache import get_dataset_cache, content_key, query_key, frame_key
+from utils.audit import save_ui_auth, load_ui_auth
+from utils.audit_writer import audit_event
 
 # Try to import streamlit-aggrid for spreadsheet features
 try:
@@ -229,11 +239,18 @@ if 'edited_df' not in st.session_state:
     st.session_state.edited_df = None
 if 'cleaning_log' not in st.session_state:
     st.session_state.cleaning_log = []
-# Undo/redo stacks for Safe Preview & Undo
+# Undo/redo timeline for Safe Preview & Undo (delta-based, memory-bounded)
 if 'history' not in st.session_state:
-    st.session_state.history = []  # stack of prior dataframes
-if 'future' not in st.session_state:
-    st.session_state.future = []
+    st.session_state.history = None
+
+
+def get_history():
+    """Return the session's undo/redo timeline, restarting it when a new dataset is loaded."""
+    history = st.session_state.history
+    if history is None or history.base is not st.session_state.df_original:
+        history = HistoryManager(st.session_state.df_original)
+        st.session_state.history = history
+    return history
 
 
 def load_data(uploaded_file):
@@ -242,11 +259,15 @@ def load_data(uploaded_file):
         file_extension = uploaded_file.name.split('.')[-1].lower()
         
         if file_extension == 'csv':
-            df = pd.read_csv(uploaded_file)
+            progress_bar = st.progress(0.0, text="Parsing CSV...")
+            df = read_csv_fast(uploaded_file, progress=lambda frac: progress_bar.progress(frac, text=f"Parsing CSV... {frac:.0%}"))
+            progress_bar.empty()
         elif file_extension in ['xlsx', 'xls']:
             df = pd.read_excel(uploaded_file)
         elif file_extension == 'json':
             df = pd.read_json(uploaded_file)
+        elif file_extension in COLUMNAR_EXTENSIONS:
+            df = read_columnar(uploaded_file, file_extension)
         else:
             st.error(f"Unsupported file format: {file_extension}")
             return None
@@ -261,18 +282,18 @@ def display_data_overview(df):
     """Display comprehensive data overview with AI insights."""
     st.markdown('<p class="sub-header">Data Overview & AI Insights</p>', unsafe_allow_html=True)
     
-    # Create analyzer instance for AI features
-    analyzer = DataAnalyzer(df)
+    # Shared single-pass profile (cached per dataset object)
+    profile = get_profile(df, with_analyzer=True)
     
     # AI Natural Language Summary
     st.markdown("### AI Summary")
-    summary = analyzer.generate_natural_language_summary()
+    summary = profile.summary
     st.markdown(f'<div class="info-box">{summary}</div>', unsafe_allow_html=True)
     
     st.markdown("---")
     
     # Quality Score Badge
-    quality_score = analyzer.get_data_quality_score()
+    quality_score = profile.quality_score
     score_color = "#28a745" if quality_score >= 90 else "#ffc107" if quality_score >= 70 else "#dc3545"
     st.markdown(
         f'<div style="text-align: center; margin: 1rem 0;">'
@@ -289,17 +310,17 @@ def display_data_overview(df):
     with col2:
         st.metric("Total Columns", df.shape[1], help="Number of features/variables")
     with col3:
-        missing_pct = (df.isnull().sum().sum() / (df.shape[0] * df.shape[1]) * 100)
+        missing_pct = profile.missing_pct
         delta_color = "inverse" if missing_pct > 0 else "normal"
         st.metric("Missing Data", f"{missing_pct:.2f}%", delta=None, delta_color=delta_color, help="Percentage of missing values")
     with col4:
-        duplicate_count = df.duplicated().sum()
+        duplicate_count = profile.duplicates
         st.metric("Duplicates", duplicate_count, delta=None, delta_color="inverse" if duplicate_count > 0 else "normal", help="Number of duplicate rows")
     
     st.markdown("---")
     
     # Pattern Detection
-    patterns = analyzer.detect_patterns()
+    patterns = profile.patterns
     if patterns:
         st.markdown("### Data Patterns Detected")
         pattern_cols = st.columns(len(patterns) if len(patterns) <= 4 else 4)
@@ -317,27 +338,36 @@ def display_data_overview(df):
     
     # Column information in expandable section
     with st.expander("**Detailed Column Information**", expanded=False):
-        col_info = analyzer.get_column_info()
+        col_info = profile.column_info
         st.dataframe(col_info, use_container_width=True)
         
         # Column-specific suggestions
         st.markdown("#### Column-Specific Recommendations")
         selected_col = st.selectbox("Select a column for smart suggestions:", df.columns.tolist())
         if selected_col:
-            col_suggestions = analyzer.suggest_column_operations(selected_col)
+            col_suggestions = DataAnalyzer(df).suggest_column_operations(selected_col)
             if col_suggestions:
                 for sug in col_suggestions:
                     st.markdown(f"- {sug}")
             else:
                 st.success(f"Column '{selected_col}' looks good!")
+    
+    # Per-column memory before/after the load-time dtype compaction
+    with st.expander("**Memory Usage by Column**", expanded=False):
+        report = memory_report(df)
+        mb = 1024 * 1024
+        mcol1, mcol2, mcol3 = st.columns(3)
+        mcol1.metric("Before Compaction", f"{report.before_bytes / mb:.2f} MB")
+        mcol2.metric("After Compaction", f"{report.after_bytes / mb:.2f} MB")
+        mcol3.metric("Reduction", f"{report.ratio:.1f}x")
+        st.dataframe(report.to_frame(), use_container_width=True)
 
 
 def display_ai_suggestions(df):
     """Display AI-powered cleaning suggestions with enhanced UX."""
     st.markdown('<p class="sub-header">AI-Powered Cleaning Suggestions</p>', unsafe_allow_html=True)
     
-    analyzer = DataAnalyzer(df)
-    suggestions = analyzer.generate_suggestions()
+    suggestions = get_profile(df, with_analyzer=True).suggestions_copy()
 
     # Merge plugin rules
     try:
@@ -378,7 +408,7 @@ def display_ai_suggestions(df):
         sug_type = sug.get('type')
         if sug_type == 'duplicates':
             critical_suggestions[key] = sug
-        elif sug_type in ['missing_numeric', 'missing_categorical']:
+        elif sug_type in ['missing_numeric', 'missing_categorical', 'near_duplicates']:
             moderate_suggestions[key] = sug
         else:
             minor_suggestions[key] = sug
@@ -405,6 +435,8 @@ def display_ai_suggestions(df):
                 st.markdown(f"**Recommendation:** {suggestion['action']}")
                 if 'details' in suggestion:
                     st.info(suggestion['details'])
+                if suggestion.get('type') == 'near_duplicates':
+                    display_near_duplicate_clusters(df, suggestion)
     
     if minor_suggestions:
         st.markdown("### Minor Issues (Low Priority)")
@@ -418,81 +450,50 @@ def display_ai_suggestions(df):
     return suggestions
 
 
+def display_near_duplicate_clusters(df, suggestion):
+    """Let the user review near-duplicate clusters on the full dataset before merging."""
+    if not st.checkbox("Review near-duplicate clusters", key="review_near_duplicates"):
+        return
+    with st.spinner("Clustering near-duplicate rows..."):
+        result = get_near_duplicates(df, suggestion.get('columns'), suggestion.get('threshold'))
+    st.caption(result.summary())
+    if result.n_clusters == 0:
+        st.info("No near-duplicate clusters on the full dataset.")
+        return
+    st.dataframe(result.review_frame(df).head(1000), use_container_width=True)
+    # Row removal is opt-in: without this the cleaning plan skips the suggestion
+    suggestion['confirmed'] = st.checkbox(
+        "Merge these clusters when applying suggestions (keeps the first row of each)",
+        key="confirm_near_duplicates",
+    )
+
+
 def apply_cleaning(df, suggestions):
     """Apply all cleaning suggestions to the dataset."""
     try:
-        cleaner = DataCleaner(df.copy())
-        
         # Progress bar
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        total_steps = len(suggestions)
+        def on_progress(done, total, stage_name):
+            status_text.text(f"Applying: {stage_name}...")
+            progress_bar.progress(done / max(total, 1))
         
-        for idx, (key, suggestion) in enumerate(suggestions.items()):
-            status_text.text(f"Applying: {key}...")
-            
-            action_type = suggestion.get('type')
-            
-            if action_type == 'missing_numeric':
-                column = suggestion['column']
-                cleaner.fill_missing_numeric(column, method='mean')
-            
-            elif action_type == 'missing_categorical':
-                column = suggestion['column']
-                cleaner.fill_missing_categorical(column)
-            
-            elif action_type == 'duplicates':
-                cleaner.remove_duplicates()
-            
-            elif action_type == 'outliers':
-                column = suggestion['column']
-                cleaner.remove_outliers(column)
-            
-            elif action_type == 'data_type':
-                column = suggestion['column']
-                target_type = suggestion.get('target_type', 'numeric')
-                cleaner.convert_data_type(column, target_type)
-                # Optimize: if became float but has no fraction, use Int64
-                cleaner.convert_float_to_int_if_possible(column)
-
-            elif action_type == 'whitespace':
-                column = suggestion['column']
-                cleaner.trim_whitespace([column])
-
-            elif action_type == 'text_case':
-                column = suggestion['column']
-                cleaner.standardize_text_case([column], case='lower')
-
-            elif action_type == 'datetime_parse':
-                column = suggestion['column']
-                cleaner.parse_datetime(column)
-
-            elif action_type == 'constant_column':
-                column = suggestion['column']
-                cleaner.remove_columns([column])
-
-            elif action_type == 'boolean_text':
-                column = suggestion['column']
-                cleaner.convert_boolean_text(column)
-
-            elif action_type == 'percentage_string':
-                column = suggestion['column']
-                cleaner.convert_percentage_strings(column)
-            
-            progress_bar.progress((idx + 1) / max(total_steps, 1))
+        # Suggestions are compiled into grouped/fused stages rather than run one by one
+        plan = compile_plan(df, suggestions)
+        result = execute_plan(df, plan, progress=on_progress)
         
         # Save log to session for user review
-        st.session_state.cleaning_log = cleaner.get_cleaning_log()
+        st.session_state.cleaning_log = result.log
         # Save operations for recipe export
-        if hasattr(cleaner, 'get_operations'):
-            st.session_state.last_operations = cleaner.get_operations()
+        st.session_state.last_operations = result.operations
+        st.session_state.last_plan_report = result.report_frame()
 
         status_text.text("All cleaning operations completed!")
         progress_bar.empty()
         status_text.empty()
         
-        return cleaner.df
+        return result.df
     
     except Exception as e:
         st.error(f"Error during cleaning: {str(e)}")
@@ -506,20 +507,31 @@ def display_visualizations(df, title="Data Visualizations"):
     tab1, tab2, tab3, tab4 = st.tabs(["Missing Values", "Column Distributions", "Data Types", "Correlation"])
     
     with tab1:
-        # Missing values heatmap
+        # Missing values heatmap (rows binned into buckets; cell = null fraction)
         st.markdown("#### Missing Values Heatmap")
-        missing_data = df.isnull()
+        missingness = get_missingness(df)
         
-        if missing_data.sum().sum() > 0:
+        if missingness.total_missing > 0:
             fig, ax = plt.subplots(figsize=(12, 6))
-            sns.heatmap(missing_data, cbar=True, cmap='YlOrRd', ax=ax)
-            plt.title("Missing Values Pattern")
+            sns.heatmap(missingness.to_frame(), cbar=True, cmap='YlOrRd', vmin=0, vmax=1, ax=ax)
+            ax.set_ylabel('Row range')
+            plt.title("Missing Values Pattern (fraction missing per row bucket)")
             plt.tight_layout()
             st.pyplot(fig)
             
+            # Null co-occurrence between columns that have missing values
+            nullity_corr = missingness.nullity_correlation()
+            if nullity_corr.shape[0] >= 2:
+                st.markdown("#### Missing Values Co-occurrence")
+                fig, ax = plt.subplots(figsize=(8, 6))
+                sns.heatmap(nullity_corr, cmap='coolwarm', vmin=-1, vmax=1, center=0, ax=ax)
+                ax.set_title('Nullity Correlation')
+                plt.tight_layout()
+                st.pyplot(fig)
+            
             # Missing values bar chart
             st.markdown("#### Missing Values by Column")
-            missing_counts = df.isnull().sum()
+            missing_counts = pd.Series(missingness.null_counts, index=missingness.columns)
             missing_counts = missing_counts[missing_counts > 0].sort_values(ascending=False)
             
             if len(missing_counts) > 0:
@@ -542,6 +554,8 @@ def display_visualizations(df, title="Data Visualizations"):
         
         if numeric_cols:
             selected_col = st.selectbox("Select a numeric column:", numeric_cols)
+            binning = st.radio("Binning:", BINNING_METHODS, horizontal=True,
+                               format_func=lambda m: {"fixed": "Equal width", "quantile": "Quantile", "fd": "Freedman-Diaconis"}[m])
             
             if selected_col:
                 col1, col2 = st.columns(2)
@@ -549,9 +563,13 @@ def display_visualizations(df, title="Data Visualizations"):
                 with col1:
                     # Histogram
                     fig, ax = plt.subplots(figsize=(8, 6))
-                    df[selected_col].hist(bins=30, ax=ax, color='skyblue', edgecolor='black')
+                    hist = get_histograms(df, numeric_cols, 30, binning).get(str(selected_col))
+                    if hist is not None:
+                        # Unequal-width quantile bins are only comparable as densities
+                        heights = hist.counts / np.diff(hist.edges) if binning == "quantile" else hist.counts
+                        ax.stairs(heights, hist.edges, fill=True, color='skyblue', edgecolor='black')
                     ax.set_xlabel(selected_col)
-                    ax.set_ylabel('Frequency')
+                    ax.set_ylabel('Density' if binning == "quantile" else 'Frequency')
                     ax.set_title(f'Distribution of {selected_col}')
                     plt.tight_layout()
                     st.pyplot(fig)
@@ -605,18 +623,35 @@ def display_visualizations(df, title="Data Visualizations"):
             st.info("Not enough numeric columns to compute correlations.")
 
 
+def _export_bytes(df, fmt, codec=None):
+    """``df`` serialized as ``fmt``, built once per frame object, format and codec.
+
+    Streamlit reruns the script on every interaction; the cached bytes are
+    reused until the frame is replaced (and dropped when it is collected).
+    """
+    def build():
+        if fmt == "csv":
+            return df.to_csv(index=False).encode('utf-8')
+        if fmt == "xlsx":
+            buffer = BytesIO()
+            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+                df.to_excel(writer, index=False, sheet_name='Cleaned Data')
+            return buffer.getvalue()
+        return export_dataframe(df, fmt, codec)
+    return frame_cached(df, ("export", fmt, codec), build)
+
+
 def export_data(df, filename="cleaned_data"):
     """Provide export options for cleaned data."""
     st.markdown('<p class="sub-header">Export Cleaned Data</p>', unsafe_allow_html=True)
     
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         # Export as CSV
-        csv = df.to_csv(index=False).encode('utf-8')
         st.download_button(
             label="Download as CSV",
-            data=csv,
+            data=_export_bytes(df, "csv"),
             file_name=f"{filename}.csv",
             mime="text/csv",
             use_container_width=True
@@ -624,17 +659,29 @@ def export_data(df, filename="cleaned_data"):
     
     with col2:
         # Export as Excel
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Cleaned Data')
-        
         st.download_button(
             label="Download as Excel",
-            data=buffer.getvalue(),
+            data=_export_bytes(df, "xlsx"),
             file_name=f"{filename}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             use_container_width=True
         )
+    
+    with col3:
+        # Export as a columnar format (keeps dtypes, no Excel row cap)
+        fmt = st.selectbox("Columnar format", list(EXPORT_FORMATS.keys()), format_func=lambda f: f.capitalize())
+        ext, mime, codecs = EXPORT_FORMATS[fmt]
+        codec = st.selectbox("Compression", codecs, key=f"export_codec_{fmt}")
+        try:
+            st.download_button(
+                label=f"Download as {fmt.capitalize()}",
+                data=_export_bytes(df, fmt, codec),
+                file_name=f"{filename}.{ext}",
+                mime=mime,
+                use_container_width=True
+            )
+        except ImportError as e:
+            st.warning(str(e))
 
 
 def display_ai_chatbot(df):
@@ -769,8 +816,7 @@ def display_ai_chatbot(df):
         quick_cols = st.columns(3)
         with quick_cols[0]:
             if st.button("Dataset Summary", use_container_width=True):
-                analyzer = DataAnalyzer(df)
-                summary = analyzer.generate_natural_language_summary()
+                summary = get_profile(df, with_analyzer=True).summary
                 st.session_state.chat_history.append({"role": "user", "content": "Give me a dataset summary"})
                 st.session_state.chat_history.append({"role": "assistant", "content": summary})
                 st.rerun()
@@ -805,7 +851,7 @@ def display_spreadsheet_editor(df):
         st.warning("Install streamlit-aggrid for enhanced spreadsheet features: `pip install streamlit-aggrid`")
         st.markdown("### Basic Data Editor")
         edited_df = st.data_editor(
-            df,
+            editable(df),  # category columns would only offer their existing values
             use_container_width=True,
             num_rows="dynamic",  # Allow adding/deleting rows
             height=500
@@ -816,7 +862,8 @@ def display_spreadsheet_editor(df):
     # Advanced AgGrid editor
     st.markdown("### Interactive Spreadsheet (Click cells to edit)")
     
-    gb = GridOptionsBuilder.from_dataframe(df)
+    grid_df = editable(df)
+    gb = GridOptionsBuilder.from_dataframe(grid_df)
     gb.configure_default_column(editable=True, groupable=True)
     gb.configure_selection(selection_mode="multiple", use_checkbox=True)
     gb.configure_pagination(paginationAutoPageSize=True)
@@ -825,7 +872,7 @@ def display_spreadsheet_editor(df):
     gridOptions = gb.build()
     
     grid_response = AgGrid(
-        df,
+        grid_df,
         gridOptions=gridOptions,
         update_mode=GridUpdateMode.MODEL_CHANGED,
         data_return_mode=DataReturnMode.FILTERED_AND_SORTED,
@@ -862,6 +909,11 @@ def display_spreadsheet_editor(df):
     
     with col3:
         if st.button("Save Changes"):
+            # Derive the saved frame's profile from the edited cells instead of rebuilding it
+            try:
+                update_profile(df, edited_df, create_manual_edit_ops(df, edited_df))
+            except Exception as e:
+                st.caption(f"Profile will be rebuilt: {e}")
             st.session_state.df_cleaned = edited_df
             st.success("Changes saved to cleaned dataset!")
     
@@ -914,8 +966,8 @@ def main():
 
         uploaded_file = st.file_uploader(
             "Choose a file",
-            type=['csv', 'xlsx', 'xls', 'json'],
-            help="Supported formats: CSV, Excel, JSON (up to 500MB)"
+            type=['csv', 'xlsx', 'xls', 'json'] + list(COLUMNAR_EXTENSIONS.keys()),
+            help="Supported formats: CSV, Excel, JSON, Parquet, Feather, Arrow IPC (up to 500MB)"
         )
 
         # Database loader (MVP)
@@ -927,6 +979,7 @@ def main():
             db_table = st.text_input("Table name (optional if using query)")
             db_query = st.text_area("Custom SQL query (optional)")
             db_limit = st.number_input("Limit (optional)", min_value=0, value=0, step=1000, help="0 = no limit")
+            db_use_cache = st.checkbox("Reuse cached result for this query", value=True)
             # Plugin connectors render here
             connectors = get_db_connectors()
             if connectors:
@@ -936,9 +989,13 @@ def main():
                         try:
                             df_plugin = c["render"]()
                             if df_plugin is not None:
-                                st.session_state.df_original = df_plugin
-                                st.session_state.df_cleaned = df_plugin.copy()
-                                st.session_state.cleaning_applied = False
+                                # Connectors re-render on every rerun; only swap data in when it changed
+                                plugin_key = frame_key(df_plugin)
+                                if st.session_state.get('dataset_key') != plugin_key:
+                                    st.session_state.df_original = get_dataset_cache().put(plugin_key, compact_on_load(df_plugin))
+                                    st.session_state.df_cleaned = st.session_state.df_original.copy()
+                                    st.session_state.cleaning_applied = False
+                                    st.session_state.dataset_key = plugin_key
                                 st.success(f"Loaded {df_plugin.shape[0]:,} rows x {df_plugin.shape[1]} cols via {c['name']}")
                         except Exception as e:
                             st.error(f"Connector '{c['name']}' error: {e}")
@@ -949,19 +1006,28 @@ def main():
                     st.error("Please enter a connection URL")
                 else:
                     try:
+                        limit = None if db_limit == 0 else int(db_limit)
+                        db_key = query_key(db_url, db_table or None, db_query or None, limit)
+                        cache = get_dataset_cache()
+                        if not db_use_cache:
+                            cache.invalidate(db_key)
+                        db_status = st.empty()
                         with st.spinner("Querying database..."):
-                            df_db = read_from_database(
+                            df_db = cache.get_or_load(db_key, lambda: compact_on_load(read_from_database(
                                 connection_url=db_url,
                                 table=db_table or None,
                                 query=db_query or None,
-                                limit=None if db_limit == 0 else int(db_limit)
-                            )
+                                limit=limit,
+                                progress=lambda rows: db_status.caption(f"Fetched {rows:,} rows..."),
+                            )))
+                        db_status.empty()
                         st.session_state.df_original = df_db
                         st.session_state.df_cleaned = df_db.copy()
                         st.session_state.cleaning_applied = False
+                        st.session_state.dataset_key = db_key
                         st.success(f"Loaded {df_db.shape[0]:,} rows x {df_db.shape[1]} cols from database")
                         auth = st.session_state.get('ui_auth', {"enabled": False, "role": "viewer"})
-                        write_audit(auth.get("role", "viewer"), "load_db", {"rows": int(df_db.shape[0]), "cols": int(df_db.shape[1])})
+                        audit_event(auth.get("role", "viewer"), "load_db", {"rows": int(df_db.shape[0]), "cols": int(df_db.shape[1])})
                     except Exception as e:
                         st.error(f"DB load failed: {e}")
 
@@ -1005,13 +1071,16 @@ def main():
         # Load data
         if st.session_state.df_original is None:
             with st.spinner("Loading your dataset..."):
-                st.session_state.df_original = load_data(uploaded_file)
+                # Shared cache keyed by file content: re-uploads skip parsing entirely
+                upload_key = content_key(uploaded_file.getvalue())
+                st.session_state.df_original = get_dataset_cache().get_or_load(upload_key, lambda: compact_on_load(load_data(uploaded_file)))
                 st.session_state.df_cleaned = st.session_state.df_original.copy()
                 st.session_state.cleaning_applied = False
+                st.session_state.dataset_key = upload_key
                 # Audit file upload
                 try:
                     auth = st.session_state.get('ui_auth', {"enabled": False, "role": "viewer"})
-                    write_audit(auth.get("role", "viewer"), "upload_file", {"name": getattr(uploaded_file, 'name', 'unknown'), "rows": int(st.session_state.df_original.shape[0]), "cols": int(st.session_state.df_original.shape[1])})
+                    audit_event(auth.get("role", "viewer"), "upload_file", {"name": getattr(uploaded_file, 'name', 'unknown'), "rows": int(st.session_state.df_original.shape[0]), "cols": int(st.session_state.df_original.shape[1])})
                 except Exception:
                     pass
                 
@@ -1054,13 +1123,10 @@ def main():
                         c1, c2 = st.columns(2)
                         with c1:
                             if st.button("Commit Preview", type="primary"):
-                                # push current cleaned/original onto history for undo
-                                base_df = st.session_state.df_cleaned if st.session_state.cleaning_applied else st.session_state.df_original
-                                st.session_state.history.append(base_df.copy())
+                                # record the preview as the next undoable state (clears redo)
+                                get_history().commit(st.session_state._preview_df)
                                 st.session_state.df_cleaned = st.session_state._preview_df
                                 st.session_state.cleaning_applied = True
-                                # keep last ops for recipe export if available
-                                st.session_state.future = []  # clear redo stack
                                 del st.session_state._preview_df
                                 st.success("Changes committed. You can Undo/Redo below.")
                         with c2:
@@ -1073,47 +1139,40 @@ def main():
                     with col2:
                         if st.button("Apply All Suggestions", use_container_width=True, type="primary"):
                             with st.spinner("Applying cleaning operations..."):
-                                # push original to history for undo
-                                st.session_state.history.append(st.session_state.df_original.copy())
                                 st.session_state.df_cleaned = apply_cleaning(
                                     st.session_state.df_original,
                                     suggestions
                                 )
+                                # record the result as the next undoable state (clears redo)
+                                get_history().commit(st.session_state.df_cleaned)
                                 st.session_state.cleaning_applied = True
                                 # after apply, capture operations from cleaner via a side channel
                                 # apply_cleaning uses a local cleaner; expose ops via session_state
                                 # We will store last_operations inside apply_cleaning via session update below
-                                st.session_state.future = []
                                 auth = st.session_state.get('ui_auth', {"enabled": False, "role": "editor"})
-                                write_audit(auth.get("role", "editor"), "apply_cleaning", {"ops": len(st.session_state.get('cleaning_log', []))})
+                                audit_event(auth.get("role", "editor"), "apply_cleaning", {"ops": len(st.session_state.get('cleaning_log', []))})
                             st.balloons()
                             st.success("All cleaning operations completed successfully!")
 
                 # Undo/Redo controls
-                if st.session_state.cleaning_applied or st.session_state.history:
+                history = get_history()
+                if st.session_state.cleaning_applied or history.can_undo():
                     ucol1, ucol2, ucol3 = st.columns(3)
                     with ucol1:
-                        if st.button("Undo") and st.session_state.history:
-                            current = st.session_state.df_cleaned if st.session_state.cleaning_applied else st.session_state.df_original
-                            st.session_state.future.append(current.copy())
-                            prev = st.session_state.history.pop()
-                            st.session_state.df_cleaned = prev
+                        if st.button("Undo") and history.can_undo():
+                            st.session_state.df_cleaned = history.undo()
                             st.session_state.cleaning_applied = True
                             st.success("Undone last change.")
                     with ucol2:
-                        if st.button("Redo") and st.session_state.future:
-                            current = st.session_state.df_cleaned
-                            st.session_state.history.append(current.copy())
-                            nxt = st.session_state.future.pop()
-                            st.session_state.df_cleaned = nxt
+                        if st.button("Redo") and history.can_redo():
+                            st.session_state.df_cleaned = history.redo()
                             st.session_state.cleaning_applied = True
                             st.success("Redone last change.")
                     with ucol3:
                         if st.button("Reset to Original"):
-                            st.session_state.history.append((st.session_state.df_cleaned if st.session_state.cleaning_applied else st.session_state.df_original).copy())
+                            history.commit(st.session_state.df_original)
                             st.session_state.df_cleaned = st.session_state.df_original.copy()
                             st.session_state.cleaning_applied = False
-                            st.session_state.future = []
                             st.success("Reset complete.")
                 
                 # Show cleaned data if cleaning was applied
@@ -1126,15 +1185,17 @@ def main():
                     
                     with col1:
                         st.markdown("**Before Cleaning:**")
-                        before_missing = st.session_state.df_original.isnull().sum().sum()
-                        before_dupes = st.session_state.df_original.duplicated().sum()
+                        before_profile = get_profile(st.session_state.df_original)
+                        before_missing = before_profile.missing_total
+                        before_dupes = before_profile.duplicates
                         st.metric("Missing Values", before_missing)
                         st.metric("Duplicates", before_dupes)
                     
                     with col2:
                         st.markdown("**After Cleaning:**")
-                        after_missing = st.session_state.df_cleaned.isnull().sum().sum()
-                        after_dupes = st.session_state.df_cleaned.duplicated().sum()
+                        after_profile = get_profile(st.session_state.df_cleaned)
+                        after_missing = after_profile.missing_total
+                        after_dupes = after_profile.duplicates
                         st.metric("Missing Values", after_missing, delta=-(before_missing - after_missing))
                         st.metric("Duplicates", after_dupes, delta=-(before_dupes - after_dupes))
                     
@@ -1157,15 +1218,20 @@ def main():
                         else:
                             st.info("No cleaning operations recorded.")
                     
+                    plan_report = st.session_state.get('last_plan_report')
+                    if plan_report is not None and not plan_report.empty:
+                        with st.expander("Execution Plan (estimated vs actual cost)"):
+                            st.dataframe(plan_report, use_container_width=True)
+                    
                     # Export options
                     st.markdown("---")
                     export_data(st.session_state.df_cleaned, filename="cleaned_data")
 
                     # Executive PDF report
                     with st.expander("Executive PDF Summary"):
-                        analyzer = DataAnalyzer(st.session_state.df_original)
-                        summary = analyzer.generate_natural_language_summary()
-                        quality = analyzer.get_data_quality_score()
+                        original_profile = get_profile(st.session_state.df_original, with_analyzer=True)
+                        summary = original_profile.summary
+                        quality = original_profile.quality_score
                         pdf_bytes = generate_executive_pdf(
                             df_original=st.session_state.df_original,
                             df_cleaned=st.session_state.df_cleaned,
@@ -1198,7 +1264,7 @@ def main():
                                         f.write(py_script)
                                     # Audit recipe save
                                     auth = st.session_state.get('ui_auth', {"enabled": False, "role": "editor"})
-                                    write_audit(auth.get("role", "editor"), "save_recipe", {"path": save_path, "ops": len(ops)})
+                                    audit_event(auth.get("role", "editor"), "save_recipe", {"path": save_path, "ops": len(ops)})
                                     st.success(f"Saved recipe to {save_path}")
                                 except Exception as e:
                                     st.error(f"Failed to save recipe: {e}")
@@ -1256,6 +1322,7 @@ def main():
                 - CSV (`.csv`) - up to 500MB
                 - Excel (`.xlsx`, `.xls`) - up to 500MB  
                 - JSON (`.json`) - up to 500MB
+                - Parquet / Feather / Arrow IPC (`.parquet`, `.feather`, `.arrow`)
                 
                 ---
                 
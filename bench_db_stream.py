@@ -0,0 +1,94 @@
+"""
+Benchmark: database loads (utils.db_stream)
+
+Builds a local SQLite file and compares, per load:
+
+- fresh engine: ``create_engine`` + ``pd.read_sql`` on every call (the old path)
+- pooled: ``read_from_database`` over the cached engine, chunked, pandas chunks
+- pooled + Arrow: the same with chunks converted through Arrow
+
+and the cost of many small queries (engine setup vs a pooled connection).
+
+Usage: python bench_db_stream.py [rows]   (default 1000000)
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from utils import db_stream
+
+
+def print_section(title):
+    """Print a formatted section header"""
+    print("\n" + "="*60)
+    print(f"  {title}")
+    print("="*60)
+
+
+def timed(func, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def fresh_read(url, query):
+    engine = create_engine(url)
+    try:
+        return pd.read_sql(query, engine)
+    finally:
+        engine.dispose()
+
+
+def build_database(path, n):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "id": np.arange(n),
+        "customer": [f"customer_{i % 50000}" for i in range(n)],
+        "amount": rng.normal(100, 25, n).round(2),
+        "quantity": rng.integers(1, 20, n),
+        "region": rng.choice(["north", "south", "east", "west"], n),
+    })
+    frame.loc[: n // 4, "amount"] = np.nan  # leading chunks all NULL
+    with sqlite3.connect(path) as conn:
+        frame.to_sql("orders", conn, index=False, chunksize=100_000)
+        pd.DataFrame({"region": ["north", "south", "east", "west"]}).to_sql("regions", conn, index=False)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    build_database(path, n)
+    url = f"sqlite:///{path}"
+    query = "SELECT * FROM orders"
+
+    print_section(f"full load: {n:,} rows x 5 cols")
+    base, df = timed(lambda: fresh_read(url, query))
+    print(f"{'fresh engine':<18}{base:>8.2f}s  amount dtype={df['amount'].dtype}")
+    for label, arrow in (("pooled", False), ("pooled + Arrow", True)):
+        seconds, df = timed(lambda: db_stream.read_from_database(url, query=query, arrow=arrow))
+        print(f"{label:<18}{seconds:>8.2f}s  amount dtype={df['amount'].dtype}  {base / seconds:.1f}x")
+
+    small = "SELECT * FROM regions"
+    k = 200
+    print_section(f"{k} small queries")
+    seconds, _ = timed(lambda: [fresh_read(url, small) for _ in range(k)], repeat=1)
+    print(f"{'fresh engine':<18}{seconds / k * 1000:>8.2f} ms/query")
+    pooled, _ = timed(lambda: [db_stream.read_from_database(url, query=small) for _ in range(k)], repeat=1)
+    print(f"{'pooled':<18}{pooled / k * 1000:>8.2f} ms/query  {seconds / pooled:.1f}x")
+    print(db_stream.pool_status())
+    db_stream.dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
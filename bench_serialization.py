@@ -0,0 +1,87 @@
+"""
+Benchmark: API response serialization (utils.serialization)
+
+Encodes a correlation matrix and a set of histograms three ways and reports
+time and payload size:
+
+- default: ``tolist()`` + Starlette's JSONResponse (stdlib json)
+- fast JSON: ``utils.serialization.dumps`` on the NumPy arrays
+- Arrow: the IPC stream served for ``Accept: application/vnd.apache.arrow.stream``
+
+Usage: python bench_serialization.py [columns]   (default 500)
+"""
+
+import json
+import sys
+import time
+
+import numpy as np
+
+from utils import serialization
+
+
+def print_section(title):
+    """Print a formatted section header"""
+    print("\n" + "="*60)
+    print(f"  {title}")
+    print("="*60)
+
+
+def timed(func, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def stdlib_json(payload):
+    # What JSONResponse.render does
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def run(name, default, fast, arrow):
+    print_section(name)
+    print(f"{'encoder':<12}{'seconds':>10}{'bytes':>14}{'speedup':>9}")
+    base, payload = timed(default)
+    rows = [("default", base, len(payload))]
+    for label, func in (("fast JSON", fast), ("Arrow", arrow)):
+        seconds, payload = timed(func)
+        rows.append((label, seconds, len(payload)))
+    for label, seconds, size in rows:
+        print(f"{label:<12}{seconds:>9.4f}s{size:>14,}{base / seconds:>8.1f}x")
+
+
+def main():
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rng = np.random.default_rng(0)
+    columns = [f"col_{i}" for i in range(k)]
+    data = rng.normal(size=(2000, k))
+    matrix = np.corrcoef(data, rowvar=False)
+    matrix[0, 1:] = matrix[1:, 0] = np.nan  # a constant column correlates as NaN
+
+    def default_corr():
+        # The stdlib encoder rejects NaN, so the old path had to replace it first
+        values = np.where(np.isfinite(matrix), matrix, None).tolist()
+        return stdlib_json({"columns": columns, "matrix": values})
+
+    run(f"correlation matrix: {k} x {k}",
+        default_corr,
+        lambda: serialization.dumps({"columns": columns, "matrix": matrix}),
+        lambda: serialization.arrow_response(serialization.matrix_table(columns, matrix)).body)
+
+    hists = {}
+    for i, c in enumerate(columns):
+        counts, edges = np.histogram(data[:, i], bins=30)
+        hists[c] = {"counts": counts, "bin_edges": edges}
+    run(f"histograms: {k} columns x 30 bins",
+        lambda: stdlib_json({c: {"counts": h["counts"].tolist(), "bin_edges": h["bin_edges"].tolist()}
+                             for c, h in hists.items()}),
+        lambda: serialization.dumps(hists),
+        lambda: serialization.arrow_response(serialization.histogram_table(hists)).body)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: per-row string cleaning vs distinct-value execution (utils.text_ops)
+
+Runs each string op on a low-cardinality column (a few dozen statuses/regions)
+and a high-cardinality column (mostly unique ids), once with plain per-row
+pandas string methods and once on the distinct values through
+``text_ops.map_unique`` (how the cleaning plan's fused stages run), and checks
+both give the same result.
+
+Usage: python bench_text_ops.py [rows]   (default 2,000,000)
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import text_ops
+
+
+def print_section(title):
+    """Print a formatted section header"""
+    print("\n" + "="*60)
+    print(f"  {title}")
+    print("="*60)
+
+
+def make_columns(rows):
+    rng = np.random.default_rng(42)
+    statuses = [f"{pad}{word}{pad}" for word in ["Active", "inactive", "PENDING", "Closed", "yes", "No"]
+                for pad in ["", " "]]
+    percents = [f"{p}%" for p in range(0, 100, 5)]
+    low = {
+        "text": pd.Series(rng.choice(statuses, rows)),
+        "boolean": pd.Series(rng.choice(["yes", "No", " YES", "no ", "true", "False"], rows)),
+        "percent": pd.Series(rng.choice(percents, rows)),
+    }
+    high = {
+        "text": pd.Series([f" id-{i:x} " for i in rng.integers(0, rows * 4, rows)]),
+        "boolean": pd.Series(rng.choice(["yes", "No", " YES", "no ", "true", "False"], rows)),
+        "percent": pd.Series([f"{v:.3f}%" for v in rng.random(rows) * 100]),
+    }
+    return {"low cardinality": low, "high cardinality": high}
+
+
+def per_row_boolean(s):
+    tokens = s.str.strip().str.lower()
+    out = pd.Series(pd.NA, index=s.index, dtype="boolean")
+    out[tokens.isin(text_ops.TRUE_TOKENS).to_numpy()] = True
+    out[tokens.isin(text_ops.FALSE_TOKENS).to_numpy()] = False
+    return out
+
+
+def per_row_percent(s):
+    return pd.to_numeric(s.str.strip().str.rstrip("%").str.strip(), errors="coerce") / 100.0
+
+
+CASES = [
+    ("trim_whitespace", "text", lambda s: s.str.strip()),
+    ("standardize_case", "text", lambda s: s.str.lower()),
+    ("convert_boolean_text", "boolean", per_row_boolean),
+    ("convert_percentage_strings", "percent", per_row_percent),
+]
+
+
+def timed(func, values, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(values)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def same(a, b):
+    if isinstance(a, pd.Series):
+        return a.reset_index(drop=True).astype(object).fillna(-1).equals(b.reset_index(drop=True).astype(object).fillna(-1))
+    return a == b
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    for label, columns in make_columns(rows).items():
+        for dtype in ("object", "str"):
+            print_section(f"{label}, {dtype} dtype: {rows:,} rows")
+            print(f"{'op':<28}{'distinct':>10}{'per-row':>10}{'unique':>10}{'speedup':>9}")
+            for name, kind, op in CASES:
+                run_case(name, columns[kind].astype(dtype), op)
+
+
+def run_case(name, values, op):
+    base, expected = timed(op, values)
+    fast, got = timed(lambda s: text_ops.map_unique(s, op), values)
+    flag = "" if same(expected, got) else "  MISMATCH"
+    print(f"{name:<28}{values.nunique():>10,}{base:>9.3f}s{fast:>9.3f}s{base / fast:>8.1f}x{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,19 +6,32 @@ from __future__ import annotations
 
 import base64
 import io
+import os
+import tempfile
 import pandas as pd
 import numpy as np
 from dash import Dash, html, dcc, dash_table, Input, Output, State
 import plotly.express as px
 
-from utils.data_analyzer import DataAnalyzer
+from utils.profile import get_profile
+from utils.histogram import get_histograms
+from utils.dataset_cache import DatasetCache, content_key
+from utils.compaction import compact_on_load
+from utils.ingest import read_csv_fast, read_columnar, export_dataframe, COLUMNAR_EXTENSIONS, EXPORT_FORMATS
 
 
+# Parsed uploads live server-side; the browser Store only holds the opaque dataset id.
+# Evicted entries spill to Parquet and are reloaded on the next access.
+DATASETS = DatasetCache(
+    max_bytes=int(float(os.getenv("DATA_CLEANER_DASH_STORE_MB", "1024")) * 1024 * 1024),
+    spill_dir=os.getenv("DATA_CLEANER_DASH_STORE_DIR") or os.path.join(tempfile.gettempdir(), "data_cleaner_dash"),
+)
+
 app = Dash(__name__)
 app.title = "AI Data Cleaning Assistant (Dash)"
 
 app.layout = html.Div([
-    html.H2("AI Data Cleaning Assistant  Dash"),
+    html.H2("AI Data Cleaning Assistant – Dash"),
     dcc.Tabs(id="tabs", value="tab-upload", children=[
         dcc.Tab(label="Upload & Overview", value="tab-upload"),
         dcc.Tab(label="Suggestions", value="tab-suggest"),
@@ -31,13 +44,24 @@ app.layout = html.Div([
 def parse_contents(contents: str, filename: str) -> pd.DataFrame | None:
     content_type, content_string = contents.split(',')
     decoded = base64.b64decode(content_string)
+    return parse_bytes(decoded, filename)
+
+
+def parse_bytes(decoded: bytes, filename: str) -> pd.DataFrame | None:
+    return compact_on_load(_parse_bytes(decoded, filename))
+
+
+def _parse_bytes(decoded: bytes, filename: str) -> pd.DataFrame | None:
     try:
         if filename.lower().endswith('.csv'):
-            return pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+            return read_csv_fast(decoded)
         if filename.lower().endswith(('.xlsx', '.xls')):
             return pd.read_excel(io.BytesIO(decoded))
         if filename.lower().endswith('.json'):
             return pd.read_json(io.BytesIO(decoded))
+        ext = filename.lower().rsplit('.', 1)[-1]
+        if ext in COLUMNAR_EXTENSIONS:
+            return read_columnar(decoded, ext)
     except Exception:
         return None
     return None
@@ -53,6 +77,13 @@ upload_layout = html.Div([
     ),
     html.Div(id='upload-status'),
     html.Div(id='overview'),
+    html.Div([
+        dcc.Dropdown(id='export-format', options=[{'label': f.capitalize(), 'value': f} for f in EXPORT_FORMATS],
+                     value='parquet', clearable=False, style={'width': '200px'}),
+        dcc.Dropdown(id='export-codec', clearable=False, style={'width': '200px'}),
+        html.Button('Download', id='export-button'),
+        dcc.Download(id='export-download'),
+    ], style={'display': 'flex', 'gap': '10px', 'marginTop': '10px'}),
 ])
 
 suggestions_layout = html.Div([
@@ -80,10 +111,16 @@ def render_tab(tab):
     return html.Div()
 
 
-# Store df in dcc.Store
+# Store the server-side dataset id in dcc.Store
 app.layout.children.append(dcc.Store(id='df-store'))
 
 
+def get_dataset(dataset_id: str | None) -> pd.DataFrame | None:
+    if not dataset_id:
+        return None
+    return DATASETS.get(dataset_id)
+
+
 @app.callback(
     Output('upload-status', 'children'),
     Output('df-store', 'data'),
@@ -93,7 +130,9 @@ app.layout.children.append(dcc.Store(id='df-store'))
 def on_upload(contents, filename):
     if not contents:
         return "", None
-    df = parse_contents(contents, filename)
+    decoded = base64.b64decode(contents.split(',', 1)[1])
+    dataset_id = content_key(decoded)
+    df = DATASETS.get_or_load(dataset_id, lambda: parse_bytes(decoded, filename))
     if df is None or df.empty:
         return html.Div("Failed to read file."), None
     head = dash_table.DataTable(
@@ -102,25 +141,25 @@ def on_upload(contents, filename):
         style_table={'overflowX': 'auto'}
     )
     return html.Div([
-        html.Div(f"Loaded: {filename}  {df.shape[0]} rows x {df.shape[1]} cols"),
+        html.Div(f"Loaded: {filename} – {df.shape[0]} rows x {df.shape[1]} cols"),
         head
-    ]), df.to_json(date_format='iso', orient='split')
+    ]), dataset_id
 
 
 @app.callback(Output('overview', 'children'), Input('df-store', 'data'))
-def on_overview(df_json):
-    if not df_json:
+def on_overview(dataset_id):
+    df = get_dataset(dataset_id)
+    if df is None:
         return html.Div()
-    df = pd.read_json(df_json, orient='split')
-    analyzer = DataAnalyzer(df)
-    quality = analyzer.get_data_quality_score()
-    summary = analyzer.generate_natural_language_summary()
+    profile = get_profile(df, with_analyzer=True)
+    quality = profile.quality_score
+    summary = profile.summary
 
     metrics = html.Div([
         html.Div(f"Rows: {df.shape[0]:,}"),
         html.Div(f"Columns: {df.shape[1]}"),
-        html.Div(f"Missing: {int(df.isnull().sum().sum())}"),
-        html.Div(f"Duplicates: {int(df.duplicated().sum())}"),
+        html.Div(f"Missing: {profile.missing_total}"),
+        html.Div(f"Duplicates: {profile.duplicates}"),
         html.Div(f"Quality: {quality}/100"),
     ], style={'display': 'grid', 'gridTemplateColumns': 'repeat(5, 1fr)', 'gap': '10px', 'marginTop': '10px'})
 
@@ -133,12 +172,11 @@ def on_overview(df_json):
 
 
 @app.callback(Output('suggestions-view', 'children'), Input('df-store', 'data'))
-def on_suggestions(df_json):
-    if not df_json:
+def on_suggestions(dataset_id):
+    df = get_dataset(dataset_id)
+    if df is None:
         return html.Div("Upload data to see suggestions.")
-    df = pd.read_json(df_json, orient='split')
-    analyzer = DataAnalyzer(df)
-    sugs = analyzer.generate_suggestions()
+    sugs = get_profile(df, with_analyzer=True).suggestions
     if not sugs:
         return html.Div("No issues detected.")
     items = []
@@ -150,6 +188,32 @@ def on_suggestions(df_json):
     ])
 
 
+@app.callback(
+    Output('export-codec', 'options'),
+    Output('export-codec', 'value'),
+    Input('export-format', 'value'),
+)
+def on_export_format(fmt):
+    codecs = EXPORT_FORMATS[fmt][2]
+    return [{'label': c, 'value': c} for c in codecs], codecs[0]
+
+
+@app.callback(
+    Output('export-download', 'data'),
+    Input('export-button', 'n_clicks'),
+    State('export-format', 'value'),
+    State('export-codec', 'value'),
+    State('df-store', 'data'),
+    prevent_initial_call=True,
+)
+def on_export(n_clicks, fmt, codec, dataset_id):
+    df = get_dataset(dataset_id)
+    if df is None:
+        return None
+    ext = EXPORT_FORMATS[fmt][0]
+    return dcc.send_bytes(export_dataframe(df, fmt, codec), f"data.{ext}")
+
+
 @app.callback(
     Output('numeric-col', 'options'),
     Output('hist-plot', 'figure'),
@@ -157,12 +221,19 @@ def on_suggestions(df_json):
     Input('df-store', 'data'),
     Input('numeric-col', 'value'),
 )
-def on_visuals(df_json, col):
-    if not df_json:
+def on_visuals(dataset_id, col):
+    df = get_dataset(dataset_id)
+    if df is None:
         return [], px.scatter(), px.imshow(np.array([[0]]))
-    df = pd.read_json(df_json, orient='split')
     numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    hist_fig = px.histogram() if not col else px.histogram(df, x=col, nbins=30)
+    hist_fig = px.bar()
+    hist = get_histograms(df, None, 30).get(str(col)) if col else None
+    if hist is not None:
+        # Plot precomputed bins instead of shipping the whole column to the browser
+        centers = (hist.edges[:-1] + hist.edges[1:]) / 2
+        hist_fig = px.bar(x=centers, y=hist.counts, labels={'x': col, 'y': 'count'})
+        hist_fig.update_traces(width=np.diff(hist.edges))
+        hist_fig.update_layout(bargap=0)
     corr_fig = px.imshow(df.select_dtypes(include=[np.number]).corr(), color_continuous_scale='RdBu', zmin=-1, zmax=1)
     return [{'label': c, 'value': c} for c in numeric_cols], hist_fig, corr_fig
 
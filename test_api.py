@@ -0,0 +1,132 @@
+"""
+Tests for the FastAPI service (api.py)
+Run: python -m pytest -q test_api.py
+"""
+
+import io
+import json
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("utils.data_analyzer")
+pytest.importorskip("utils.data_cleaner")
+
+_TMP = tempfile.mkdtemp(prefix="data_cleaner_test_api_")
+os.environ.setdefault("DATA_CLEANER_JOBS_DIR", os.path.join(_TMP, "jobs"))
+os.environ.setdefault("DATA_CLEANER_API_STORE_DIR", os.path.join(_TMP, "store"))
+
+import pandas as pd  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+
+CSV = (
+    "id,name,score,city\n"
+    + "".join(f"{i},name{i % 7},{i * 1.5 if i % 5 else ''},{'Paris' if i % 2 else 'paris '}\n" for i in range(200))
+).encode()
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(api.app) as c:
+        yield c
+
+
+def upload(client, data=CSV, name="data.csv"):
+    r = client.post("/datasets", files={"file": (name, data)})
+    assert r.status_code == 200, r.text
+    return r.json()["dataset_id"]
+
+
+def test_dataset_upload_is_keyed_by_content(client):
+    first = upload(client)
+    assert upload(client) == first
+    assert upload(client, CSV + b"999,x,1,y\n") != first
+
+
+def test_profile_of_a_stored_dataset_is_built_once(client):
+    dataset_id = upload(client)
+    versions = set()
+    for _ in range(3):
+        r = client.post("/profile", data={"dataset_id": dataset_id})
+        assert r.status_code == 200, r.text
+        versions.add(r.json()["version"])
+    assert len(versions) == 1
+
+
+def test_suggestions_and_clean_on_a_stored_dataset(client):
+    dataset_id = upload(client)
+    r = client.post("/suggestions", data={"dataset_id": dataset_id})
+    assert r.status_code == 200 and isinstance(r.json(), dict)
+    r = client.post("/clean", data={"dataset_id": dataset_id})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["rows_in"] == 200 and isinstance(body["log"], list)
+
+
+def test_deleted_dataset_is_gone(client):
+    dataset_id = upload(client, CSV + b"1000,z,2,q\n")
+    assert client.delete(f"/datasets/{dataset_id}").status_code == 200
+    assert client.post("/profile", data={"dataset_id": dataset_id}).status_code == 404
+    assert client.delete(f"/datasets/{dataset_id}").status_code == 404
+
+
+@pytest.mark.parametrize("path", ["/profile", "/suggestions", "/clean", "/charts/hist", "/charts/corr"])
+def test_unknown_dataset_id_is_404(client, path):
+    r = client.post(path, data={"dataset_id": "file:" + "0" * 32})
+    assert r.status_code == 404
+
+
+def test_stored_dataset_answers_like_an_inline_upload(client):
+    dataset_id = upload(client)
+    for path in ("/charts/hist", "/charts/corr"):
+        stored = client.post(path, data={"dataset_id": dataset_id})
+        inline = client.post(path, files={"file": ("data.csv", CSV)})
+        assert stored.status_code == inline.status_code == 200
+        assert stored.json() == inline.json()
+
+
+@pytest.mark.parametrize("output", ["csv", "parquet", "arrow"])
+def test_clean_streams_the_full_result(client, monkeypatch, output):
+    pytest.importorskip("pyarrow")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from utils import ingest
+    monkeypatch.setattr(ingest, "STREAM_ROWS", 16)  # several slices
+    dataset_id = upload(client)
+    summary = client.post("/clean", data={"dataset_id": dataset_id}).json()
+    r = client.post("/clean", data={"dataset_id": dataset_id, "output": output})
+    assert r.status_code == 200, r.text
+    assert r.headers["X-Clean-Rows"] == str(summary["rows"])
+    assert json.loads(r.headers["X-Clean-Log"]) == summary["log"]
+    if output == "csv":
+        cleaned = pd.read_csv(io.BytesIO(r.content))
+    else:
+        table = (pq.read_table(io.BytesIO(r.content)) if output == "parquet"
+                 else pa.ipc.open_stream(r.content).read_all())
+        assert json.loads(table.schema.metadata[b"data_cleaner"])["log"] == summary["log"]
+        cleaned = table.to_pandas()
+    assert cleaned.shape == (summary["rows"], summary["cols"])
+
+
+def test_clean_rejects_unknown_output(client):
+    r = client.post("/clean", data={"dataset_id": upload(client), "output": "xlsx"})
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/profile", "/charts/hist", "/charts/corr"])
+def test_arrow_responses_on_request(client, path):
+    pa = pytest.importorskip("pyarrow")
+    dataset_id = upload(client)
+    r = client.post(path, data={"dataset_id": dataset_id},
+                    headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert r.status_code == 200 and r.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(r.content).read_all()
+    assert table.num_rows > 0
+    if path == "/profile":
+        assert json.loads(table.schema.metadata[b"profile"])["shape"] == [200, 4]
@@ -0,0 +1,121 @@
+"""
+Tests for utils.audit_writer (buffered background audit pipeline)
+Run: python -m pytest -q test_audit_writer.py
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from utils.audit_writer import AuditWriter, JsonlFileSink, SQLiteSink
+
+
+class GatedSink:
+    """Records batches; blocks the writer thread until ``gate`` is set."""
+
+    def __init__(self, open_gate=True):
+        self.gate = threading.Event()
+        if open_gate:
+            self.gate.set()
+        self.batches = []
+
+    def __call__(self, events):
+        self.gate.wait(5)
+        self.batches.append(list(events))
+
+    @property
+    def actions(self):
+        return [e["action"] for batch in self.batches for e in batch]
+
+
+def writer(sink, tmp_path, **kwargs):
+    kwargs.setdefault("flush_seconds", 0.05)
+    return AuditWriter([sink], spill_path=str(tmp_path / "spill.jsonl"), **kwargs)
+
+
+def test_events_are_written_in_order_and_batches(tmp_path):
+    sink = GatedSink()
+    w = writer(sink, tmp_path, batch_size=7, flush_seconds=5)
+    for i in range(50):
+        assert w.submit("editor", f"a{i}", {"i": i})
+    assert w.flush(5)
+    assert sink.actions == [f"a{i}" for i in range(50)]
+    assert max(len(b) for b in sink.batches) <= 7
+    stats = w.stats()
+    assert stats["written"] == stats["enqueued"] == 50 and stats["queue_depth"] == 0
+    w.close()
+    assert not w.submit("editor", "late") and w.stats()["dropped"] == 1
+
+
+def test_partial_batch_is_written_after_the_delay(tmp_path):
+    sink = GatedSink()
+    w = writer(sink, tmp_path, batch_size=100, flush_seconds=0.05)
+    w.submit("viewer", "one")
+    deadline = time.monotonic() + 5
+    while not sink.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sink.actions == ["one"]
+    w.close()
+
+
+def test_drop_and_block_policies(tmp_path):
+    sink = GatedSink(open_gate=False)
+    w = writer(sink, tmp_path, max_queue=2, batch_size=1, overflow="drop")
+    results = [w.submit("r", f"e{i}") for i in range(10)]
+    assert not all(results) and w.stats()["dropped"] == results.count(False)
+    sink.gate.set()
+    w.close()
+
+    sink = GatedSink(open_gate=False)
+    w = writer(sink, tmp_path, max_queue=1, batch_size=1, overflow="block", block_seconds=0.05)
+    started = time.monotonic()
+    results = [w.submit("r", f"e{i}") for i in range(4)]
+    assert time.monotonic() - started >= 0.05  # waited for room before giving up
+    assert results.count(False) == w.stats()["dropped"] >= 1
+    sink.gate.set()
+    w.close()
+
+
+def test_spill_is_replayed_once_caught_up(tmp_path):
+    sink = GatedSink(open_gate=False)
+    w = writer(sink, tmp_path, max_queue=2, batch_size=1, overflow="spill")
+    assert all(w.submit("r", f"e{i}") for i in range(20))
+    assert w.stats()["spilled"] > 0
+    sink.gate.set()
+    deadline = time.monotonic() + 5
+    while len(sink.actions) < 20 and time.monotonic() < deadline:
+        w.flush(1)
+        time.sleep(0.01)
+    assert sorted(sink.actions) == sorted(f"e{i}" for i in range(20))
+    assert not (tmp_path / "spill.jsonl").exists()
+    w.close()
+
+
+def test_failing_sink_is_counted(tmp_path):
+    def broken(events):
+        raise OSError("disk full")
+
+    w = AuditWriter([broken], flush_seconds=0.01, spill_path=str(tmp_path / "spill.jsonl"))
+    w.submit("r", "x")
+    w.flush(5)
+    assert w.stats()["failed"] == 1 and w.stats()["written"] == 0
+    w.close()
+    with pytest.raises(ValueError):
+        AuditWriter([], overflow="queue")
+
+
+def test_batched_file_and_sqlite_sinks(tmp_path):
+    path, db = tmp_path / "logs" / "audit.jsonl", tmp_path / "db" / "audit.db"
+    w = AuditWriter([JsonlFileSink(str(path)), SQLiteSink(str(db))], batch_size=10, flush_seconds=0.01,
+                    spill_path=str(tmp_path / "spill.jsonl"))
+    for i in range(25):
+        w.submit("admin", "clean", {"ops": i})
+    w.close()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [e["details"]["ops"] for e in lines] == list(range(25))
+    with sqlite3.connect(db) as conn:
+        rows = conn.execute("SELECT role, action, details FROM audit ORDER BY ts").fetchall()
+    assert len(rows) == 25 and rows[0][:2] == ("admin", "clean") and json.loads(rows[-1][2]) == {"ops": 24}
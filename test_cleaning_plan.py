@@ -0,0 +1,109 @@
+"""
+Tests for utils.cleaning_plan (suggestion compiler and executor)
+Run: python -m pytest -q test_cleaning_plan.py
+"""
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("utils.data_cleaner")
+
+from utils import cleaning_plan  # noqa: E402
+from utils.cleaning_plan import compile_plan, execute_plan  # noqa: E402
+
+
+def city_frame(n=1000):
+    return pd.DataFrame({
+        "city": pd.Series([" Paris", "paris", "Berlin ", "berlin", None] * (n // 5), dtype=object),
+        "joined": pd.Series(["2024-01-05", "2024-02-10", "not a date", None] * (n // 4), dtype=object),
+        "amount": [1.5, None, 3.0, 4.5] * (n // 4),
+    })
+
+
+def test_plan_orders_rows_before_columns():
+    df = city_frame()
+    plan = compile_plan(df, {
+        "fill": {"type": "missing_numeric", "column": "amount"},
+        "dupes": {"type": "duplicates"},
+        "trim": {"type": "whitespace", "column": "city"},
+        "nope": {"type": "unknown"},
+    })
+    assert [s.kind for s in plan.stages] == ["rows", "column", "column"]
+    assert plan.skipped == ["nope"]
+
+
+def test_fused_ops_log_one_line_each_in_rows():
+    df = city_frame()
+    plan = compile_plan(df, {
+        "trim": {"type": "whitespace", "column": "city"},
+        "case": {"type": "text_case", "column": "city"},
+    })
+    assert plan.stages[0].fused
+    result = execute_plan(df, plan, parallel="off")
+    assert result.log == [
+        "Trimmed whitespace in 'city' (400 of 1,000 rows changed)",
+        "Standardized text case in 'city' to lower (400 of 1,000 rows changed)",
+    ]
+    assert result.df["city"].dropna().unique().tolist() == ["paris", "berlin"]
+
+
+def test_datetime_parse_logs_one_line():
+    df = city_frame()
+    plan = compile_plan(df, {"dates": {"type": "datetime_parse", "column": "joined"}})
+    result = execute_plan(df, plan, parallel="off")
+    assert len(result.log) == 1
+    assert "250 of 750 values unparseable" in result.log[0]
+    assert pd.api.types.is_datetime64_any_dtype(result.df["joined"])
+
+
+def test_input_frame_is_not_modified():
+    df = city_frame()
+    before = df.copy()
+    execute_plan(df, compile_plan(df, {"fill": {"type": "missing_numeric", "column": "amount"}}), parallel="off")
+    pd.testing.assert_frame_equal(df, before)
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_parallel_modes_match_serial(monkeypatch, mode):
+    monkeypatch.setattr(cleaning_plan, "PLAN_WORKERS", 2)
+    monkeypatch.setattr(cleaning_plan, "PARALLEL_MIN_ROWS", 0)
+    df = city_frame()
+    plan = compile_plan(df, {
+        "trim": {"type": "whitespace", "column": "city"},
+        "dates": {"type": "datetime_parse", "column": "joined"},
+        "fill": {"type": "missing_numeric", "column": "amount"},
+        "dupes": {"type": "duplicates"},
+    })
+    serial = execute_plan(df, plan, parallel="off")
+    parallel = execute_plan(df, plan, parallel=mode)
+    pd.testing.assert_frame_equal(parallel.df, serial.df)
+    assert parallel.log == serial.log
+    assert {r.mode for r in parallel.stages if r.kind == "column"} == {mode}
+    if mode == "process":
+        assert cleaning_plan._process_pool()._mp_context.get_start_method() != "fork"
+
+
+def test_auto_mode_picks_by_size_and_dtype(monkeypatch):
+    monkeypatch.setattr(cleaning_plan, "PLAN_WORKERS", 4)
+    monkeypatch.setattr(cleaning_plan, "PARALLEL_MIN_ROWS", 100)
+    monkeypatch.setattr(cleaning_plan, "PROCESS_MIN_ROWS", 500)
+    df = city_frame()
+    df["city2"] = df["city"]
+    stages = compile_plan(df, {
+        "a": {"type": "whitespace", "column": "city"},
+        "b": {"type": "whitespace", "column": "city2"},
+    }).stages
+    assert cleaning_plan._batch_mode(stages, df, "auto") == "process"  # two Python-string stages
+    assert cleaning_plan._batch_mode(stages, df.iloc[:200], "auto") == "thread"
+    assert cleaning_plan._batch_mode(stages, df.iloc[:50], "auto") == "serial"
+    arrow = df.astype({"city": "string[pyarrow]", "city2": "string[pyarrow]"})
+    assert cleaning_plan._batch_mode(stages, arrow, "auto") == "thread"
+
+
+def test_near_duplicate_removal_needs_confirmation():
+    df = pd.DataFrame({"name": ["John Smith", "Jon Smith", "Mary Jones", "john smith"] * 5})
+    suggestion = {"type": "near_duplicates", "columns": ["name"], "threshold": 0.55, "requires_confirmation": True}
+    plan = compile_plan(df, {"near": suggestion})
+    assert plan.stages == [] and plan.skipped == ["near"]
+    result = execute_plan(df, compile_plan(df, {"near": {**suggestion, "confirmed": True}}), parallel="off")
+    assert len(result.df) == 2
@@ -0,0 +1,81 @@
+"""
+Tests for utils.compaction (dtype compaction and memory report)
+Run: python -m pytest -q test_compaction.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.compaction import compact_dataframe, editable, memory_report
+from utils.dataset_cache import DatasetCache
+
+
+def sample_frame(n=1000):
+    return pd.DataFrame({
+        "id": np.arange(n, dtype=np.int64),
+        "qty": np.where(np.arange(n) % 10 == 0, np.nan, np.arange(n) % 7).astype(np.float64),
+        "price": np.arange(n) * 0.25,
+        "status": np.array(["open", "closed", "pending"], dtype=object)[np.arange(n) % 3],
+        "active": np.array(["yes", "no"], dtype=object)[np.arange(n) % 2],
+    })
+
+
+def test_compacts_integers_and_text():
+    df = sample_frame()
+    out, report = compact_dataframe(df)
+    assert out["id"].dtype == np.int16
+    assert isinstance(out["status"].dtype, pd.CategoricalDtype)
+    assert out["active"].dtype == "boolean"
+    assert report.after_bytes < report.before_bytes
+    assert out["status"].astype(str).tolist() == df["status"].tolist()
+
+
+def test_only_repetitive_text_becomes_category():
+    df = sample_frame()
+    df["name"] = pd.Series([f"customer {i % 200}" for i in range(len(df))], dtype=object)  # 20% distinct
+    out, _ = compact_dataframe(df)
+    assert isinstance(out["status"].dtype, pd.CategoricalDtype)
+    assert not isinstance(out["name"].dtype, pd.CategoricalDtype)
+
+
+def test_compacted_columns_accept_new_values_once_editable():
+    df = sample_frame()
+    df.loc[::5, "status"] = None
+    out, _ = compact_dataframe(df)
+    edit = editable(out)
+    assert edit["id"].dtype == np.int16  # only category columns change
+    edit.loc[1, "status"] = "archived"
+    filled = edit["status"].fillna("unknown")
+    assert filled[1] == "archived" and filled[0] == "unknown"
+    assert isinstance(out["status"].dtype, pd.CategoricalDtype) and "archived" not in out["status"].cat.categories
+    recompacted, _ = compact_dataframe(edit.assign(status=filled))
+    assert set(recompacted["status"].cat.categories) == {"open", "closed", "pending", "archived", "unknown"}
+
+
+def test_floats_are_kept_unless_opted_in():
+    df = sample_frame()
+    out, _ = compact_dataframe(df)
+    assert out["qty"].dtype == np.float64 and out["price"].dtype == np.float64
+    assert out["qty"].mean() == df["qty"].mean()
+
+    opted, _ = compact_dataframe(df, downcast_floats=True)
+    assert opted["qty"].dtype == np.float32
+    assert opted["price"].dtype == np.float32
+
+
+def test_memory_report_is_attached_to_the_compacted_frame():
+    out, report = compact_dataframe(sample_frame())
+    assert memory_report(out) is report
+    plain = memory_report(sample_frame())
+    assert plain.before_bytes == plain.after_bytes
+
+
+def test_memory_report_survives_a_cache_spill(tmp_path):
+    out, report = compact_dataframe(sample_frame())
+    cache = DatasetCache(max_bytes=int(report.after_bytes * 2.5), spill_dir=str(tmp_path))
+    cache.put("a", out)
+    cache.put("b", compact_dataframe(sample_frame(2000))[0])  # evicts "a" to disk
+    reloaded = cache.get("a")
+    assert reloaded is not out
+    pd.testing.assert_frame_equal(reloaded, out)
+    assert memory_report(reloaded).to_dict() == report.to_dict()
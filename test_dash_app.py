@@ -0,0 +1,55 @@
+"""
+Tests for dash_app (server-side dataset store behind an opaque id)
+Run: python -m pytest -q test_dash_app.py
+"""
+
+import base64
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("dash")
+pytest.importorskip("plotly")
+pytest.importorskip("utils.data_analyzer")
+
+import dash_app
+from utils.dataset_cache import DatasetCache
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    cache = DatasetCache(max_bytes=10**8, spill_dir=str(tmp_path))
+    monkeypatch.setattr(dash_app, "DATASETS", cache)
+    return cache
+
+
+def upload(df, name="data.csv"):
+    payload = base64.b64encode(df.to_csv(index=False).encode("utf-8")).decode("ascii")
+    return dash_app.on_upload(f"data:text/csv;base64,{payload}", name)
+
+
+def test_store_holds_only_the_id(store):
+    df = pd.DataFrame({"a": range(100), "b": ["x", "y"] * 50})
+    _, dataset_id = upload(df)
+    assert isinstance(dataset_id, str) and len(dataset_id) < 100
+    first = dash_app.get_dataset(dataset_id)
+    assert first.shape == (100, 2)
+    assert upload(df)[1] == dataset_id  # same bytes, same id, no second parse
+    assert dash_app.get_dataset(dataset_id) is first
+    assert store.stats()["entries"] == 1
+
+
+def test_unreadable_upload_and_unknown_id(store):
+    status, dataset_id = dash_app.on_upload("data:text/plain;base64,AAAA", "notes.txt")
+    assert dataset_id is None
+    assert dash_app.get_dataset(None) is None
+    assert dash_app.get_dataset("file:missing") is None
+
+
+def test_export_uses_the_selected_codec(store):
+    df = pd.DataFrame({"a": range(10)})
+    _, dataset_id = upload(df)
+    options, default = dash_app.on_export_format("feather")
+    assert default == "lz4" and {o["value"] for o in options} == {"lz4", "zstd", "none"}
+    sent = dash_app.on_export(1, "parquet", "zstd", dataset_id)
+    assert sent["filename"] == "data.parquet"
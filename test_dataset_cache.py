@@ -0,0 +1,74 @@
+"""
+Tests for utils.dataset_cache (LRU dataset cache with Parquet spill)
+Run: python -m pytest -q test_dataset_cache.py
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset_cache import DatasetCache, _frame_nbytes
+
+
+def frame(n=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"x": rng.random(n), "y": rng.integers(0, 10, n)})
+
+
+def test_lru_eviction_spills_and_reloads_with_index(tmp_path):
+    a = frame(seed=1).set_index(pd.Index([f"r{i}" for i in range(1000)], name="row"))
+    b = frame(seed=2)
+    cache = DatasetCache(max_bytes=int(max(_frame_nbytes(a), _frame_nbytes(b)) * 1.5), spill_dir=str(tmp_path))
+    cache.put("a", a)
+    cache.put("b", b)  # evicts "a" to disk
+    assert cache.stats()["entries"] == 1
+    assert sorted(os.listdir(tmp_path)) == ["a.parquet"]  # no temporary files left behind
+    back = cache.get("a")
+    pd.testing.assert_frame_equal(back, a)
+
+
+def test_oversized_frame_is_kept(tmp_path):
+    big = frame(5000)
+    cache = DatasetCache(max_bytes=_frame_nbytes(big) // 2)
+    cache.put("small", frame(10))
+    cache.put("big", big)
+    assert cache.get("big") is big  # alone in memory without a spill directory
+    assert cache.get("small") is None
+
+    spilling = DatasetCache(max_bytes=_frame_nbytes(big) // 2, spill_dir=str(tmp_path))
+    spilling.put("big", big)
+    assert spilling.stats()["entries"] == 0
+    pd.testing.assert_frame_equal(spilling.get("big"), big)
+
+
+def test_concurrent_misses_load_once(tmp_path):
+    cache = DatasetCache(max_bytes=10**8, spill_dir=str(tmp_path))
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return frame()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 7
+
+
+def test_ttl_and_invalidate(tmp_path):
+    cache = DatasetCache(max_bytes=10**8, spill_dir=str(tmp_path), ttl_seconds=0.05)
+    cache.put("k", frame())
+    time.sleep(0.1)
+    assert cache.purge_expired() == 1
+    assert cache.get("k") is None
+    cache.put("k", frame())
+    assert cache.invalidate("k") and not cache.invalidate("k")
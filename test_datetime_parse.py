@@ -0,0 +1,58 @@
+"""
+Tests for utils.datetime_parse (distinct-value datetime parsing)
+Run: python -m pytest -q test_datetime_parse.py
+"""
+
+import pandas as pd
+
+from utils.datetime_parse import infer_datetime_format, parse_datetime_series
+
+
+def test_iso_column_uses_iso_fast_path():
+    s = pd.Series(["2024-01-05", "2024-02-10", None, "2024-01-05"], name="date")
+    result = parse_datetime_series(s)
+    assert result.format == "ISO8601"
+    assert result.n_values == 3 and result.n_failed == 0
+    assert result.values.isna().tolist() == [False, False, True, False]
+
+
+def test_day_first_column_is_inferred():
+    s = pd.Series(["13/01/2024", "02/03/2024", "25/12/2023"], name="when")
+    result = parse_datetime_series(s)
+    assert result.format == "%d/%m/%Y"
+    assert result.n_failed == 0
+    assert result.values.iloc[1] == pd.Timestamp("2024-03-02")
+
+
+def test_same_column_name_in_another_dataset_is_inferred_afresh():
+    month_first = pd.Series(["01/13/2024", "02/03/2024", "12/25/2023"], name="when")
+    assert parse_datetime_series(month_first).format == "%m/%d/%Y"
+
+    day_first = pd.Series(["13/01/2024", "02/03/2024", "25/12/2023"], name="when")
+    result = parse_datetime_series(day_first)
+    assert result.format == "%d/%m/%Y"
+    assert result.n_failed == 0
+    assert result.values.iloc[0] == pd.Timestamp("2024-01-13")
+    assert result.values.iloc[1] == pd.Timestamp("2024-03-02")
+
+
+def test_mixed_column_does_not_force_mixed_on_the_next_dataset():
+    mixed = pd.Series(["2024-01-05", "Jan 7 2024", "07.01.2024", "5/1/24"], name="date")
+    assert infer_datetime_format(mixed) == "mixed"
+
+    clean = pd.Series(["2024-01-05", "2024-02-10"], name="date")
+    assert parse_datetime_series(clean).format == "ISO8601"
+
+
+def test_unparseable_values_are_counted():
+    s = pd.Series(["2024-01-05"] * 30 + ["not a date"], name="date")
+    result = parse_datetime_series(s)
+    assert result.n_values == 31 and result.n_failed == 1
+    assert result.values.isna().sum() == 1
+
+
+def test_explicit_format_skips_inference():
+    s = pd.Series(["05.01.2024", "06.01.2024"])
+    result = parse_datetime_series(s, format="%d.%m.%Y")
+    assert result.format == "%d.%m.%Y"
+    assert result.values.iloc[0] == pd.Timestamp("2024-01-05")
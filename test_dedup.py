@@ -0,0 +1,99 @@
+"""
+Tests for utils.dedup (fingerprint-based exact duplicate removal)
+Run: python -m pytest -q test_dedup.py
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dedup import ChunkedDeduplicator, FingerprintTable, duplicated_rows, row_fingerprints
+
+
+def sample_frame(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "id": rng.integers(0, 300, n),
+        "name": rng.choice(["ann", "bob", None, "cy"], n),
+        "score": rng.choice([0.5, -0.0, 0.0, np.nan, 2.25], n),
+    })
+    return df
+
+
+def run_chunked(chunks, keep="first", **kwargs):
+    dedup = ChunkedDeduplicator(keep=keep, **kwargs)
+    for chunk in chunks:
+        dedup.observe(chunk)
+    if dedup.needs_confirm:
+        for chunk in chunks:
+            dedup.confirm(chunk)
+    out = pd.concat([dedup.filter(chunk) for chunk in chunks])
+    dedup.close()
+    return out, dedup.removed
+
+
+@pytest.mark.parametrize("keep", ["first", "last"])
+def test_duplicated_rows_matches_pandas(keep):
+    df = sample_frame()
+    expected = df.duplicated(keep=keep).to_numpy()
+    assert (duplicated_rows(df, keep=keep) == expected).all()
+    assert (duplicated_rows(df, subset=["id"], keep=keep) == df.duplicated(["id"], keep=keep).to_numpy()).all()
+
+
+@pytest.mark.parametrize("keep", ["first", "last"])
+def test_chunked_matches_in_memory(keep):
+    df = sample_frame()
+    chunks = [df.iloc[i:i + 300] for i in range(0, len(df), 300)]
+    out, removed = run_chunked(chunks, keep=keep)
+    expected = df[~df.duplicated(keep=keep)]
+    assert removed == len(df) - len(expected)
+    pd.testing.assert_frame_equal(out, expected)
+
+
+def test_chunked_spills_to_disk(tmp_path):
+    df = sample_frame()
+    chunks = [df.iloc[i:i + 250] for i in range(0, len(df), 250)]
+    out, removed = run_chunked(chunks, max_bytes=1024, spill_dir=str(tmp_path))
+    assert removed == int(df.duplicated().sum())
+    assert len(out) == len(df.drop_duplicates())
+
+
+def test_cross_chunk_duplicates_when_one_chunk_has_nulls():
+    # The same 100 rows in two chunks; the second chunk also holds a null in
+    # the integer column, so a chunked reader types it float64 there
+    rows = "".join(f"{i},name{i}\n" for i in range(100))
+    first = pd.read_csv(io.StringIO("qty,name\n" + rows))
+    second = pd.read_csv(io.StringIO("qty,name\n" + rows + ",extra\n5,name5\n"))
+    assert first["qty"].dtype == np.int64 and second["qty"].dtype == np.float64
+
+    out, removed = run_chunked([first, second])
+    assert len(out) == 101  # 100 distinct rows plus the null row
+    assert removed == 101
+
+
+def test_fingerprints_agree_across_numeric_dtypes():
+    ints = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+    floats = pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": ["x", "y", "z"]})
+    nullable = pd.DataFrame({"a": pd.array([1, 2, 3], dtype="Int64"), "b": ["x", "y", "z"]})
+    mixed = pd.DataFrame({"a": pd.Series([1, 2.0, 3], dtype=object), "b": ["x", "y", "z"]})
+    expected = row_fingerprints(ints)
+    for other in (floats, nullable, mixed):
+        assert (row_fingerprints(other) == expected).all()
+
+
+def test_missing_values_agree_across_dtypes():
+    as_float = pd.DataFrame({"a": [np.nan, 1.0]})
+    as_object = pd.DataFrame({"a": pd.Series([None, 1], dtype=object)})
+    assert (row_fingerprints(as_float) == row_fingerprints(as_object)).all()
+
+
+def test_fingerprint_table_counts_repeats_across_spills(tmp_path):
+    table = FingerprintTable(max_bytes=16, spill_dir=str(tmp_path), partitions=4)
+    table.add(np.array([1, 2, 3], dtype=np.uint64))
+    table.add(np.array([3, 4, 1 << 63], dtype=np.uint64))
+    table.add(np.array([1 << 63], dtype=np.uint64))
+    assert table.spills > 0
+    assert table.repeated().tolist() == [3, 1 << 63]
+    table.close()
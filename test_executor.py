@@ -0,0 +1,78 @@
+"""
+Tests for utils.executor (bounded worker pool for API handlers)
+Run: python -m pytest -q test_executor.py
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.executor import PoolBusyError, PoolTimeoutError, WorkerPool
+
+
+def test_runs_in_thread_and_returns_result():
+    pool = WorkerPool(mode="thread", workers=2)
+    try:
+        assert asyncio.run(pool.run("x", sum, [1, 2, 3])) == 6
+        assert pool.stats()["pending"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_timed_out_task_keeps_its_slot_until_it_finishes():
+    release = threading.Event()
+    pool = WorkerPool(mode="thread", workers=4, limits={"slow": 1})
+
+    async def scenario():
+        with pytest.raises(PoolTimeoutError):
+            await pool.run("slow", release.wait, 5, timeout=0.1)
+        # The first task is still running, so the single slot is still taken
+        with pytest.raises(PoolTimeoutError):
+            await pool.run("slow", time.sleep, 0, timeout=0.2)
+        assert pool.stats()["pending"] == 1
+        release.set()
+        await asyncio.sleep(0.1)
+        assert pool.stats()["pending"] == 0
+        # ...and is released once it finishes
+        assert await pool.run("slow", sum, [1, 1], timeout=1) == 2
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_queue_limit_rejects_with_429():
+    release = threading.Event()
+    pool = WorkerPool(mode="thread", workers=2, limits={"x": 1}, queue_size=0)
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.run("x", release.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolBusyError) as err:
+            await pool.run("x", sum, [1])
+        assert err.value.status_code == 429
+        release.set()
+        assert await first is True
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def _square(x):
+    return x * x
+
+
+def test_process_pool_does_not_fork():
+    pool = WorkerPool(mode="process", workers=1)
+    try:
+        assert asyncio.run(pool.run("x", _square, 7)) == 49
+        assert pool._cpu_executor._mp_context.get_start_method() in ("forkserver", "spawn")
+    finally:
+        pool.shutdown()
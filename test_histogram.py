@@ -0,0 +1,72 @@
+"""
+Tests for utils.histogram (batched histograms and quantile sketch)
+Run: python -m pytest -q test_histogram.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import histogram
+from utils.histogram import QuantileSketch, compute_histograms, get_histograms
+
+
+def sample_frame(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "normal": rng.normal(size=n),
+        "ints": rng.integers(0, 50, n),
+        "const": np.full(n, 3.0),
+        "with_nan": np.where(rng.random(n) < 0.2, np.nan, rng.exponential(size=n)),
+        "text_num": rng.integers(0, 10, n).astype(str),
+    })
+    df.loc[0, "normal"] = np.inf
+    return df
+
+
+@pytest.mark.parametrize("group_cells", [histogram.GROUP_CELLS, 5000])
+def test_fixed_bins_match_numpy(monkeypatch, group_cells):
+    monkeypatch.setattr(histogram, "GROUP_CELLS", group_cells)  # one column per group
+    df = sample_frame()
+    result = compute_histograms(df, ["normal", "ints", "const", "with_nan", "text_num"], bins=17)
+    for col, hist in result.items():
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+        values = values[np.isfinite(values)]
+        counts, edges = np.histogram(values, bins=17)
+        np.testing.assert_array_equal(hist.counts, counts)
+        np.testing.assert_allclose(hist.edges, edges)
+    assert set(result) == {"normal", "ints", "const", "with_nan", "text_num"}
+
+
+def test_quantile_and_fd_bins():
+    df = sample_frame()
+    quant = compute_histograms(df, ["normal"], bins=10, method="quantile")["normal"]
+    assert quant.counts.sum() == np.isfinite(df["normal"]).sum()
+    assert quant.counts.max() - quant.counts.min() <= 2  # equal-frequency bins
+    fd = compute_histograms(df, ["ints"], bins=10, method="fd")["ints"]
+    assert 1 <= fd.counts.size <= histogram.MAX_BINS and fd.counts.sum() == len(df)
+    with pytest.raises(ValueError):
+        compute_histograms(df, method="sturges")
+
+
+def test_histograms_are_cached_per_frame():
+    df = sample_frame()
+    assert get_histograms(df, ["ints"], 5) is get_histograms(df, ["ints"], 5)
+    assert get_histograms(df, ["ints"], 6) is not get_histograms(df, ["ints"], 5)
+    assert compute_histograms(df.iloc[:0]) == {}
+
+
+def test_quantile_sketch_merges_within_error():
+    rng = np.random.default_rng(1)
+    values = np.concatenate([rng.lognormal(size=20_000), -rng.lognormal(size=5000), np.zeros(100)])
+    chunks = np.array_split(rng.permutation(values), 7)
+    sketch = QuantileSketch(alpha=0.01)
+    for chunk in chunks:
+        sketch.merge(QuantileSketch(alpha=0.01).update(chunk))
+    assert sketch.count == values.size
+    for q, got in zip([0.01, 0.25, 0.5, 0.9, 0.999], sketch.quantiles([0.01, 0.25, 0.5, 0.9, 0.999])):
+        exact = np.quantile(values, q, method="lower")
+        assert abs(got - exact) <= 0.011 * abs(exact) + 1e-12
+    assert sketch.histogram(20).counts.sum() == values.size
+    with pytest.raises(ValueError):
+        sketch.merge(QuantileSketch(alpha=0.05))
@@ -0,0 +1,71 @@
+"""
+Tests for utils.history (memory-bounded undo/redo)
+Run: python -m pytest -q test_history.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.history import HistoryManager
+
+
+def text_frame(n=5000):
+    return pd.DataFrame({
+        "id": np.arange(n),
+        "note": pd.Series([f"customer note number {i} " * 4 for i in range(n)], dtype=object),
+    })
+
+
+def test_undo_redo_walks_the_timeline():
+    base = text_frame(100)
+    history = HistoryManager(base, checkpoint_every=3)
+    states = [base]
+    for step in range(6):
+        df = states[-1].copy()
+        df["id"] = df["id"] + 1
+        if step == 2:
+            df = df.iloc[::2]
+        states.append(df)
+        history.commit(df)
+    for expected in reversed(states[:-1]):
+        pd.testing.assert_frame_equal(history.undo(), expected)
+    for expected in states[1:]:
+        pd.testing.assert_frame_equal(history.redo(), expected)
+
+
+def test_budget_counts_text_payload():
+    base = text_frame()
+    changed = base.assign(note=base["note"].str.upper())
+    history = HistoryManager(base)
+    history.commit(changed)
+    text_bytes = int(changed["note"].memory_usage(index=False, deep=True))
+    # A pointer-size count would be 8 bytes per row
+    assert history.nbytes >= text_bytes > 8 * len(base) * 10
+
+
+def test_budget_drops_oldest_states():
+    base = text_frame()
+    one_state = int(base["note"].memory_usage(index=False, deep=True))
+    history = HistoryManager(base, max_bytes=int(one_state * 2.5))
+    df = base
+    for i in range(6):
+        df = df.assign(note=df["note"] + str(i))
+        history.commit(df)
+    assert history.nbytes <= history.max_bytes
+    undone = 0
+    while history.can_undo():
+        history.undo()
+        undone += 1
+    assert undone == 1
+    assert history.current["note"].iloc[0].endswith("4")
+
+
+def test_undo_to_base_returns_a_copy():
+    base = text_frame(10)
+    history = HistoryManager(base)
+    history.commit(base.assign(id=base["id"] * 2))
+    restored = history.undo()
+    assert restored is not base
+    restored.loc[0, "note"] = "edited"
+    assert base.loc[0, "note"] != "edited"
+    pd.testing.assert_frame_equal(history.redo(), base.assign(id=base["id"] * 2))
@@ -0,0 +1,78 @@
+"""
+Tests for utils.incremental_profile (profile updates after cell edits)
+Run: python -m pytest -q test_incremental_profile.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.incremental_profile import cell_edits, edits_from_ops, update_profile
+from utils.profile import build_profile, get_profile
+
+
+def sample_frame(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "num": np.where(rng.random(n) < 0.1, np.nan, rng.normal(10, 2, n)),
+        "ints": rng.integers(0, 4, n).astype(float),
+        "cat": pd.Series(rng.choice(["a", "b", "c", None], n), dtype=object),
+    }, index=np.arange(n) * 2)
+
+
+def assert_same_stats(got, expected):
+    assert dict(got.missing) == dict(expected.missing)
+    assert got.missing_total == expected.missing_total
+    assert dict(got.cardinality) == dict(expected.cardinality)
+    assert got.duplicates == expected.duplicates
+    assert dict(got.outliers) == dict(expected.outliers)
+    assert got.memory_bytes == expected.memory_bytes
+    for col, stats in expected.numeric_stats.items():
+        for name, value in stats.items():
+            assert got.numeric_stats[col][name] == pytest.approx(value, rel=1e-9, abs=1e-9), (col, name)
+
+
+def test_repeated_edits_match_a_full_rebuild():
+    rng = np.random.default_rng(1)
+    df = sample_frame()
+    get_profile(df, with_analyzer=False)
+    for step in range(30):
+        after = df.copy()
+        ops = []
+        for _ in range(rng.integers(1, 4)):
+            col = rng.choice(["num", "ints", "cat"])
+            label = int(rng.choice(df.index))
+            value = {
+                "num": rng.choice([np.nan, 100.0, -50.0, float(rng.normal(10, 2))]),
+                "ints": float(rng.integers(0, 6)),
+                "cat": rng.choice(["a", "d", None]),
+            }[col]
+            after.loc[label, col] = value
+            ops.append({"column": col, "row": label})
+        updated = update_profile(df, after, ops if step % 2 else None)
+        assert updated.base_version is not None and get_profile(after, with_analyzer=False) is updated
+        # Fresh index: label lookups build a hash table that memory_usage would count
+        fresh = after.set_axis(pd.Index(after.index.to_numpy()))
+        assert_same_stats(updated, build_profile(fresh, with_analyzer=False))
+        df = after
+
+
+def test_structural_changes_rebuild():
+    df = sample_frame()
+    base = get_profile(df, with_analyzer=False)
+    fewer = df.iloc[:-1].copy()
+    assert cell_edits(df, fewer) is None
+    rebuilt = update_profile(df, fewer)
+    assert rebuilt.base_version is None and rebuilt.n_rows == len(df) - 1
+    assert edits_from_ops(df, [{"column": "num", "row": -7}]) is None  # unknown row label
+    assert edits_from_ops(df, [{"op": "drop_rows"}]) is None
+    assert base.version != rebuilt.version
+
+
+def test_edits_found_by_diffing():
+    df = sample_frame()
+    after = df.copy()
+    after.iloc[[3, 9], 0] = [1.0, np.nan]
+    after.iloc[5, 2] = "z"
+    edits = cell_edits(df, after)
+    assert set(edits) == {"num", "cat"} and edits["cat"].tolist() == [5]
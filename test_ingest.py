@@ -0,0 +1,107 @@
+"""
+Tests for utils.ingest (fast CSV parsing, columnar input and export)
+Run: python -m pytest -q test_ingest.py
+"""
+
+import io
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from utils import ingest
+from utils.ingest import EXPORT_FORMATS, export_dataframe, iter_csv_chunks, read_columnar, read_csv_fast
+
+
+def sample_frame(n=500):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": np.arange(n),
+        "value": rng.random(n),
+        "label": rng.choice(["a", "b", None], n),
+    })
+
+
+def csv_bytes(df):
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def test_read_csv_fast_matches_pandas_and_reports_progress():
+    df = sample_frame(20_000)
+    df["when"] = "2024-01-02"
+    seen = []
+    got = read_csv_fast(io.BytesIO(csv_bytes(df)), block_bytes=64 * 1024, progress=seen.append)
+    expected = pd.read_csv(io.BytesIO(csv_bytes(df)))
+    pd.testing.assert_frame_equal(got.astype(object), expected.astype(object))
+    assert got["when"].iloc[0] == "2024-01-02"  # dates stay text for parse_datetime
+    assert seen[-1] == 1.0 and seen == sorted(seen)
+
+
+def test_progress_is_reported_on_the_calling_thread():
+    threads = set()
+    read_csv_fast(io.BytesIO(csv_bytes(sample_frame(20_000))), block_bytes=64 * 1024,
+                  progress=lambda frac: threads.add(threading.get_ident()))
+    assert threads == {threading.get_ident()}
+
+
+def test_header_only_csv():
+    got = read_csv_fast(io.BytesIO(b"id,value,label\n"))
+    assert list(got.columns) == ["id", "value", "label"] and got.empty
+
+
+def test_sample_that_does_not_parse_falls_back_to_pandas(monkeypatch):
+    import pyarrow as pa
+
+    def bad_sample(raw):
+        raw.read(8)  # leaves the file mid-stream, as a failed parse would
+        raise pa.ArrowInvalid("CSV parse error")
+
+    monkeypatch.setattr(ingest, "_sample_column_types", bad_sample)
+    got = read_csv_fast(io.BytesIO(b"x,note\n1,a\n2,plain\n"))
+    assert got["x"].tolist() == [1, 2] and got["note"].iloc[1] == "plain"
+
+
+def test_types_that_change_after_the_sample_fall_back_to_pandas(monkeypatch):
+    monkeypatch.setattr(ingest, "CSV_SAMPLE_BYTES", 64)
+    data = b"x,y\n" + b"".join(b"%d,a\n" % i for i in range(100)) + b"oops,b\n"
+    got = read_csv_fast(io.BytesIO(data), block_bytes=256)
+    assert len(got) == 101 and got["x"].iloc[-1] == "oops"
+
+
+def test_csv_chunks_share_one_schema(monkeypatch):
+    monkeypatch.setattr(ingest, "CSV_SAMPLE_BYTES", 4096)
+    df = sample_frame(5000)
+    chunks = list(iter_csv_chunks(csv_bytes(df), block_bytes=16 * 1024))
+    assert len(chunks) > 1
+    assert all((c.dtypes == chunks[0].dtypes).all() for c in chunks)
+    assert sum(map(len, chunks)) == len(df)
+
+
+@pytest.mark.parametrize("fmt,codec", [(f, c) for f, spec in EXPORT_FORMATS.items() for c in spec[2]])
+def test_export_round_trips_every_codec(fmt, codec):
+    df = sample_frame()
+    data = export_dataframe(df, fmt, codec)
+    back = read_columnar(io.BytesIO(data), EXPORT_FORMATS[fmt][0])
+    pd.testing.assert_frame_equal(back.astype(object), df.astype(object))
+
+
+def test_export_rejects_unknown_codec():
+    with pytest.raises(ValueError, match="not supported"):
+        export_dataframe(sample_frame(), "feather", "gzip")
+    with pytest.raises(ValueError, match="Unsupported export format"):
+        export_dataframe(sample_frame(), "xlsx")
+
+
+def test_arrow_stream_input():
+    import pyarrow as pa
+
+    df = sample_frame()
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    back = read_columnar(sink.getvalue().to_pybytes(), "arrows")
+    pd.testing.assert_frame_equal(back.astype(object), df.astype(object))
@@ -0,0 +1,51 @@
+"""
+Tests for utils.missingness (bucketed null fractions and co-occurrence)
+Run: python -m pytest -q test_missingness.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils import missingness
+from utils.missingness import get_missingness, summarize_missingness
+
+
+def sample_frame(n=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    a = rng.random(n)
+    df = pd.DataFrame({
+        "a": np.where(rng.random(n) < 0.1, np.nan, a),
+        "b": rng.choice(["x", "y", None], n),
+        "full": np.arange(n),
+    })
+    df["c"] = np.where(df["a"].isna() | (rng.random(n) < 0.05), np.nan, 1.0)  # mostly null with "a"
+    return df
+
+
+def test_bucket_fractions_match_isna(monkeypatch):
+    monkeypatch.setattr(missingness, "BLOCK_ROWS", 1000)  # several blocks
+    df = sample_frame()
+    summary = summarize_missingness(df, buckets=37)
+    ends = np.append(summary.bucket_starts[1:], len(df))
+    expected = np.array([df.iloc[s:e].isna().mean().to_numpy() for s, e in zip(summary.bucket_starts, ends)])
+    np.testing.assert_allclose(summary.fractions, expected)
+    assert summary.to_frame().shape == (37, 4)
+    assert summary.total_missing == int(df.isna().sum().sum())
+
+
+def test_co_occurrence_and_nullity_correlation(monkeypatch):
+    monkeypatch.setattr(missingness, "BLOCK_ROWS", 1000)
+    df = sample_frame()
+    summary = summarize_missingness(df)
+    nulls = df.isna().astype(np.int64)
+    np.testing.assert_array_equal(summary.co_occurrence, (nulls.T @ nulls).to_numpy())
+    corr = summary.nullity_correlation()
+    assert list(corr.columns) == ["a", "b", "c"]
+    np.testing.assert_allclose(corr.to_numpy(), nulls[["a", "b", "c"]].corr().to_numpy(), atol=1e-9)
+
+
+def test_frame_without_nulls_and_cache():
+    df = pd.DataFrame({"x": [1, 2, 3]})
+    summary = get_missingness(df)
+    assert summary.total_missing == 0 and not summary.fractions.any()
+    assert get_missingness(df) is summary
@@ -0,0 +1,99 @@
+"""
+Tests for utils.near_dedup (MinHash LSH near-duplicate clustering)
+Run: python -m pytest -q test_near_dedup.py
+"""
+
+import pandas as pd
+
+from utils.near_dedup import default_columns, drop_near_duplicates, find_near_duplicates, near_duplicate_suggestion
+
+
+def test_request_example_clusters_on_a_name_column():
+    df = pd.DataFrame({"name": ["John Smith", "john smith ", "Jon Smith", "Mary Jones"]})
+    result = find_near_duplicates(df, ["name"])
+    ids = result.cluster_ids.tolist()
+    assert ids[0] == ids[1] == ids[2]
+    assert pd.isna(ids[3])
+    assert result.n_clusters == 1 and result.removable_rows == 2
+
+
+def test_pairs_list_rows_with_identical_normalised_text():
+    df = pd.DataFrame({"name": ["John Smith", "john smith ", "JOHN  SMITH.", "Jon Smith"]})
+    pairs = find_near_duplicates(df, ["name"]).pairs
+    identical = pairs[pairs["similarity"] == 1.0]
+    assert sorted(zip(identical["left"], identical["right"])) == [(0, 1), (0, 2)]
+    assert ((pairs["left"] == 0) & (pairs["right"] == 3)).any()
+
+
+def test_blank_column_is_skipped_when_matching_on_several_columns():
+    df = pd.DataFrame({
+        "name": ["John Smith", "John Smith", "Jon Smith", "Peter Novak"],
+        "email": ["john.smith@example.com", "john.smith@example.com", "", "peter.novak@example.com"],
+    })
+    ids = find_near_duplicates(df, ["name", "email"]).cluster_ids.tolist()
+    # The missing e-mail neither hides the typo from candidate search nor fails the match
+    assert ids[0] == ids[1] == ids[2]
+    assert pd.isna(ids[3])
+
+
+def test_shared_email_domain_does_not_merge_different_people():
+    df = pd.DataFrame({
+        "name": ["Anna Berg", "Anna Novak", "Anna Berg"],
+        "email": ["anna.berg@example.com", "anna.novak@example.com", "a.berg@example.com"],
+    })
+    result = find_near_duplicates(df, ["name", "email"])
+    assert pd.isna(result.cluster_ids[1])
+
+
+def test_blocking_keeps_blocks_apart():
+    df = pd.DataFrame({"name": ["John Smith", "Jon Smith", "John Smith"], "zip": ["1000", "1000", "2000"]})
+    result = find_near_duplicates(df, ["name"], block_on=["zip"])
+    ids = result.cluster_ids
+    assert ids[0] == ids[1]
+    assert pd.isna(ids[2])
+
+
+def test_blank_rows_never_cluster():
+    df = pd.DataFrame({"name": ["", None, "  ", "x"]})
+    assert find_near_duplicates(df, ["name"]).n_clusters == 0
+
+
+def test_drop_keeps_one_row_per_cluster():
+    df = pd.DataFrame({"name": ["John Smith", "Mary Jones", "Jon Smith", "john smith"]})
+    result = find_near_duplicates(df, ["name"])
+    kept = drop_near_duplicates(df, result)
+    assert kept["name"].tolist() == ["John Smith", "Mary Jones"]
+    assert drop_near_duplicates(df, result, keep="last")["name"].tolist() == ["Mary Jones", "john smith"]
+
+
+def test_suggestion_is_raised_for_near_duplicate_rows():
+    first = ["Olivia", "Liam", "Emma", "Noah", "Sophia", "Lucas", "Mia", "Ethan", "Zoe", "Hugo"]
+    last = ["Anderson", "Kowalski", "Fernandez", "Nakamura", "Okafor", "Lindqvist", "Moreau", "Schulz",
+            "Petrov", "Gallagher", "Rossi", "Haddad", "Jensen", "Oliveira", "Dubois", "Novak",
+            "Tanaka", "Brennan", "Costa", "Weber"]
+    names = [f"{f} {l}" for f in first for l in last]
+    repeats = names[:10]  # exact re-entries: the column is not one value per row
+    df = pd.DataFrame({"name": names + repeats + [names[5].upper(), names[9].replace("Gallagher", "Galagher")]})
+    suggestion = near_duplicate_suggestion(df)
+    assert suggestion is not None
+    assert suggestion["type"] == "near_duplicates" and suggestion["columns"] == ["name"]
+    assert suggestion["requires_confirmation"]
+
+
+def test_identifier_columns_are_not_used():
+    n = 5000
+    df = pd.DataFrame({
+        "email": [f"user{i}@example.com" for i in range(n)],
+        "order": [f"ORD-{i:06d}" for i in range(n)],
+        "sku": [f"SKU{i % 2000:05d}" for i in range(n)],  # repeated codes, not near-unique
+        "status": ["open", "closed"] * (n // 2),
+    })
+    assert default_columns(df) == []
+    assert near_duplicate_suggestion(df) is None
+
+
+def test_suggestion_that_would_merge_most_rows_is_not_raised():
+    words = ["alpha beta gamma", "alpha beta gamma delta", "alpha beta gamma epsilon"]
+    df = pd.DataFrame({"note": [f"{words[i % 3]} x{i % 40}" for i in range(400)]})
+    assert default_columns(df) == ["note"]
+    assert near_duplicate_suggestion(df) is None
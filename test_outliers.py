@@ -0,0 +1,88 @@
+"""
+Tests for utils.outliers (vectorized outlier bounds and removal)
+Run: python -m pytest -q test_outliers.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import outliers
+from utils.outliers import ApproxOutlierStats, compute_bounds, detect_outliers, outlier_mask, remove_outliers
+
+
+def sample_frame(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "a": rng.normal(50, 5, n),
+        "b": np.where(rng.random(n) < 0.1, np.nan, rng.exponential(2, n)),
+        "flat": np.r_[np.zeros(n - 3), [1.0, 2.0, 3.0]],
+        "text": rng.choice(["x", "y"], n),
+    })
+    df.loc[[3, 7], "a"] = [500.0, -np.inf]
+    return df
+
+
+def reference_bounds(col, method, k):
+    col = col[np.isfinite(col)]
+    if method == "iqr":
+        q1, q3 = np.quantile(col, [0.25, 0.75])
+        return q1 - k * (q3 - q1), q3 + k * (q3 - q1)
+    if method == "zscore":
+        return col.mean() - k * col.std(ddof=1), col.mean() + k * col.std(ddof=1)
+    median = np.median(col)
+    mad = np.median(np.abs(col - median))
+    scale = mad / 0.6745 if mad > 0 else np.mean(np.abs(col - median)) / 0.7979
+    return median - k * scale, median + k * scale
+
+
+@pytest.mark.parametrize("method", ["iqr", "zscore", "mad"])
+def test_bounds_match_per_column_reference(monkeypatch, method):
+    monkeypatch.setattr(outliers, "GROUP_CELLS", 2000)  # one column per group
+    df = sample_frame()
+    bounds = compute_bounds(df, method=method)
+    assert set(bounds) == {"a", "b", "flat"}
+    k = outliers.DEFAULT_THRESHOLDS[method]
+    for col, (lo, hi) in bounds.items():
+        np.testing.assert_allclose((lo, hi), reference_bounds(df[col].to_numpy(dtype=float), method, k))
+
+
+def test_detect_and_remove_flag_rows_once():
+    df = sample_frame()
+    report = detect_outliers(df, ["a", "b"], method="zscore")
+    assert report.mask[3] and report.mask[7]  # far value and -inf
+    assert not report.mask[df["b"].isna().to_numpy() & ~report.mask].any()  # NaN is never flagged
+    cleaned, again = remove_outliers(df, ["a", "b"], method="zscore")
+    assert len(cleaned) == len(df) - report.rows_flagged
+    assert again.counts == report.counts
+    assert "outlier rows (zscore, threshold 3)" in report.message()
+    with pytest.raises(ValueError):
+        detect_outliers(df, method="tukey")
+
+
+def test_precomputed_bounds_on_chunks():
+    df = sample_frame()
+    bounds = compute_bounds(df, ["a"], method="iqr")
+    halves = [outlier_mask(part, bounds) for part in (df.iloc[:1000], df.iloc[1000:])]
+    whole, counts = outlier_mask(df, bounds)
+    np.testing.assert_array_equal(np.concatenate([m for m, _ in halves]), whole)
+    assert counts["a"] == sum(c["a"] for _, c in halves)
+
+
+@pytest.mark.parametrize("method", ["iqr", "zscore", "mad"])
+def test_approx_stats_merge_close_to_exact(method):
+    df = sample_frame()
+    values = df["a"].to_numpy(dtype=float)
+    merged = ApproxOutlierStats()
+    for chunk in np.array_split(values, 5):
+        merged.merge(ApproxOutlierStats().update(chunk))
+    exact = compute_bounds(df, ["a"], method=method)["a"]
+    if method == "mad":
+        # Deviations are measured between bucket values, so the MAD error is
+        # relative to the values (alpha * |median|), not to the MAD itself
+        k = outliers.DEFAULT_THRESHOLDS["mad"]
+        atol = 2 * 0.01 * abs(np.median(values)) * k / 0.6745
+        np.testing.assert_allclose(merged.bounds(method), exact, atol=atol)
+    else:
+        np.testing.assert_allclose(merged.bounds(method), exact, rtol=0.03)
+    assert ApproxOutlierStats().update([1.0]).bounds(method) == (-np.inf, np.inf)
@@ -0,0 +1,77 @@
+"""
+Tests for utils.profile (shared single-pass dataset profile)
+Run: python -m pytest -q test_profile.py
+"""
+
+import gc
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import profile as profile_mod
+from utils.profile import build_profile, cached_profile, frame_cached, get_profile
+
+
+def sample_frame(n=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "num": np.where(rng.random(n) < 0.1, np.nan, rng.normal(size=n)),
+        "cat": rng.choice(["a", "b", None], n),
+        "ints": rng.integers(0, 5, n),
+    })
+    df.loc[n - 5:, "num"] = 100.0  # a few far outliers
+    return pd.concat([df, df.iloc[:3]], ignore_index=True)  # some duplicate rows
+
+
+def test_stats_match_pandas():
+    df = sample_frame()
+    p = build_profile(df, with_analyzer=False)
+    assert (p.n_rows, p.n_cols) == df.shape
+    assert dict(p.missing) == {c: int(v) for c, v in df.isna().sum().items()}
+    assert p.missing_total == int(df.isna().sum().sum())
+    assert p.duplicates == int(df.duplicated().sum())
+    assert dict(p.cardinality) == {c: int(v) for c, v in df.nunique().items()}
+    stats = p.numeric_stats["num"]
+    assert stats["mean"] == pytest.approx(df["num"].mean())
+    assert stats["q3"] == pytest.approx(df["num"].quantile(0.75))
+    assert set(p.numeric_stats) == {"num", "ints"}
+    assert p.outliers["num"] >= 5
+    assert p.to_dict()["shape"] == list(df.shape)
+
+
+def test_profile_is_cached_per_frame_object():
+    df = sample_frame()
+    p = get_profile(df, with_analyzer=False)
+    assert get_profile(df, with_analyzer=False) is p and cached_profile(df) is p
+    assert get_profile(df.copy(), with_analyzer=False) is not p
+    with pytest.raises(TypeError):
+        p.missing["num"] = 0  # read-only
+
+
+def test_cache_entries_go_with_the_frame():
+    df = sample_frame()
+    calls = []
+    frame_cached(df, "probe", lambda: calls.append(1) or len(calls))
+    assert frame_cached(df, "probe", lambda: calls.append(1) or len(calls)) == 1
+    key = id(df)
+    del df
+    gc.collect()
+    assert not any(k[0] == key for k in profile_mod._FRAME_CACHE)
+
+
+def test_default_profile_does_not_run_the_analyzer(monkeypatch):
+    monkeypatch.setitem(sys.modules, "utils.data_analyzer", None)  # importing it would raise
+    df = sample_frame()
+    p = get_profile(df)
+    assert p.suggestions == {} and p.column_info is None
+    assert build_profile(df).duplicates == p.duplicates
+
+
+def test_full_profile_runs_the_analyzer_once():
+    pytest.importorskip("utils.data_analyzer")
+    df = sample_frame()
+    p = get_profile(df, with_analyzer=True)
+    assert get_profile(df, with_analyzer=True) is p
+    assert get_profile(df, with_analyzer=False) is p  # a full profile answers stats-only calls
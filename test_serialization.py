@@ -0,0 +1,74 @@
+"""
+Tests for utils.serialization (fast JSON and Arrow IPC responses)
+Run: python -m pytest -q test_serialization.py
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("fastapi")
+
+from utils import serialization  # noqa: E402
+from utils.serialization import dumps, histogram_table, matrix_table, profile_frame, wants_arrow  # noqa: E402
+
+PAYLOAD = {
+    "matrix": np.array([[1.0, np.nan], [np.inf, -np.inf]]),
+    "counts": np.arange(3, dtype=np.int64),
+    "scalar": np.float32(0.5),
+    "nan": float("nan"),
+    "when": pd.Timestamp("2024-01-02"),
+    "missing": pd.NA,
+    3: [np.int64(7), {"nested": np.nan}],
+}
+EXPECTED = {
+    "matrix": [[1.0, None], [None, None]],
+    "counts": [0, 1, 2],
+    "scalar": 0.5,
+    "nan": None,
+    "when": "2024-01-02 00:00:00",
+    "missing": None,
+    "3": [7, {"nested": None}],
+}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_writes_numpy_and_nulls_non_finite(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    assert json.loads(dumps(PAYLOAD)) == EXPECTED
+
+
+def test_arrow_tables():
+    pa = pytest.importorskip("pyarrow")
+    assert wants_arrow("application/json, application/vnd.apache.arrow.stream")
+    assert not wants_arrow("application/json") and not wants_arrow(None)
+
+    table = matrix_table(["a", "b"], np.array([[1.0, 0.5], [0.5, 1.0]]))
+    assert table.column_names == ["column", "a", "b"]
+    assert table.column("b").to_pylist() == [0.5, 1.0]
+
+    hist = histogram_table({"x": {"counts": np.array([2, 3]), "bin_edges": np.array([0.0, 1.0, 2.0])},
+                            "y": {"counts": np.array([5]), "bin_edges": np.array([4.0, 6.0])}})
+    assert hist.column("column").to_pylist() == ["x", "x", "y"]
+    assert hist.column("bin_start").to_pylist() == [0.0, 1.0, 4.0]
+    assert hist.column("count").to_pylist() == [2, 3, 5]
+    assert histogram_table({}).num_rows == 0
+    assert isinstance(hist.column("column").type, pa.DictionaryType)
+
+
+def test_profile_frame():
+    frame = profile_frame({
+        "dtypes": {"a": "float64", "b": "object"},
+        "missing": {"a": 1, "b": 0},
+        "cardinality": {"a": 4, "b": 2},
+        "outliers": {"a": 0},
+        "numeric_stats": {"a": {"mean": 2.0, "std": None, "q1": 1.0}},
+    })
+    assert frame["column"].tolist() == ["a", "b"]
+    assert frame.loc[0, "mean"] == 2.0 and np.isnan(frame.loc[0, "std"]) and np.isnan(frame.loc[1, "mean"])
+    assert frame["outliers"].dtype == "Int64" and frame["outliers"].isna().tolist() == [False, True]
@@ -0,0 +1,77 @@
+"""
+Tests for utils.streaming_clean (two-pass out-of-core cleaning)
+Run: python -m pytest -q test_streaming_clean.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("utils.data_cleaner")
+
+from utils import ingest  # noqa: E402
+from utils.streaming_clean import stream_clean  # noqa: E402
+
+BLOCK = 16 * 1024  # many chunks for a few thousand rows
+
+
+def write_csv(tmp_path, n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "id": np.arange(n),
+        "amount": np.where(rng.random(n) < 0.1, np.nan, rng.uniform(90, 110, n).round(2)),
+        "flag": ["x"] * n,
+        "city": rng.choice([" Paris", "Berlin ", "Rome"], n),
+    })
+    df.loc[n - 1, "flag"] = "y"  # constant only within the first chunk
+    df.loc[n // 2, "amount"] = 10_000.0  # a far outlier
+    df = pd.concat([df, df.iloc[10:20]], ignore_index=True)  # duplicates in the last chunk
+    path = tmp_path / "in.csv"
+    df.to_csv(path, index=False)
+    return path, df
+
+
+SUGGESTIONS = {
+    "dupes": {"type": "duplicates"},
+    "fill": {"type": "missing_numeric", "column": "amount"},
+    "const": {"type": "constant_column", "column": "flag"},
+    "trim": {"type": "whitespace", "column": "city"},
+    "outliers": {"type": "outliers", "column": "amount"},
+    "gone": {"type": "missing_numeric", "column": "nope"},
+}
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "csv"])
+def test_stream_clean_matches_whole_file_statistics(tmp_path, fmt):
+    path, df = write_csv(tmp_path)
+    out = tmp_path / f"out.{fmt}"
+    seen = []
+    result = stream_clean(str(path), str(out), SUGGESTIONS, fmt=fmt, block_bytes=BLOCK, progress=seen.append)
+    assert result.chunks > 3 and result.rows_in == len(df)
+    cleaned = pd.read_parquet(out) if fmt == "parquet" else pd.read_csv(out)
+
+    assert "Removed 10 duplicate rows" in result.log
+    assert result.rows_out == len(df) - 10 - 1  # duplicates and the outlier row
+    assert len(cleaned) == result.rows_out and cleaned["id"].is_unique
+    assert "flag" in cleaned.columns  # not constant past the first chunk
+    assert "Kept 'flag': not constant beyond the sample" in result.log
+    assert set(cleaned["city"]) == {"Paris", "Berlin", "Rome"}
+    assert not cleaned["amount"].isna().any()
+    # Fills use the mean over every row read in pass 1, outlier included
+    filled = cleaned.loc[cleaned["id"].isin(df.loc[df["amount"].isna(), "id"]), "amount"]
+    np.testing.assert_allclose(filled.unique(), [df["amount"].mean()])
+    assert list(result.skipped) == ["gone"]
+    assert seen[-1] == 1.0
+
+
+def test_types_are_widened_when_later_chunks_disagree(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "CSV_SAMPLE_BYTES", 1024)
+    n = 3000
+    values = [str(i) for i in range(n - 1)] + ["2.5"]
+    path = tmp_path / "in.csv"
+    pd.DataFrame({"v": values, "w": range(n)}).to_csv(path, index=False)
+    result = stream_clean(str(path), str(tmp_path / "out.parquet"),
+                          {"fill": {"type": "missing_numeric", "column": "v"}}, block_bytes=4096)
+    cleaned = pd.read_parquet(tmp_path / "out.parquet")
+    assert result.rows_out == n and cleaned["v"].iloc[-1] == 2.5
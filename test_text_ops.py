@@ -0,0 +1,44 @@
+"""
+Tests for utils.text_ops (string work on distinct values)
+Run: python -m pytest -q test_text_ops.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.text_ops import boolean_mapping, broadcast_codes, map_unique
+
+
+def test_map_unique_matches_per_row_and_keeps_missing():
+    values = pd.Series([" a", "b ", None, " a", "B"] * 20, index=np.arange(100) * 3, dtype=object)
+    calls = []
+
+    def clean(u):
+        calls.append(len(u))
+        return u.str.strip().str.lower()
+
+    out = map_unique(values, clean)
+    expected = values.str.strip().str.lower()
+    assert out.index.equals(values.index)
+    assert out.fillna("<na>").tolist() == expected.fillna("<na>").tolist()
+    assert calls == [3]  # each distinct value transformed once; missing values untouched
+
+
+def test_map_unique_can_pass_missing_values():
+    values = pd.Series(["x", None, "x"], dtype=object)
+    out = map_unique(values, lambda u: u.fillna("missing"), include_na=True)
+    assert out.tolist() == ["x", "missing", "x"]
+
+
+def test_broadcast_codes_uses_the_target_index():
+    like = pd.Series(["p", "q", "p"], index=[10, 20, 30], name="col")
+    codes, uniques = pd.factorize(like)
+    out = broadcast_codes(pd.Series(uniques).str.upper(), codes, like)
+    assert out.index.tolist() == [10, 20, 30] and out.name == "col"
+    assert out.tolist() == ["P", "Q", "P"]
+
+
+def test_boolean_mapping():
+    assert boolean_mapping(pd.Series(["Yes", "no ", None, "TRUE"])) == {"Yes": True, "no ": False, "TRUE": True}
+    assert boolean_mapping(pd.Series(["yes", "maybe"])) is None
+    assert boolean_mapping(pd.Series([None, None], dtype=object)) is None
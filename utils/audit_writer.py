@@ -0,0 +1,322 @@
+"""
+Buffered, non-blocking audit pipeline.
+
+``audit_event(role, action, details)`` stamps the event and appends it to a
+bounded in-memory queue; one background thread drains the queue in batches
+and hands every batch to the configured sinks, so request handlers and
+Streamlit callbacks never wait on file or database I/O.
+
+- Batches are written when BATCH events are waiting or FLUSH_SECONDS after
+  the oldest one arrived; ``flush`` waits for everything queued so far and
+  ``close`` (also registered with ``atexit``) flushes and stops the thread.
+- When the queue is full, OVERFLOW decides: "block" waits up to
+  BLOCK_SECONDS for room (then drops), "drop" discards the new event, and
+  "spill" appends it to a JSON-lines spill file that the writer replays
+  once it has caught up.
+- ``stats`` reports queue depth, peak depth and counters for enqueued,
+  written, dropped, spilled and failed events.
+
+Sinks receive a list of events (dicts with ts, role, action, details). By
+default they are ``utils.audit.write_audit`` and, when importable,
+``utils.audit_store.write_audit_db``, called per event from the writer
+thread so their file and table formats stay as they are. Setting
+DATA_CLEANER_AUDIT_FILE / DATA_CLEANER_AUDIT_DB replaces them with the
+batched ``JsonlFileSink`` (one write per batch) / ``SQLiteSink`` (one
+``executemany`` transaction per batch).
+
+Configuration (environment):
+- DATA_CLEANER_AUDIT_QUEUE: max queued events (default 10000)
+- DATA_CLEANER_AUDIT_BATCH: max events per batch (default 500)
+- DATA_CLEANER_AUDIT_FLUSH_SECONDS: max delay before a partial batch is written (default 1.0)
+- DATA_CLEANER_AUDIT_OVERFLOW: "block" (default), "drop" or "spill"
+- DATA_CLEANER_AUDIT_BLOCK_SECONDS: longest wait for room under "block" (default 2.0)
+- DATA_CLEANER_AUDIT_SPILL: spill file (default <tmp>/data_cleaner_audit_spill.jsonl)
+- DATA_CLEANER_AUDIT_FILE: batched JSON-lines audit log instead of write_audit
+- DATA_CLEANER_AUDIT_DB: batched SQLite audit table instead of write_audit_db
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+AUDIT_QUEUE = int(os.getenv("DATA_CLEANER_AUDIT_QUEUE", "10000"))
+AUDIT_BATCH = int(os.getenv("DATA_CLEANER_AUDIT_BATCH", "500"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("DATA_CLEANER_AUDIT_FLUSH_SECONDS", "1.0"))
+AUDIT_OVERFLOW = os.getenv("DATA_CLEANER_AUDIT_OVERFLOW", "block")
+AUDIT_BLOCK_SECONDS = float(os.getenv("DATA_CLEANER_AUDIT_BLOCK_SECONDS", "2.0"))
+AUDIT_SPILL = os.getenv("DATA_CLEANER_AUDIT_SPILL") or os.path.join(tempfile.gettempdir(), "data_cleaner_audit_spill.jsonl")
+
+OVERFLOW_POLICIES = ("block", "drop", "spill")
+
+Event = Dict[str, Any]
+Sink = Callable[[List[Event]], None]
+
+
+def per_event(write: Callable[[str, str, Dict[str, Any]], Any]) -> Sink:
+    """Adapt a ``write(role, action, details)`` function to a batch sink."""
+    def sink(events: List[Event]) -> None:
+        for event in events:
+            write(event["role"], event["action"], event["details"])
+    return sink
+
+
+class JsonlFileSink:
+    """Appends each batch to a JSON-lines file with a single write."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def __call__(self, events: List[Event]) -> None:
+        data = "".join(json.dumps(e, default=str) + "\n" for e in events)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(data)
+
+
+class SQLiteSink:
+    """Inserts each batch into an ``audit`` table in one transaction."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS audit (ts REAL, role TEXT, action TEXT, details TEXT)")
+        conn.close()
+
+    def __call__(self, events: List[Event]) -> None:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO audit (ts, role, action, details) VALUES (?, ?, ?, ?)",
+                    [(e["ts"], e["role"], e["action"], json.dumps(e["details"], default=str)) for e in events],
+                )
+        finally:
+            conn.close()
+
+
+def default_sinks() -> List[Sink]:
+    sinks: List[Sink] = []
+    if os.getenv("DATA_CLEANER_AUDIT_FILE"):
+        sinks.append(JsonlFileSink(os.environ["DATA_CLEANER_AUDIT_FILE"]))
+    else:
+        from utils.audit import write_audit
+        sinks.append(per_event(write_audit))
+    if os.getenv("DATA_CLEANER_AUDIT_DB"):
+        sinks.append(SQLiteSink(os.environ["DATA_CLEANER_AUDIT_DB"]))
+    else:
+        try:
+            from utils.audit_store import write_audit_db
+        except Exception:
+            pass
+        else:
+            sinks.append(per_event(write_audit_db))
+    return sinks
+
+
+class AuditWriter:
+    """Bounded queue of audit events drained in batches by one background thread."""
+
+    def __init__(
+        self,
+        sinks: List[Sink],
+        max_queue: int = AUDIT_QUEUE,
+        batch_size: int = AUDIT_BATCH,
+        flush_seconds: float = AUDIT_FLUSH_SECONDS,
+        overflow: str = AUDIT_OVERFLOW,
+        block_seconds: float = AUDIT_BLOCK_SECONDS,
+        spill_path: str = AUDIT_SPILL,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'; choose from {OVERFLOW_POLICIES}")
+        self.sinks = list(sinks)
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self.spill_path = spill_path
+        self._queue: Deque[Event] = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed = 0
+        self.batches = 0
+        self.max_depth = 0
+        self._thread = threading.Thread(target=self._run, name="data-cleaner-audit", daemon=True)
+        self._thread.start()
+
+    # --- Producers ---
+
+    def submit(self, role: str, action: str, details: Optional[Dict[str, Any]] = None) -> bool:
+        """Queue one event; False when it was dropped (or the writer is closed)."""
+        event = {"ts": time.time(), "role": role, "action": action, "details": dict(details or {})}
+        with self._cond:
+            if self._closed:
+                self.dropped += 1
+                return False
+            if len(self._queue) >= self.max_queue:
+                if self.overflow == "block":
+                    deadline = time.monotonic() + self.block_seconds
+                    while len(self._queue) >= self.max_queue and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                if len(self._queue) >= self.max_queue or self._closed:
+                    if self.overflow != "spill":
+                        self.dropped += 1
+                        return False
+                    self.spilled += 1
+                    spill = True
+                else:
+                    spill = False
+            else:
+                spill = False
+            if not spill:
+                self._queue.append(event)
+                self.enqueued += 1
+                self.max_depth = max(self.max_depth, len(self._queue))
+                if len(self._queue) >= self.batch_size:
+                    self._cond.notify_all()
+                return True
+        self._spill(event)
+        return True
+
+    def _spill(self, event: Event) -> None:
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(event, default=str) + "\n")
+
+    def _take_spill(self) -> List[Event]:
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return []
+            claimed = self.spill_path + ".replay"
+            os.replace(self.spill_path, claimed)
+        events = []
+        with open(claimed, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    self.failed += 1  # torn line from a crash mid-write
+        os.remove(claimed)
+        return events
+
+    # --- Writer thread ---
+
+    def _write(self, batch: List[Event]) -> None:
+        ok = True
+        for sink in self.sinks:
+            try:
+                sink(batch)
+            except Exception:
+                ok = False
+        self.batches += 1
+        if ok:
+            self.written += len(batch)
+        else:
+            self.failed += len(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_seconds
+                while (len(self._queue) < self.batch_size and not self._flush_requested and not self._closed):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                idle = not self._queue
+                closing = self._closed
+                self._cond.notify_all()  # room for blocked producers
+            if batch:
+                self._write(batch)
+            if idle and self.overflow == "spill":
+                # Caught up: replay what overflowed, oldest first
+                spilled = self._take_spill()
+                for start in range(0, len(spilled), self.batch_size):
+                    self._write(spilled[start:start + self.batch_size])
+            with self._cond:
+                self._in_flight = 0
+                if not self._queue:
+                    self._flush_requested = False
+                self._cond.notify_all()
+                if closing and not self._queue:
+                    return
+
+    # --- Control ---
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every event queued so far is written; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._queue or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush and stop the writer thread; later events are counted as dropped."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            depth = len(self._queue)
+        return {
+            "queue_depth": depth,
+            "max_depth": self.max_depth,
+            "capacity": self.max_queue,
+            "overflow": self.overflow,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+_WRITER: Optional[AuditWriter] = None
+_WRITER_LOCK = threading.Lock()
+
+
+def get_audit_writer() -> AuditWriter:
+    """Return the process-wide writer, starting it on first use."""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = AuditWriter(default_sinks())
+            atexit.register(_WRITER.close)
+        return _WRITER
+
+
+def audit_event(role: str, action: str, details: Optional[Dict[str, Any]] = None) -> bool:
+    """Queue an audit event on the process-wide writer (never blocks on I/O)."""
+    return get_audit_writer().submit(role, action, details)
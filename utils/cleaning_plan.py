@@ -0,0 +1,517 @@
+"""
+Cleaning-plan compiler.
+
+``compile_plan`` turns the analyzer's suggestion dict into an ordered list of
+stages instead of dispatching one DataCleaner call per suggestion:
+
+1. Row stages: ``remove_duplicates`` first, then near-duplicate removal
+   (``utils.near_dedup``, one row kept per cluster; only when the suggestion
+   is ``confirmed`` after review), then outlier removal, so
+   every later stage touches fewer rows. All outlier columns share one stage: the
+   outlier engine (``utils.outliers``) computes every column's bounds
+   together and filters the frame once. Columns converted by the plan are
+   checked in a second such stage after the column stages.
+2. Column stages: all ops on one column, in a fixed order (text
+   normalisation, conversions, then fills). Elementwise string transforms
+   (whitespace, case, boolean text, percentages) are fused: they run once on
+   the column's distinct values in a scratch DataCleaner and the result is
+   mapped back through the factorize codes (``utils.text_ops.broadcast_codes``).
+3. Column removals (constant columns), then dtype compaction (the "compact"
+   suggestion, ``utils.compaction``) on the cleaned frame.
+
+Consecutive column stages touch disjoint columns, so ``execute_plan`` runs
+them concurrently, each on a single-column DataCleaner, and swaps the result
+columns back into the frame. Threads are used when the work runs in C with
+the GIL released (numeric fills, Arrow-backed strings); string ops on Python
+objects go to a process pool. Row, removal and compaction stages are barriers.
+
+``execute_plan`` runs the stages with DataCleaner, so recorded operations
+are the cleaner's own, and returns a ``PlanResult`` with the estimated vs
+actual cost of every stage. The log has exactly one line per op, counted in
+rows: the cleaner's own message, except for fused ops (the cleaner only saw
+distinct values, so the plan reports how many rows changed) and datetime
+parsing, which goes through ``utils.datetime_parse`` (distinct values,
+inferred format) and logs how many values failed to parse instead of the
+cleaner's line.
+
+Configuration (environment):
+- DATA_CLEANER_PLAN_FUSE_RATIO: fuse only when distinct/rows is at most this
+  (default 0.5)
+- DATA_CLEANER_PLAN_PARALLEL: "auto" (default), "thread", "process" or "off"
+- DATA_CLEANER_PLAN_WORKERS: worker limit (default: CPU count, at most 8)
+- DATA_CLEANER_PLAN_PARALLEL_MIN_ROWS: run serially below this (default 100000)
+- DATA_CLEANER_PLAN_PROCESS_MIN_ROWS: smallest frame sent to processes
+  (default 250000)
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.compaction import compact_dataframe
+from utils.data_cleaner import DataCleaner
+from utils.datetime_parse import parse_datetime_series
+from utils.near_dedup import drop_near_duplicates, find_near_duplicates
+from utils.outliers import remove_outliers
+from utils.profile import cached_profile
+from utils.text_ops import broadcast_codes
+
+FUSE_RATIO = float(os.getenv("DATA_CLEANER_PLAN_FUSE_RATIO", "0.5"))
+PLAN_PARALLEL = os.getenv("DATA_CLEANER_PLAN_PARALLEL", "auto")
+PLAN_WORKERS = int(os.getenv("DATA_CLEANER_PLAN_WORKERS", str(min(os.cpu_count() or 1, 8))))
+PARALLEL_MIN_ROWS = int(os.getenv("DATA_CLEANER_PLAN_PARALLEL_MIN_ROWS", "100000"))
+PROCESS_MIN_ROWS = int(os.getenv("DATA_CLEANER_PLAN_PROCESS_MIN_ROWS", "250000"))
+
+# Per-column execution order
+COLUMN_OP_ORDER = [
+    "whitespace",
+    "text_case",
+    "boolean_text",
+    "percentage_string",
+    "datetime_parse",
+    "data_type",
+    "missing_categorical",
+    "missing_numeric",
+]
+# Elementwise string transforms: result depends only on each value
+FUSABLE_OPS = {"whitespace", "text_case", "boolean_text", "percentage_string"}
+# Ops that change a column's type; row filters on that column must wait for them
+CONVERTING_OPS = {"boolean_text", "percentage_string", "datetime_parse", "data_type"}
+# Vectorized in C regardless of column dtype
+GIL_FREE_OPS = {"missing_numeric"}
+
+_POOL_LOCK = threading.Lock()
+_THREAD_POOL: Optional[ThreadPoolExecutor] = None
+_PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass(frozen=True)
+class PlanOp:
+    key: str
+    type: str
+    column: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Stage:
+    name: str
+    kind: str  # "rows" | "column" | "drop_columns" | "compact"
+    ops: List[PlanOp]
+    column: Optional[str] = None
+    fused: bool = False
+    est_cells: int = 0
+
+
+@dataclass
+class StageReport:
+    name: str
+    kind: str
+    ops: List[str]
+    fused: bool
+    est_cells: int
+    actual_cells: int
+    seconds: float
+    mode: str = "serial"  # serial | thread | process
+
+
+@dataclass
+class CleaningPlan:
+    stages: List[Stage]
+    n_rows: int
+    n_cols: int
+    skipped: List[str] = field(default_factory=list)  # suggestion keys with no executable op
+
+    @property
+    def est_cells(self) -> int:
+        return sum(s.est_cells for s in self.stages)
+
+    def describe(self) -> List[str]:
+        lines = []
+        for i, stage in enumerate(self.stages, 1):
+            fused = " [fused]" if stage.fused else ""
+            lines.append(f"{i}. {stage.name}{fused}: {', '.join(op.type for op in stage.ops)} (~{stage.est_cells:,} cells)")
+        return lines
+
+
+@dataclass
+class PlanResult:
+    df: pd.DataFrame
+    log: List[str]
+    operations: List[Any]
+    stages: List[StageReport]
+
+    def report_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([
+            {
+                "stage": r.name,
+                "ops": ", ".join(r.ops),
+                "fused": r.fused,
+                "est_cells": r.est_cells,
+                "actual_cells": r.actual_cells,
+                "seconds": round(r.seconds, 4),
+                "mode": r.mode,
+            }
+            for r in self.stages
+        ])
+
+
+def _run_op(cleaner: DataCleaner, op: PlanOp) -> Optional[str]:
+    """Run ``op`` on ``cleaner``; returns a log line replacing the cleaner's own for steps it cannot describe."""
+    col = op.column
+    t = op.type
+    if t == "missing_numeric":
+        cleaner.fill_missing_numeric(col, method="mean")
+    elif t == "missing_categorical":
+        cleaner.fill_missing_categorical(col)
+    elif t == "duplicates":
+        cleaner.remove_duplicates()
+    elif t == "data_type":
+        cleaner.convert_data_type(col, op.params.get("target_type", "numeric"))
+        # Optimize: if became float but has no fraction, use Int64
+        cleaner.convert_float_to_int_if_possible(col)
+    elif t == "whitespace":
+        cleaner.trim_whitespace([col])
+    elif t == "text_case":
+        cleaner.standardize_text_case([col], case="lower")
+    elif t == "datetime_parse":
+        # Parse distinct values with an inferred format, then let the cleaner
+        # record its step (a no-op on a column that is already datetime)
+        parsed = parse_datetime_series(cleaner.df[col])
+        cleaner.df[col] = parsed.values
+        cleaner.parse_datetime(col)
+        return parsed.message(col)
+    elif t == "constant_column":
+        cleaner.remove_columns([col])
+    elif t == "boolean_text":
+        cleaner.convert_boolean_text(col)
+    elif t == "percentage_string":
+        cleaner.convert_percentage_strings(col)
+    return None
+
+
+def _run_logged(cleaner: DataCleaner, op: PlanOp) -> List[str]:
+    """Run ``op`` and return its log line(s): the cleaner's, or the replacement from ``_run_op``."""
+    n_log = len(cleaner.get_cleaning_log())
+    note = _run_op(cleaner, op)
+    return [note] if note else list(cleaner.get_cleaning_log()[n_log:])
+
+
+# Log lines for fused ops, which the cleaner ran on distinct values only
+_FUSED_MESSAGES = {
+    "whitespace": "Trimmed whitespace in '{column}'",
+    "text_case": "Standardized text case in '{column}' to lower",
+    "boolean_text": "Converted '{column}' to boolean",
+    "percentage_string": "Converted percentage strings in '{column}' to numbers",
+}
+
+
+def _changed(before: pd.Series, after: pd.Series) -> np.ndarray:
+    """Positions where ``after`` differs from ``before`` (missing on both sides counts as equal)."""
+    before = before.astype(object).reset_index(drop=True)
+    after = after.astype(object).reset_index(drop=True)
+    same = before.eq(after).to_numpy(dtype=bool) | (before.isna() & after.isna()).to_numpy()
+    return ~same
+
+
+EXECUTABLE_OPS = set(COLUMN_OP_ORDER) | {"duplicates", "near_duplicates", "outliers", "constant_column", "compact"}
+# Table-level ops without a target column
+_TABLE_OPS = {"duplicates", "near_duplicates", "compact"}
+
+
+def _outlier_stage(ops: List[PlanOp], n_rows: int) -> Stage:
+    columns = ", ".join(str(op.column) for op in ops)
+    return Stage(f"outliers: {columns}", "rows", ops, est_cells=n_rows * len(ops))
+
+
+def compile_plan(df: pd.DataFrame, suggestions: Dict[str, Dict[str, Any]]) -> CleaningPlan:
+    """Compile analyzer suggestions for ``df`` into an ordered ``CleaningPlan``."""
+    n_rows, n_cols = df.shape
+    profile = cached_profile(df)
+    cardinality = profile.cardinality if profile is not None else {}
+
+    duplicates: List[PlanOp] = []
+    near_duplicates: List[PlanOp] = []
+    outliers: List[PlanOp] = []
+    dropped: List[PlanOp] = []
+    compact: List[PlanOp] = []
+    per_column: Dict[str, List[PlanOp]] = {}
+    skipped: List[str] = []
+    seen = set()
+    for key, suggestion in suggestions.items():
+        t = suggestion.get("type")
+        col = suggestion.get("column")
+        if t not in EXECUTABLE_OPS or (t not in _TABLE_OPS and col not in df.columns):
+            skipped.append(key)
+            continue
+        if t == "near_duplicates" and not suggestion.get("confirmed"):
+            # Merging clusters deletes rows; only after the user has reviewed them
+            skipped.append(key)
+            continue
+        if (t, col) in seen:  # the same op twice is a no-op the second time
+            skipped.append(key)
+            continue
+        seen.add((t, col))
+        params = {"target_type": suggestion.get("target_type", "numeric")} if t == "data_type" else {}
+        if t == "near_duplicates":
+            params = {"columns": suggestion.get("columns"), "threshold": suggestion.get("threshold")}
+        op = PlanOp(key, t, col, params)
+        if t == "duplicates":
+            duplicates.append(op)
+        elif t == "near_duplicates":
+            near_duplicates.append(op)
+        elif t == "outliers":
+            outliers.append(op)
+        elif t == "constant_column":
+            dropped.append(op)
+        elif t == "compact":
+            compact.append(op)
+        else:
+            per_column.setdefault(col, []).append(op)
+
+    stages: List[Stage] = []
+    if duplicates:
+        stages.append(Stage("remove duplicates", "rows", duplicates[:1], est_cells=n_rows * n_cols))
+    if near_duplicates:
+        columns = near_duplicates[0].params.get("columns") or []
+        stages.append(Stage("remove near-duplicates", "rows", near_duplicates[:1],
+                            est_cells=n_rows * max(len(columns), 1)))
+    deferred = [op for op in outliers if any(o.type in CONVERTING_OPS for o in per_column.get(op.column, []))]
+    early = [op for op in outliers if op not in deferred]
+    if early:
+        stages.append(_outlier_stage(early, n_rows))
+
+    for col, ops in per_column.items():
+        ops = sorted(ops, key=lambda o: COLUMN_OP_ORDER.index(o.type))
+        n_fusable = sum(1 for o in ops if o.type in FUSABLE_OPS)
+        distinct = cardinality.get(str(col))
+        fused = n_fusable > 0 and (distinct is None or distinct <= FUSE_RATIO * max(n_rows, 1))
+        if fused:
+            est = n_rows * 2 + (distinct if distinct is not None else n_rows) * n_fusable + n_rows * (len(ops) - n_fusable)
+        else:
+            est = n_rows * len(ops)
+        stages.append(Stage(f"column: {col}", "column", ops, column=col, fused=fused, est_cells=est))
+    if deferred:
+        stages.append(_outlier_stage(deferred, n_rows))
+
+    if dropped:
+        stages.append(Stage("remove constant columns", "drop_columns", dropped, est_cells=len(dropped)))
+    if compact:
+        stages.append(Stage("compact dtypes", "compact", compact[:1], est_cells=n_rows * n_cols))
+    return CleaningPlan(stages, n_rows, n_cols, skipped)
+
+
+def _operations(cleaner: DataCleaner) -> List[Any]:
+    return list(cleaner.get_operations()) if hasattr(cleaner, "get_operations") else []
+
+
+@dataclass
+class _ColumnOutcome:
+    values: pd.Series
+    log: List[str]
+    operations: List[Any]
+    actual_cells: int
+    fused: bool
+    seconds: float
+
+
+def run_column_stage(column: Any, values: pd.Series, ops: List[PlanOp], fuse: bool) -> _ColumnOutcome:
+    """Run one column stage on a single-column DataCleaner.
+
+    Module-level and argument-only so it can run in a worker process.
+    """
+    start = time.perf_counter()
+    rows = len(values)
+    log: List[str] = []
+    operations: List[Any] = []
+    remaining = ops
+    actual = rows * len(ops)
+    fused = False
+
+    if fuse:
+        fusable = [op for op in ops if op.type in FUSABLE_OPS]
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        if fusable and len(uniques) <= FUSE_RATIO * max(rows, 1):
+            per_unique = np.bincount(codes, minlength=len(uniques))
+
+            def clean_uniques(uniques: pd.Series) -> pd.Series:
+                scratch = DataCleaner(uniques.to_frame(name=column))
+                for op in fusable:
+                    before = scratch.df[column]
+                    _run_op(scratch, op)
+                    # The scratch cleaner's message counts distinct values; report rows
+                    changed = int(per_unique[_changed(before, scratch.df[column])].sum())
+                    log.append(_FUSED_MESSAGES[op.type].format(column=column)
+                               + f" ({changed:,} of {rows:,} rows changed)")
+                operations.extend(_operations(scratch))
+                return scratch.df[column]
+
+            values = broadcast_codes(clean_uniques(pd.Series(uniques, name=column)), codes, values)
+            remaining = [op for op in ops if op.type not in FUSABLE_OPS]
+            actual = rows * 2 + len(uniques) * len(fusable) + rows * len(remaining)
+            fused = True
+
+    if remaining:
+        cleaner = DataCleaner(values.to_frame(name=column))
+        for op in remaining:
+            log.extend(_run_logged(cleaner, op))
+        operations.extend(_operations(cleaner))
+        values = cleaner.df[column]
+    return _ColumnOutcome(values, log, operations, actual, fused, time.perf_counter() - start)
+
+
+def _is_python_string(values: pd.Series) -> bool:
+    return values.dtype == object or (isinstance(values.dtype, pd.StringDtype) and values.dtype.storage == "python")
+
+
+def _holds_gil(stage: Stage, values: pd.Series) -> bool:
+    """Whether the stage's work is dominated by Python-level loops.
+
+    Numeric fills and Arrow-backed string kernels run in C with the GIL
+    released, so threads scale; string ops on Python objects do not (even
+    fused, factorizing Python objects holds the GIL).
+    """
+    if all(op.type in GIL_FREE_OPS for op in stage.ops):
+        return False
+    return _is_python_string(values)
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    global _PROCESS_POOL
+    with _POOL_LOCK:
+        if _PROCESS_POOL is None:
+            # Never fork: the app and API run threads (audit writer, job
+            # heartbeats) whose locks a forked child could inherit held
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _PROCESS_POOL = ProcessPoolExecutor(max_workers=PLAN_WORKERS,
+                                                mp_context=multiprocessing.get_context(method))
+        return _PROCESS_POOL
+
+
+def _thread_pool() -> ThreadPoolExecutor:
+    global _THREAD_POOL
+    with _POOL_LOCK:
+        if _THREAD_POOL is None:
+            _THREAD_POOL = ThreadPoolExecutor(max_workers=PLAN_WORKERS, thread_name_prefix="cleaning-plan")
+        return _THREAD_POOL
+
+
+def _batch_mode(batch: List[Stage], df: pd.DataFrame, parallel: str) -> str:
+    if parallel == "off" or PLAN_WORKERS < 2 or len(batch) < 2 or len(df) < PARALLEL_MIN_ROWS:
+        return "serial"
+    if parallel in ("thread", "process"):
+        return parallel
+    gil_bound = sum(1 for stage in batch if _holds_gil(stage, df[stage.column]))
+    # Processes pay to pickle each column both ways; only worth it for Python-object work
+    return "process" if gil_bound >= 2 and len(df) >= PROCESS_MIN_ROWS else "thread"
+
+
+def _split_batches(stages: List[Stage]) -> List[List[Stage]]:
+    """Group consecutive column stages; row and drop stages are single-stage barriers."""
+    batches: List[List[Stage]] = []
+    for stage in stages:
+        if stage.kind == "column" and batches and batches[-1][0].kind == "column":
+            batches[-1].append(stage)
+        else:
+            batches.append([stage])
+    return batches
+
+
+def execute_plan(
+    df: pd.DataFrame,
+    plan: CleaningPlan,
+    progress: Optional[Callable[[int, int, str], None]] = None,
+    parallel: Optional[str] = None,
+) -> PlanResult:
+    """Execute ``plan`` on a copy of ``df``.
+
+    Consecutive column stages are independent and run concurrently;
+    ``parallel`` ("auto", "thread", "process" or "off", default
+    DATA_CLEANER_PLAN_PARALLEL) selects how. Row, removal and compaction
+    stages are barriers and run alone. ``progress(done, total, stage_name)`` is called as
+    stages complete.
+    """
+    parallel = parallel or PLAN_PARALLEL
+    cleaner = DataCleaner(df.copy())  # input frames are shared; never clean in place
+    log: List[str] = []
+    operations: List[Any] = []
+    reports: List[StageReport] = []
+    total = len(plan.stages)
+    done = 0
+
+    for batch in _split_batches(plan.stages):
+        if progress is not None:
+            progress(done, total, batch[0].name if len(batch) == 1 else f"{len(batch)} columns")
+
+        if batch[0].kind != "column":
+            stage = batch[0]
+            rows = len(cleaner.df)
+            start = time.perf_counter()
+            if stage.kind == "compact":
+                # Not a DataCleaner op: swap in the compacted frame and log its report
+                cleaner.df, compaction = compact_dataframe(cleaner.df)
+                log.append(compaction.summary())
+            elif stage.ops[0].type == "outliers":
+                # One bounds computation and one filter for every column in the stage
+                cleaner.df, found = remove_outliers(cleaner.df, [op.column for op in stage.ops])
+                log.append(found.message())
+                operations.extend(
+                    {"op": "remove_outliers", "column": op.column, "method": found.method,
+                     "threshold": found.threshold, "bounds": list(found.bounds.get(str(op.column), ()))}
+                    for op in stage.ops
+                )
+            elif stage.ops[0].type == "near_duplicates":
+                op = stage.ops[0]
+                found = find_near_duplicates(cleaner.df, op.params.get("columns"), op.params.get("threshold"))
+                cleaner.df = drop_near_duplicates(cleaner.df, found)
+                log.append(f"Removed {found.removable_rows} near-duplicate rows, keeping the first of each cluster: "
+                           f"{found.summary()}")
+                operations.append({"op": "remove_near_duplicates", "columns": found.columns,
+                                   "threshold": found.threshold, "clusters": found.n_clusters,
+                                   "rows_removed": found.removable_rows})
+            else:
+                n_ops = len(_operations(cleaner))
+                for op in stage.ops:
+                    log.extend(_run_logged(cleaner, op))
+                operations.extend(_operations(cleaner)[n_ops:])
+            if stage.ops[0].type in ("duplicates", "near_duplicates") or stage.kind == "compact":
+                actual = rows * cleaner.df.shape[1]
+            elif stage.kind == "drop_columns":
+                actual = len(stage.ops)
+            else:
+                actual = rows * len(stage.ops)
+            reports.append(StageReport(stage.name, stage.kind, [op.type for op in stage.ops], False,
+                                       stage.est_cells, actual, time.perf_counter() - start, "serial"))
+            done += 1
+            continue
+
+        mode = _batch_mode(batch, cleaner.df, parallel)
+        args = [(stage.column, cleaner.df[stage.column], stage.ops, stage.fused) for stage in batch]
+        if mode == "serial":
+            outcomes = [run_column_stage(*a) for a in args]
+        else:
+            pool = _process_pool() if mode == "process" else _thread_pool()
+            outcomes = [f.result() for f in [pool.submit(run_column_stage, *a) for a in args]]
+
+        # Reassemble: swap each result column into the frame (no other column is copied)
+        for stage, outcome in zip(batch, outcomes):
+            cleaner.df[stage.column] = outcome.values
+            log.extend(outcome.log)
+            operations.extend(outcome.operations)
+            reports.append(StageReport(stage.name, stage.kind, [op.type for op in stage.ops], outcome.fused,
+                                       stage.est_cells, outcome.actual_cells, outcome.seconds, mode))
+        done += len(batch)
+
+    if progress is not None:
+        progress(total, total, "done")
+    return PlanResult(cleaner.get_cleaned_data(), log, operations, reports)
+
@@ -0,0 +1,354 @@
+"""
+Dtype compaction.
+
+Parsers hand back int64, float64 and object/str columns regardless of the
+values they hold. ``compact_dataframe`` narrows every column to the smallest
+dtype that represents its values exactly:
+
+- integers: the smallest signed width holding min..max (nullable Int* stays
+  nullable)
+- floats (opt-in, ``downcast_floats``/DATA_CLEANER_COMPACT_FLOATS): float32
+  when every value round-trips through it unchanged; whole numbers without
+  missing values become the smallest signed integer. Off by default: means,
+  sums and quantiles computed on float32 differ from the float64 originals,
+  so statistics would change with the storage type
+- text: ``boolean`` when every value is a true/false token (true/false,
+  yes/no, y/n, t/f, 1/0, any case); ``category`` when distinct/rows and the
+  distinct count are under the thresholds. The default ratio is low (5%) so
+  only genuinely repetitive columns (status, country, flags) convert
+
+A conversion is kept only if it actually reduces the column's deep memory.
+The result carries a ``CompactionReport`` (before/after dtype and bytes per
+column), retrievable with ``memory_report(df)`` for as long as the frame
+lives; ``utils.dataset_cache`` stores it with a spilled frame and attaches it
+again on reload. ``compact_on_load`` is the hook the UI and API call right after
+parsing; the same compaction is offered as a "compact" suggestion and plan
+stage for frames that were not compacted on load.
+
+A ``category`` column rejects values outside its categories (assignment and
+``fillna`` raise), so ``editable`` hands editors a frame with those columns
+back in their plain dtype; the edited frame can be compacted again.
+
+Configuration (environment):
+- DATA_CLEANER_COMPACT_ON_LOAD: compact freshly loaded frames (default 1)
+- DATA_CLEANER_COMPACT_CATEGORY_RATIO: largest distinct/rows for category
+  (default 0.05)
+- DATA_CLEANER_COMPACT_CATEGORY_MAX: largest distinct count for category
+  (default 50000)
+- DATA_CLEANER_COMPACT_FLOATS: downcast floats to float32/integers (default 0)
+- DATA_CLEANER_COMPACT_MIN_SAVING: smallest saving (fraction of the frame)
+  worth raising a "compact" suggestion for (default 0.2)
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.profile import frame_cache_peek, frame_cache_pop, frame_cached
+from utils.text_ops import MAX_BOOLEAN_VARIANTS, boolean_mapping
+
+COMPACT_ON_LOAD = os.getenv("DATA_CLEANER_COMPACT_ON_LOAD", "1") not in ("0", "false", "False", "")
+CATEGORY_RATIO = float(os.getenv("DATA_CLEANER_COMPACT_CATEGORY_RATIO", "0.05"))
+CATEGORY_MAX = int(os.getenv("DATA_CLEANER_COMPACT_CATEGORY_MAX", "50000"))
+COMPACT_FLOATS = os.getenv("DATA_CLEANER_COMPACT_FLOATS", "0") not in ("0", "false", "False", "")
+MIN_SAVING = float(os.getenv("DATA_CLEANER_COMPACT_MIN_SAVING", "0.2"))
+
+_SIGNED = [(np.int8, "Int8"), (np.int16, "Int16"), (np.int32, "Int32"), (np.int64, "Int64")]
+
+
+@dataclass(frozen=True)
+class ColumnCompaction:
+    column: str
+    before_dtype: str
+    after_dtype: str
+    before_bytes: int
+    after_bytes: int
+
+    @property
+    def changed(self) -> bool:
+        return self.before_dtype != self.after_dtype
+
+
+@dataclass(frozen=True)
+class CompactionReport:
+    columns: Tuple[ColumnCompaction, ...]
+
+    @property
+    def before_bytes(self) -> int:
+        return sum(c.before_bytes for c in self.columns)
+
+    @property
+    def after_bytes(self) -> int:
+        return sum(c.after_bytes for c in self.columns)
+
+    @property
+    def ratio(self) -> float:
+        """before / after; 1.0 when nothing changed."""
+        return self.before_bytes / self.after_bytes if self.after_bytes else 1.0
+
+    @property
+    def changed(self) -> List[ColumnCompaction]:
+        return [c for c in self.columns if c.changed]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([
+            {
+                "column": c.column,
+                "dtype_before": c.before_dtype,
+                "dtype_after": c.after_dtype,
+                "bytes_before": c.before_bytes,
+                "bytes_after": c.after_bytes,
+            }
+            for c in self.columns
+        ])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready view used by the API /profile endpoint."""
+        return {
+            "before_bytes": self.before_bytes,
+            "after_bytes": self.after_bytes,
+            "ratio": round(self.ratio, 3),
+            "columns": {
+                c.column: {
+                    "dtype_before": c.before_dtype,
+                    "dtype_after": c.after_dtype,
+                    "bytes_before": c.before_bytes,
+                    "bytes_after": c.after_bytes,
+                }
+                for c in self.columns
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "CompactionReport":
+        """Inverse of ``to_dict``."""
+        return cls(tuple(
+            ColumnCompaction(column, c["dtype_before"], c["dtype_after"], int(c["bytes_before"]), int(c["bytes_after"]))
+            for column, c in data.get("columns", {}).items()
+        ))
+
+    def summary(self) -> str:
+        mb = 1024 * 1024
+        return (f"Compacted {len(self.changed)} column(s): {self.before_bytes / mb:.1f} MB -> "
+                f"{self.after_bytes / mb:.1f} MB ({self.ratio:.1f}x)")
+
+
+def _smallest_int(lo: Any, hi: Any, nullable: bool) -> Optional[str]:
+    for np_type, ext in _SIGNED:
+        info = np.iinfo(np_type)
+        if info.min <= lo and hi <= info.max:
+            return ext if nullable else np.dtype(np_type).name
+    return None
+
+
+def _compact_integers(s: pd.Series) -> pd.Series:
+    nullable = isinstance(s.dtype, pd.api.extensions.ExtensionDtype)
+    if s.dtype.kind == "u" or (nullable and s.dtype.name.startswith("UInt")):
+        return s  # unsigned columns are rare and already chosen deliberately
+    valid = s.dropna() if nullable else s
+    if valid.empty:
+        return s
+    target = _smallest_int(valid.min(), valid.max(), nullable)
+    return s.astype(target) if target is not None and target != s.dtype.name else s
+
+
+def _compact_floats(s: pd.Series) -> pd.Series:
+    values = s.to_numpy(dtype=np.float64, na_value=np.nan)
+    finite = np.isfinite(values)
+    if finite.all() and values.size and np.array_equal(values, np.floor(values)):
+        target = _smallest_int(values.min(), values.max(), nullable=False)
+        if target is not None:
+            return pd.Series(values.astype(target), index=s.index, name=s.name)
+    if s.dtype == np.float32:
+        return s
+    narrow = values.astype(np.float32)
+    with np.errstate(invalid="ignore"):
+        same = (narrow.astype(np.float64) == values) | ~finite
+    # NaN/inf survive the cast; finite values must round-trip exactly
+    if same.all():
+        return pd.Series(narrow, index=s.index, name=s.name)
+    return s
+
+
+def _boolean_text(s: pd.Series, uniques: pd.Index) -> Optional[pd.Series]:
+    if not len(uniques) or len(uniques) > MAX_BOOLEAN_VARIANTS:
+        return None
+    if not all(isinstance(u, str) for u in uniques):
+        return None
+    mapping = boolean_mapping(s)
+    return None if mapping is None else s.map(mapping).astype("boolean")
+
+
+def _compact_text(s: pd.Series, category_ratio: float, category_max: int) -> pd.Series:
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    as_bool = _boolean_text(s, uniques)
+    if as_bool is not None:
+        return as_bool
+    n = len(s)
+    if n and len(uniques) <= category_max and len(uniques) <= category_ratio * n:
+        if not all(isinstance(u, str) for u in uniques):
+            return s  # mixed object columns stay as they are
+        return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=s.index, name=s.name)
+    return s
+
+
+def compact_series(
+    s: pd.Series,
+    category_ratio: Optional[float] = None,
+    category_max: Optional[int] = None,
+    downcast_floats: Optional[bool] = None,
+) -> pd.Series:
+    """Narrowest exact representation of ``s`` (``s`` itself when nothing applies)."""
+    dtype = s.dtype
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return s
+    if pd.api.types.is_integer_dtype(dtype):
+        return _compact_integers(s)
+    if pd.api.types.is_float_dtype(dtype):
+        if not (COMPACT_FLOATS if downcast_floats is None else downcast_floats):
+            return s
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            return s  # nullable Float64 keeps its NA semantics
+        return _compact_floats(s)
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        return _compact_text(
+            s,
+            CATEGORY_RATIO if category_ratio is None else category_ratio,
+            CATEGORY_MAX if category_max is None else category_max,
+        )
+    return s
+
+
+def _column_bytes(s: pd.Series) -> int:
+    return int(s.memory_usage(index=False, deep=True))
+
+
+def compact_dataframe(
+    df: pd.DataFrame,
+    category_ratio: Optional[float] = None,
+    category_max: Optional[int] = None,
+    downcast_floats: Optional[bool] = None,
+) -> Tuple[pd.DataFrame, CompactionReport]:
+    """Compact every column of ``df``; returns the new frame and its report.
+
+    ``df`` is not modified. Unchanged columns are shared with the input, not
+    copied.
+    """
+    entries: List[ColumnCompaction] = []
+    out: Dict[Any, pd.Series] = {}
+    changed = False
+    for col in df.columns:
+        s = df[col]
+        before = _column_bytes(s)
+        compacted = compact_series(s, category_ratio, category_max, downcast_floats)
+        after = _column_bytes(compacted) if compacted is not s else before
+        if compacted is not s and after >= before:
+            compacted, after = s, before
+        changed = changed or compacted is not s
+        out[col] = compacted
+        entries.append(ColumnCompaction(str(col), str(s.dtype), str(compacted.dtype), before, after))
+    result = pd.DataFrame(out, index=df.index, copy=False) if changed else df
+    if changed:
+        result.attrs = dict(df.attrs)
+    report = CompactionReport(tuple(entries))
+    if changed:
+        attach_memory_report(result, report)
+    return result, report
+
+
+def attach_memory_report(df: pd.DataFrame, report: CompactionReport) -> None:
+    """Make ``report`` the one ``memory_report(df)`` returns (e.g. after a reload)."""
+    frame_cache_pop(df, "compaction_report")
+    frame_cached(df, "compaction_report", lambda: report)
+
+
+def memory_report(df: pd.DataFrame) -> CompactionReport:
+    """Before/after report for ``df``.
+
+    Frames produced by ``compact_dataframe`` return the report of that run;
+    any other frame reports its current per-column memory (before == after).
+    """
+    def build() -> CompactionReport:
+        return CompactionReport(tuple(
+            ColumnCompaction(str(c), str(df[c].dtype), str(df[c].dtype), b, b)
+            for c, b in zip(df.columns, (_column_bytes(df[c]) for c in df.columns))
+        ))
+    return frame_cached(df, "compaction_report", build)
+
+
+def stored_memory_report(df: pd.DataFrame) -> Optional[CompactionReport]:
+    """The report already attached to ``df``, if any (never computes)."""
+    return frame_cache_peek(df, "compaction_report")
+
+
+def compact_on_load(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """Load hook: compact ``df`` when DATA_CLEANER_COMPACT_ON_LOAD is set."""
+    if df is None or not COMPACT_ON_LOAD:
+        return df
+    return compact_dataframe(df)[0]
+
+
+def editable(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` with ``category`` columns converted back to their categories' dtype.
+
+    For editors and fills that may write new values; other columns are shared, not copied.
+    """
+    positions = [i for i, dtype in enumerate(df.dtypes) if isinstance(dtype, pd.CategoricalDtype)]
+    if not positions:
+        return df
+    out = df.copy(deep=False)
+    for i in positions:
+        values = out.iloc[:, i]
+        out.isetitem(i, values.astype(values.cat.categories.dtype))
+    return out
+
+
+def compaction_suggestion(
+    df: pd.DataFrame,
+    cardinality: Mapping[str, int],
+    numeric_stats: Mapping[str, Mapping[str, Optional[float]]],
+) -> Optional[Dict[str, Any]]:
+    """A "compact" suggestion when narrower dtypes would save enough memory.
+
+    Estimated from profile statistics only (no extra pass over the data):
+    int64 columns whose range fits a narrower integer, and text columns that
+    qualify for ``category``/``boolean``. Float downcasts are not estimated.
+    """
+    n_rows = len(df)
+    if n_rows == 0:
+        return None
+    columns: List[str] = []
+    saving = 0
+    for col, dtype in df.dtypes.items():
+        name = str(col)
+        if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(dtype) and dtype.itemsize > 1:
+            stats = numeric_stats.get(name) or {}
+            if stats.get("min") is None or stats.get("max") is None:
+                continue
+            target = _smallest_int(stats["min"], stats["max"], nullable=False)
+            if target is not None and np.dtype(target).itemsize < dtype.itemsize:
+                columns.append(name)
+                saving += (dtype.itemsize - np.dtype(target).itemsize) * n_rows
+        elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            distinct = cardinality.get(name)
+            if distinct is not None and (distinct <= 2 or (distinct <= CATEGORY_MAX and distinct <= CATEGORY_RATIO * n_rows)):
+                columns.append(name)
+                # Strings cost at least a pointer plus payload per row; codes are 1-2 bytes
+                saving += 8 * n_rows
+    total = int(df.memory_usage(index=True, deep=False).sum()) or 1
+    if not columns or saving < MIN_SAVING * total:
+        return None
+    return {
+        "type": "compact",
+        "columns": columns,
+        "issue": f"{len(columns)} column(s) are stored in wider types than their values need",
+        "action": "Compact column types (downcast numbers, category/boolean for repetitive text)",
+        "details": "Columns: " + ", ".join(columns[:20]) + (" ..." if len(columns) > 20 else ""),
+    }
@@ -0,0 +1,323 @@
+"""
+Process-wide cache of parsed datasets.
+
+Entries are keyed by a content hash of the uploaded bytes (or of the
+connection URL + query for database loads), so every session that uploads the
+same file shares one parsed DataFrame. The cache is bounded by a memory
+budget with LRU eviction; when a spill directory is configured, evicted
+entries are written to Parquet (to a temporary file renamed into place, index
+included) and transparently reloaded on the next hit, and frames larger than
+the whole budget live only there. Without a spill directory such a frame is
+still kept, alone in memory. Concurrent misses on one key load it once: the
+other callers wait for the first and share its frame. An optional TTL expires
+entries (in memory and on disk) that have not been accessed recently. A frame's compaction report (``utils.compaction``) is
+written into the Parquet metadata and attached again on reload, so
+``memory_report`` survives a spill.
+
+Configuration (environment):
+- DATA_CLEANER_CACHE_MB: in-memory budget (default 1024)
+- DATA_CLEANER_CACHE_DIR: optional on-disk Parquet spill directory
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.compaction import CompactionReport, attach_memory_report, stored_memory_report
+
+_REPORT_METADATA = b"data_cleaner.compaction_report"
+
+
+def content_key(data: bytes) -> str:
+    """Stable key for raw file bytes."""
+    return "file:" + hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def query_key(connection_url: str, table: Optional[str] = None, query: Optional[str] = None, limit: Optional[int] = None) -> str:
+    """Stable key for a database load."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in (connection_url, table or "", query or "", str(limit or "")):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return "db:" + h.hexdigest()
+
+
+def frame_key(df: pd.DataFrame) -> str:
+    """Content key for an already materialized DataFrame (vectorized row hashing)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(",".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return "frame:" + h.hexdigest()
+
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _write_spill(path: str, df: pd.DataFrame) -> None:
+    table = pa.Table.from_pandas(df)
+    report = stored_memory_report(df)
+    if report is not None:
+        metadata = dict(table.schema.metadata or {})
+        metadata[_REPORT_METADATA] = json.dumps(report.to_dict()).encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+    # Readers only ever see a complete file: write aside, then rename into place
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _read_spill(path: str) -> pd.DataFrame:
+    table = pq.read_table(path)
+    df = table.to_pandas()
+    report = (table.schema.metadata or {}).get(_REPORT_METADATA)
+    if report is not None:
+        attach_memory_report(df, CompactionReport.from_dict(json.loads(report)))
+    return df
+
+
+class DatasetCache:
+    """Thread-safe LRU cache of DataFrames bounded by ``max_bytes``.
+
+    Hits return the cached object itself (zero-copy, and stable identity so
+    ``utils.profile.get_profile`` stays warm). Treat results as read-only and
+    ``.copy()`` before mutating.
+    """
+
+    def __init__(self, max_bytes: int, spill_dir: Optional[str] = None, ttl_seconds: Optional[float] = None):
+        self.max_bytes = int(max_bytes)
+        self.spill_dir = spill_dir
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._accessed: Dict[str, float] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, Tuple[threading.RLock, int]] = {}
+        self._spilling: Dict[str, pd.DataFrame] = {}  # evicted, not yet on disk
+        self.hits = 0
+        self.misses = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, key: str) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, key.replace(":", "_") + ".parquet")
+
+    def _expired(self, accessed: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - accessed > self.ttl_seconds
+
+    @contextmanager
+    def _loading(self, key: str) -> Iterator[None]:
+        """Serialize loads of one key; other keys load concurrently."""
+        with self._lock:
+            lock, users = self._load_locks.get(key, (None, 0))
+            lock = lock or threading.RLock()
+            self._load_locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._load_locks[key]
+                if users == 1:
+                    del self._load_locks[key]
+                else:
+                    self._load_locks[key] = (lock, users - 1)
+
+    def _from_memory(self, key: str, now: float) -> Optional[pd.DataFrame]:
+        with self._lock:
+            df = self._entries.get(key)
+            if df is not None and self._expired(self._accessed[key], now):
+                self._drop(key)
+                df = None
+            if df is not None:
+                self._entries.move_to_end(key)
+                self._accessed[key] = now
+                return df
+            df = self._spilling.get(key)
+        if df is not None:
+            self._insert(key, df)  # evicted a moment ago and still being written
+        return df
+
+    def _from_disk(self, key: str, now: float) -> Optional[pd.DataFrame]:
+        path = self._spill_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        if self._expired(os.path.getmtime(path), now):
+            os.remove(path)
+            return None
+        try:
+            df = _read_spill(path)
+        except Exception:
+            return None
+        self._insert(key, df)
+        return df
+
+    def _lookup(self, key: str) -> Optional[pd.DataFrame]:
+        now = time.time()
+        df = self._from_memory(key, now)
+        if df is not None or not self.spill_dir:
+            return df
+        with self._loading(key):
+            # Another caller may have reloaded it while we waited
+            df = self._from_memory(key, now)
+            return df if df is not None else self._from_disk(key, now)
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        df = self._lookup(key)
+        self._count(df is not None)
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> pd.DataFrame:
+        self._insert(key, df)
+        return df
+
+    def get_or_load(self, key: str, loader: Callable[[], Optional[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+        """Return the cached frame for ``key`` or call ``loader`` and cache its result.
+
+        Concurrent calls for the same missing key run ``loader`` once; the
+        others wait and return the frame it produced.
+        """
+        df = self._lookup(key)
+        if df is None:
+            with self._loading(key):
+                df = self._lookup(key)
+                if df is None:
+                    self._count(False)
+                    df = loader()
+                    return None if df is None else self.put(key, df)
+        self._count(True)
+        return df
+
+    def invalidate(self, key: str) -> bool:
+        """Drop ``key`` from memory and disk; returns whether anything was removed."""
+        with self._lock:
+            found = key in self._entries or key in self._spilling
+            if key in self._entries:
+                self._drop(key)
+            self._spilling.pop(key, None)  # a spill in flight deletes its file when it sees this
+        path = self._spill_path(key)
+        if path and os.path.exists(path):
+            os.remove(path)
+            found = True
+        return found
+
+    def purge_expired(self) -> int:
+        """Remove entries (and spilled files) older than the TTL; returns the count."""
+        if self.ttl_seconds is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            stale = [k for k, t in self._accessed.items() if self._expired(t, now)]
+            for key in stale:
+                self._drop(key)
+        removed = len(stale)
+        if self.spill_dir and os.path.isdir(self.spill_dir):
+            for name in os.listdir(self.spill_dir):
+                path = os.path.join(self.spill_dir, name)
+                if name.endswith(".parquet") and self._expired(os.path.getmtime(path), now):
+                    os.remove(path)
+                    removed += 1
+                elif name.endswith(".tmp") and self._expired(os.path.getmtime(path), now):
+                    os.remove(path)  # left by a process that died mid-spill
+        return removed
+
+    def _drop(self, key: str) -> None:
+        self._entries.pop(key)
+        self._bytes -= self._sizes.pop(key)
+        self._accessed.pop(key, None)
+
+    def _insert(self, key: str, df: pd.DataFrame) -> None:
+        size = _frame_nbytes(df)
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes and self.spill_dir:
+                # Larger than the whole budget: keep only on disk
+                evicted.append((key, df))
+            else:
+                # Without a spill directory an oversized frame still stays, alone
+                self._entries[key] = df
+                self._sizes[key] = size
+                self._accessed[key] = time.time()
+                self._bytes += size
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    old_key = next(iter(self._entries))
+                    evicted.append((old_key, self._entries[old_key]))
+                    self._drop(old_key)
+            if self.spill_dir:
+                self._spilling.update(evicted)
+        # Spill outside the lock; writing Parquet can take a while
+        for old_key, old_df in evicted:
+            if self.spill_dir:
+                self._spill(old_key, old_df)
+
+    def _spill(self, key: str, df: pd.DataFrame) -> None:
+        path = self._spill_path(key)
+        try:
+            if os.path.exists(path):
+                os.utime(path)  # spilled copy is current; refresh its TTL clock
+            else:
+                _write_spill(path, df)
+        except Exception:
+            pass
+        with self._lock:
+            current = self._spilling.get(key) is df
+            if current:
+                del self._spilling[key]
+        stale = not current and key not in self._entries and key not in self._spilling
+        if stale and os.path.exists(path):
+            os.remove(path)  # invalidated while we were writing
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_CACHE: Optional[DatasetCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_dataset_cache() -> DatasetCache:
+    """Return the process-wide cache shared by all sessions."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = DatasetCache(
+                max_bytes=int(float(os.getenv("DATA_CLEANER_CACHE_MB", "1024")) * 1024 * 1024),
+                spill_dir=os.getenv("DATA_CLEANER_CACHE_DIR") or None,
+            )
+        return _CACHE
@@ -0,0 +1,150 @@
+"""
+Fast datetime parsing for repetitive text columns.
+
+Date columns hold few distinct values relative to their length, and
+``pd.to_datetime`` without a format falls back to per-value dateutil parsing.
+``parse_datetime_series`` instead:
+
+1. factorizes the column and parses only the distinct values;
+2. uses one explicit format for all of them: "ISO8601" (pandas' C fast path)
+   when the sample is ISO-shaped, otherwise the best guess over a sample of
+   distinct values, trying month-first and day-first readings and keeping
+   the one that parses most of the sample; "mixed" when no single format
+   covers at least 1 - DATA_CLEANER_DATETIME_MAX_FAILURE of the sample;
+3. maps the parsed values back through the factorize codes and reports how
+   many non-missing values failed to parse.
+
+Inference runs on every call. Formats are deliberately not cached by column
+name: the same name in two datasets can hold month-first and day-first
+dates, and a "mixed" verdict for one dataset says nothing about the next.
+Callers that parse the same column repeatedly (``utils.streaming_clean``)
+keep the inferred format themselves and check it against every chunk.
+
+Configuration (environment):
+- DATA_CLEANER_DATETIME_SAMPLE: distinct values sampled for inference
+  (default 200)
+- DATA_CLEANER_DATETIME_MAX_FAILURE: largest sample failure rate a single
+  format may have (default 0.05)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import warnings
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+DATETIME_SAMPLE = int(os.getenv("DATA_CLEANER_DATETIME_SAMPLE", "200"))
+MAX_FAILURE = float(os.getenv("DATA_CLEANER_DATETIME_MAX_FAILURE", "0.05"))
+
+_ISO_RE = re.compile(
+    r"^\d{4}-\d{2}-\d{2}"
+    r"([T ]\d{2}:\d{2}(:\d{2}(\.\d{1,9})?)?)?"
+    r"(Z|[+-]\d{2}:?\d{2})?$"
+)
+
+
+@dataclass(frozen=True)
+class DatetimeParseResult:
+    values: pd.Series
+    format: Optional[str]
+    n_values: int  # non-missing inputs
+    n_failed: int  # non-missing inputs that did not parse
+
+    @property
+    def failed_fraction(self) -> float:
+        return self.n_failed / self.n_values if self.n_values else 0.0
+
+    def message(self, column: Any) -> str:
+        return (f"Parsed '{column}' as datetime (format {self.format or 'n/a'}; "
+                f"{self.n_failed:,} of {self.n_values:,} values unparseable, {self.failed_fraction:.2%})")
+
+
+def _to_datetime(values: pd.Index, fmt: str) -> pd.DatetimeIndex:
+    try:
+        return pd.DatetimeIndex(pd.to_datetime(values, format=fmt, errors="coerce"))
+    except (ValueError, TypeError):
+        # Mixed UTC offsets cannot share one naive/aware dtype; normalise to UTC
+        return pd.DatetimeIndex(pd.to_datetime(values, format=fmt, errors="coerce", utc=True))
+
+
+def _sample(uniques: pd.Index) -> pd.Index:
+    if len(uniques) <= DATETIME_SAMPLE:
+        return uniques
+    step = len(uniques) / DATETIME_SAMPLE
+    return uniques[(np.arange(DATETIME_SAMPLE) * step).astype(np.intp)]
+
+
+def _failures(sample: pd.Index, fmt: str) -> int:
+    return int(_to_datetime(sample, fmt).isna().sum())
+
+
+def _infer(sample: pd.Index) -> str:
+    iso_misses = sum(1 for v in sample if not _ISO_RE.match(v))
+    if iso_misses <= MAX_FAILURE * len(sample):
+        return "ISO8601"
+    guesses: Counter = Counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # dayfirst hints contradicted by the value
+        for value in sample[:50]:
+            for dayfirst in (False, True):
+                guess = pd.tseries.api.guess_datetime_format(value, dayfirst=dayfirst)
+                if guess:
+                    guesses[guess] += 1
+    best, best_failed = "mixed", None
+    for fmt, _ in guesses.most_common(3):
+        failed = _failures(sample, fmt)
+        if best_failed is None or failed < best_failed:
+            best, best_failed = fmt, failed
+    if best_failed is None or best_failed > MAX_FAILURE * len(sample):
+        return "mixed"
+    return best
+
+
+def _text_uniques(uniques: Any) -> pd.Index:
+    index = pd.Index(uniques)
+    if index.dtype == object or not pd.api.types.is_string_dtype(index.dtype):
+        index = index.astype(str)  # numbers would otherwise be read as epoch offsets
+    return index.str.strip()
+
+
+def infer_datetime_format(values: Any) -> str:
+    """Format for ``values`` ("ISO8601", a strftime pattern or "mixed")."""
+    uniques = _text_uniques(pd.Series(values).dropna().unique())
+    sample = _sample(uniques)
+    if len(sample) == 0:
+        return "mixed"
+    return _infer(sample)
+
+
+def parse_datetime_series(values: pd.Series, format: Optional[str] = None) -> DatetimeParseResult:
+    """Parse ``values`` to datetimes by parsing each distinct value once.
+
+    ``format`` skips inference; otherwise the format is inferred from a
+    sample of the distinct values. Unparseable values become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        n = int(values.notna().sum())
+        return DatetimeParseResult(values, None, n, 0)
+
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    if len(uniques) == 0:
+        empty = pd.Series(pd.NaT, index=values.index, name=values.name, dtype="datetime64[ns]")
+        return DatetimeParseResult(empty, format, 0, 0)
+    text = _text_uniques(uniques)
+    if format is None:
+        format = infer_datetime_format(text)
+    parsed = _to_datetime(text, format)
+
+    # Every missing input maps to NaT through the -1 sentinel
+    mapped = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    per_unique = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    n_failed = int(per_unique[np.asarray(parsed.isna())].sum())
+    out = pd.Series(mapped, index=values.index, name=values.name)
+    return DatetimeParseResult(out, format, int(per_unique.sum()), n_failed)
+
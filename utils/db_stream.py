@@ -0,0 +1,203 @@
+"""
+Pooled SQLAlchemy engines and chunked, server-side-cursor database reads.
+
+Engines are cached per connection URL, so the Streamlit sidebar, every API
+request and the job workers reuse one connection pool per database instead
+of building an engine (and a fresh connection) on each load. Pools are
+pre-pinged so a connection dropped by the server is replaced transparently,
+and recycled after POOL_RECYCLE seconds. At most MAX_ENGINES pools are kept;
+the least recently used one is disposed when a new URL arrives.
+
+Reads execute with ``stream_results=True`` (a named/server-side cursor on
+PostgreSQL, an unbuffered cursor on MySQL drivers that support it) and fetch
+CHUNK_ROWS rows at a time, so the driver never buffers the whole result set
+next to the DataFrame built from it. Each chunk is converted on its own,
+optionally through Arrow: column arrays are built once per chunk and
+concatenated with schema promotion, which keeps dtypes consistent when an
+early chunk is all NULL in some column. A column that Arrow cannot type
+(mixed values, as SQLite allows, within a chunk or across chunks) is kept
+as text. ``progress`` receives the number of rows read so far after each
+chunk.
+
+``bench_db_stream.py`` at the repository root compares this against a fresh
+engine and ``pd.read_sql`` per load on a local SQLite file.
+
+Configuration (environment):
+- DATA_CLEANER_DB_POOL_SIZE: connections kept open per engine (default 5)
+- DATA_CLEANER_DB_MAX_OVERFLOW: extra connections allowed under load (default 10)
+- DATA_CLEANER_DB_POOL_TIMEOUT: seconds to wait for a free connection (default 30)
+- DATA_CLEANER_DB_POOL_RECYCLE: seconds before a connection is replaced (default 1800)
+- DATA_CLEANER_DB_MAX_ENGINES: cached engines, LRU-disposed beyond this (default 16)
+- DATA_CLEANER_DB_CHUNK_ROWS: rows fetched per chunk (default 50000)
+- DATA_CLEANER_DB_ARROW: convert chunks through Arrow when pyarrow is installed (default 1)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+from sqlalchemy import create_engine, select, table as sa_table, text
+from sqlalchemy.engine import Engine, make_url
+
+try:
+    import pyarrow as pa
+except Exception:
+    pa = None  # type: ignore
+
+RowsCallback = Callable[[int], None]
+
+POOL_SIZE = int(os.getenv("DATA_CLEANER_DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DATA_CLEANER_DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DATA_CLEANER_DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DATA_CLEANER_DB_POOL_RECYCLE", "1800"))
+MAX_ENGINES = int(os.getenv("DATA_CLEANER_DB_MAX_ENGINES", "16"))
+CHUNK_ROWS = int(os.getenv("DATA_CLEANER_DB_CHUNK_ROWS", "50000"))
+USE_ARROW = os.getenv("DATA_CLEANER_DB_ARROW", "1") not in ("0", "false", "no")
+
+_ENGINES: "OrderedDict[str, Engine]" = OrderedDict()
+_ENGINES_LOCK = threading.Lock()
+
+
+def _engine_options(connection_url: str) -> Dict[str, Any]:
+    url = make_url(connection_url)
+    options: Dict[str, Any] = {"pool_pre_ping": True}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; the dialect picks its own pool
+        return options
+    options.update(
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+    )
+    return options
+
+
+def get_engine(connection_url: str) -> Engine:
+    """Return the cached engine (and its connection pool) for ``connection_url``."""
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(connection_url)
+        if engine is not None:
+            _ENGINES.move_to_end(connection_url)
+            return engine
+        engine = create_engine(connection_url, **_engine_options(connection_url))
+        _ENGINES[connection_url] = engine
+        while len(_ENGINES) > max(1, MAX_ENGINES):
+            _, evicted = _ENGINES.popitem(last=False)
+            evicted.dispose()
+        return engine
+
+
+def dispose_engines() -> None:
+    """Close every pooled connection and forget the cached engines."""
+    with _ENGINES_LOCK:
+        engines = list(_ENGINES.values())
+        _ENGINES.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+def pool_status() -> Dict[str, str]:
+    """Pool status line per cached engine, with passwords masked."""
+    with _ENGINES_LOCK:
+        return {e.url.render_as_string(hide_password=True): e.pool.status() for e in _ENGINES.values()}
+
+
+def build_statement(table: Optional[str] = None, query: Optional[str] = None, limit: Optional[int] = None):
+    """SELECT for a table name (optionally ``schema.table``) or a raw query, with a dialect-specific limit."""
+    if query:
+        if not limit:
+            return text(query)
+        stmt = select(text("*")).select_from(text(f"({query.strip().rstrip(';')}) AS _data_cleaner_q"))
+    elif table:
+        schema, _, name = table.rpartition(".")
+        stmt = select(text("*")).select_from(sa_table(name, schema=schema or None))
+    else:
+        raise ValueError("Provide a table name or a query")
+    return stmt.limit(limit) if limit else stmt
+
+
+def _arrow_column(values: List[Any]) -> "pa.Array":
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def _arrow_chunk(columns: List[str], rows: List[Any]) -> "pa.Table":
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return pa.Table.from_arrays([_arrow_column(list(v)) for v in values], names=columns)
+
+
+def _concat_arrow(chunks: List["pa.Table"]) -> "pa.Table":
+    try:
+        return pa.concat_tables(chunks, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # A column typed differently across chunks (numbers, then text) is kept as text
+        names = chunks[0].column_names
+        conflicting = {n for n in names if len({str(c.schema.field(n).type) for c in chunks
+                                                 if not pa.types.is_null(c.schema.field(n).type)}) > 1}
+        chunks = [c.select(names).cast(pa.schema([
+            pa.field(n, pa.string()) if n in conflicting else c.schema.field(n) for n in names]))
+            for c in chunks]
+        return pa.concat_tables(chunks, promote_options="permissive")
+
+
+def iter_database_chunks(
+    connection_url: str,
+    table: Optional[str] = None,
+    query: Optional[str] = None,
+    limit: Optional[int] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    arrow: Optional[bool] = None,
+    progress: Optional[RowsCallback] = None,
+) -> Iterator[Union[pd.DataFrame, "pa.Table"]]:
+    """Stream a table or query in chunks of ``chunk_rows`` through a server-side cursor.
+
+    Yields ``pyarrow.Table`` chunks when ``arrow`` (default: DATA_CLEANER_DB_ARROW
+    and pyarrow installed), DataFrames otherwise.
+    """
+    use_arrow = (USE_ARROW if arrow is None else arrow) and pa is not None
+    chunk_rows = max(1, int(chunk_rows))
+    stmt = build_statement(table, query, limit)
+    with get_engine(connection_url).connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(stmt)
+        columns = [str(c) for c in result.keys()]
+        seen = 0
+        for rows in result.partitions(chunk_rows):
+            seen += len(rows)
+            if use_arrow:
+                yield _arrow_chunk(columns, rows)
+            else:
+                yield pd.DataFrame.from_records(rows, columns=columns)
+            if progress is not None:
+                progress(seen)
+        if seen == 0:
+            # Keep the column names of an empty result
+            yield _arrow_chunk(columns, []) if use_arrow else pd.DataFrame(columns=columns)
+
+
+def read_from_database(
+    connection_url: str,
+    table: Optional[str] = None,
+    query: Optional[str] = None,
+    limit: Optional[int] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    arrow: Optional[bool] = None,
+    progress: Optional[RowsCallback] = None,
+) -> pd.DataFrame:
+    """Load a table or query into one DataFrame over the pooled engine, chunk by chunk."""
+    chunks = list(iter_database_chunks(connection_url, table=table, query=query, limit=limit,
+                                       chunk_rows=chunk_rows, arrow=arrow, progress=progress))
+    if pa is not None and isinstance(chunks[0], pa.Table):
+        combined = _concat_arrow(chunks) if len(chunks) > 1 else chunks[0]
+        del chunks
+        return combined.to_pandas(self_destruct=True)
+    if len(chunks) == 1:
+        return chunks[0]
+    # An all-NULL chunk comes back as object; re-infer once the values are together
+    return pd.concat(chunks, ignore_index=True).infer_objects()
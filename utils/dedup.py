@@ -0,0 +1,391 @@
+"""
+Exact duplicate-row detection by row fingerprinting.
+
+Rows are fingerprinted with vectorized 64- or 128-bit hashes over a subset
+of columns. Every column is reduced to exact uint64 tokens (value bits for
+numeric/datetime columns, factorize codes otherwise; only distinct strings
+are hashed, with a second hash key for the second lane) and the column
+hashes are mixed into one or two uint64 lanes. Fingerprints that are
+compared across frames (``row_fingerprints``) token numbers by value as
+float64, because a chunked reader types an integer column int64 in one
+chunk and float64 in the next if it holds a null. Equal fingerprints only
+nominate candidates: candidates are confirmed against their group's kept row
+token by token, and any collision is settled with ``duplicated`` on the
+affected rows, so results match ``DataFrame.duplicated`` exactly.
+
+- ``duplicated_rows``: in-memory, keep "first" or "last" (the chunked path
+  uses it within a chunk; whole in-memory frames are faster with
+  ``DataFrame.duplicated`` itself)
+- ``ChunkedDeduplicator``: the same semantics over a chunk stream. Pass 1
+  (``observe``) records 64-bit fingerprints in a ``FingerprintTable`` that
+  spills partitions to disk over its byte budget; pass 2 (``filter``) drops
+  confirmed duplicates. keep="last" needs a ``confirm`` pass in between.
+
+Configuration (environment):
+- DATA_CLEANER_DEDUP_MB: in-memory fingerprint budget (default 256)
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.util import hash_array
+
+DEDUP_BYTES = int(float(os.getenv("DATA_CLEANER_DEDUP_MB", "256")) * 1024 * 1024)
+KEEP_OPTIONS = ("first", "last")
+
+_HASH_KEYS = ("0123456789123456", "9b1d5c7e3a2f4d60")
+_LANE_SEEDS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+_LANE_MULTIPLIERS = (np.uint64(31), np.uint64(0x100000001B3))
+_NA_HASH = np.uint64(0x5851F42D4C957F2D)
+
+
+class _Missing:
+    """Single sentinel for NaN/None/NaT inside exact row keys (NaN != NaN otherwise)."""
+
+    def __repr__(self) -> str:
+        return "NA"
+
+
+_NA = _Missing()
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, vectorized and in place (wrapping uint64 arithmetic)."""
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def _value_tokens(values: np.ndarray) -> np.ndarray:
+    """Portable tokens for float64 values: 0.0 == -0.0, and every NaN is the NA token."""
+    values = values + 0.0
+    tokens = values.view(np.uint64)
+    tokens[np.isnan(values)] = _NA_HASH
+    return tokens
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.number, np.bool_))
+
+
+def _column_tokens(values: pd.Series, portable: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Per-row uint64 tokens for one column, plus the distinct values they code.
+
+    Equal tokens mean equal values under ``duplicated`` semantics (NaN == NaN,
+    0.0 == -0.0). Plain numeric/datetime columns use their value bits
+    (uniques is None); everything else uses factorize codes. ``portable``
+    tokens compare across frames: every numeric dtype (nullable ones too)
+    is tokened by float64 value, so 3 (int64) and 3.0 (float64) agree.
+    Those tokens only nominate candidates; large integers may share one.
+    """
+    dtype = values.dtype
+    if portable and pd.api.types.is_numeric_dtype(dtype):
+        return _value_tokens(values.to_numpy(dtype=np.float64, na_value=np.nan)), None
+    if isinstance(dtype, np.dtype):
+        arr = values.to_numpy()
+        if dtype.kind in "iub":
+            return arr.astype(np.int64 if dtype.kind != "u" else np.uint64, copy=False).view(np.uint64), None
+        if dtype.kind == "f":
+            arr = arr.astype(np.float64) + 0.0  # -0.0 -> 0.0
+            arr[np.isnan(arr)] = np.nan  # one NaN bit pattern
+            return arr.view(np.uint64), None
+        if dtype.kind in "mM":
+            return arr.view(np.int64).view(np.uint64), None
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    return codes.astype(np.int64, copy=False).view(np.uint64), np.asarray(uniques, dtype=object)
+
+
+def _token_hashes(tokens: np.ndarray, uniques: Optional[np.ndarray], lanes: int, portable: bool) -> List[np.ndarray]:
+    """One uint64 hash per row and lane from a column's tokens.
+
+    Factorize codes are only meaningful within one frame; ``portable`` hashes
+    the distinct values themselves so fingerprints compare across chunks.
+    """
+    if uniques is None or not portable:
+        # Raw tokens; the per-lane seed keeps the lanes independent
+        return [tokens if lane == 0 else tokens ^ _LANE_SEEDS[lane] for lane in range(lanes)]
+    codes = tokens.view(np.int64)
+    # Numbers in object columns get the same value token as in numeric columns
+    numbers = np.fromiter((_is_number(u) for u in uniques), dtype=bool, count=len(uniques))
+    number_tokens = _value_tokens(uniques[numbers].astype(np.float64)) if numbers.any() else None
+    out = []
+    for lane in range(lanes):
+        # Hash each distinct value once (string contents, keyed per lane), then gather
+        table = np.append(hash_array(uniques, hash_key=_HASH_KEYS[lane], categorize=False), _NA_HASH)
+        if number_tokens is not None:
+            table[:-1][numbers] = number_tokens
+        if lane:
+            # Match the raw-token lanes for numbers and missing values
+            table[:-1][numbers] ^= _LANE_SEEDS[lane]
+            table[-1] ^= _LANE_SEEDS[lane]
+        out.append(table[codes])  # code -1 (missing) picks the trailing NA hash
+    return out
+
+
+def _fingerprint(df: pd.DataFrame, columns: Sequence[Any], lanes: int, portable: bool = True, keep_tokens: bool = False):
+    acc = [np.full(len(df), seed, dtype=np.uint64) for seed in _LANE_SEEDS[:lanes]]
+    tokens = []
+    with np.errstate(over="ignore"):
+        for col in columns:
+            tok, uniques = _column_tokens(df[col], portable)
+            if keep_tokens:
+                tokens.append(tok)
+            for lane, h in enumerate(_token_hashes(tok, uniques, lanes, portable)):
+                acc[lane] *= _LANE_MULTIPLIERS[lane]
+                acc[lane] += h
+                _mix(acc[lane])
+    fp = acc[0] if lanes == 1 else np.column_stack(acc)
+    return fp, tokens
+
+
+def row_fingerprints(df: pd.DataFrame, subset: Optional[Sequence[Any]] = None, bits: int = 128) -> np.ndarray:
+    """Per-row fingerprints: shape (n,) uint64 for ``bits=64``, (n, 2) for 128.
+
+    Fingerprints depend only on row values, so they compare across frames.
+    """
+    if bits not in (64, 128):
+        raise ValueError("bits must be 64 or 128")
+    columns = list(subset) if subset is not None else list(df.columns)
+    return _fingerprint(df, columns, bits // 64)[0]
+
+
+def _exact_keys(frame: pd.DataFrame) -> List[Tuple]:
+    """Hashable exact row values with all missing markers normalised to one sentinel."""
+    columns = []
+    for col in frame.columns:
+        values = frame[col].to_numpy(dtype=object)
+        missing = pd.isna(values)
+        if missing.any():
+            values = values.copy()
+            values[missing] = _NA
+        columns.append(values)
+    return list(zip(*columns)) if columns else [() for _ in range(len(frame))]
+
+
+def duplicated_rows(df: pd.DataFrame, subset: Optional[Sequence[Any]] = None, keep: str = "first") -> np.ndarray:
+    """Boolean mask of duplicate rows, identical to ``df.duplicated(subset, keep)``."""
+    if keep not in KEEP_OPTIONS:
+        raise ValueError(f"keep must be one of {KEEP_OPTIONS}")
+    n = len(df)
+    mask = np.zeros(n, dtype=bool)
+    if n < 2:
+        return mask
+    columns = list(subset) if subset is not None else list(df.columns)
+    if not columns:  # every row equals every other
+        mask[:] = True
+        mask[0 if keep == "first" else -1] = False
+        return mask
+    # Within one frame factorize codes are exact, so a 64-bit local fingerprint
+    # plus token confirmation is enough; group rows with a uint64 hash table
+    fp, tokens = _fingerprint(df, columns, lanes=1, portable=False, keep_tokens=True)
+    codes, uniques = pd.factorize(fp)
+    positions = np.arange(n)
+    if keep == "first":
+        # Codes are numbered in order of appearance: a group starts where the running max grows
+        kept = np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)
+    else:
+        kept = np.zeros(len(uniques), dtype=np.int64)
+        np.maximum.at(kept, codes, positions)
+    rep = kept[codes]  # kept row of each row's group
+    candidates = np.flatnonzero(rep != positions)
+    if candidates.size == 0:
+        return mask
+
+    # Confirm candidates against their group's kept row, token by token
+    rep_rows = rep[candidates]
+    equal = np.ones(candidates.size, dtype=bool)
+    for tok in tokens:
+        equal &= tok[candidates] == tok[rep_rows]
+    mask[candidates[equal]] = True
+    if not equal.all():
+        # Fingerprint collision: settle the affected groups exactly
+        rows = np.flatnonzero(np.isin(codes, np.unique(codes[candidates[~equal]])))
+        mask[rows] = df[columns].iloc[rows].duplicated(keep=keep).to_numpy()
+    return mask
+
+
+class FingerprintTable:
+    """Multiset of uint64 fingerprints, partitioned by the top bits.
+
+    Partitions live in memory until the table exceeds ``max_bytes``; then
+    every partition is appended to its own file under ``spill_dir`` and
+    memory is released. ``repeated()`` processes one partition at a time.
+    """
+
+    def __init__(self, max_bytes: int = DEDUP_BYTES, spill_dir: Optional[str] = None, partitions: int = 64):
+        self.max_bytes = max_bytes
+        self.partitions = partitions
+        self._shift = np.uint64(64 - int(np.log2(partitions)))
+        self._spill_dir = spill_dir
+        self._owns_dir = False
+        self._buffers: List[List[np.ndarray]] = [[] for _ in range(partitions)]
+        self._files: List[List[str]] = [[] for _ in range(partitions)]
+        self._buffered = 0
+        self.count = 0
+        self.spills = 0
+
+    def add(self, fingerprints: np.ndarray) -> None:
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+        part = (fingerprints >> self._shift).astype(np.intp)
+        order = np.argsort(part, kind="stable")
+        bounds = np.searchsorted(part[order], np.arange(self.partitions + 1))
+        for p in range(self.partitions):
+            if bounds[p] < bounds[p + 1]:
+                self._buffers[p].append(fingerprints[order[bounds[p]:bounds[p + 1]]])
+        self._buffered += fingerprints.nbytes
+        self.count += fingerprints.size
+        if self._buffered > self.max_bytes:
+            self._spill()
+
+    def _spill(self) -> None:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="dedup-")
+            self._owns_dir = True
+        for p, buffers in enumerate(self._buffers):
+            if buffers:
+                path = os.path.join(self._spill_dir, f"part{p:03d}-{len(self._files[p]):05d}.npy")
+                np.save(path, np.concatenate(buffers))
+                self._files[p].append(path)
+                self._buffers[p] = []
+        self._buffered = 0
+        self.spills += 1
+
+    def repeated(self) -> np.ndarray:
+        """Sorted fingerprints that were added more than once."""
+        found = []
+        for p in range(self.partitions):
+            arrays = [np.load(path) for path in self._files[p]] + self._buffers[p]
+            if not arrays:
+                continue
+            uniq, counts = np.unique(np.concatenate(arrays), return_counts=True)
+            found.append(uniq[counts > 1])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.uint64)
+
+    def close(self) -> None:
+        self._buffers = [[] for _ in range(self.partitions)]
+        if self._owns_dir and self._spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+        self._files = [[] for _ in range(self.partitions)]
+
+
+class ChunkedDeduplicator:
+    """Exact duplicate removal over a re-readable stream of chunks.
+
+    Pass 1: ``observe(chunk)`` for every chunk. Pass 2: ``filter(chunk)`` for
+    the same chunks in the same order. Only rows whose fingerprint occurred
+    more than once are compared by value, so memory beyond the fingerprint
+    table is proportional to the duplicated rows. keep="last" cannot be
+    decided going forwards and needs ``confirm(chunk)`` over the chunks
+    between the two passes (see ``needs_confirm``).
+    """
+
+    def __init__(
+        self,
+        subset: Optional[Sequence[Any]] = None,
+        keep: str = "first",
+        max_bytes: int = DEDUP_BYTES,
+        spill_dir: Optional[str] = None,
+    ):
+        if keep not in KEEP_OPTIONS:
+            raise ValueError(f"keep must be one of {KEEP_OPTIONS}")
+        self.subset = list(subset) if subset is not None else None
+        self.keep = keep
+        self.table = FingerprintTable(max_bytes, spill_dir)
+        self._candidates: Optional[np.ndarray] = None
+        self._seen: set = set()
+        self._last: Dict[Tuple, int] = {}
+        self._keep_rows = np.empty(0, dtype=np.int64)
+        self._stage = "observe"
+        self._row = 0
+        self.removed = 0
+
+    @property
+    def needs_confirm(self) -> bool:
+        return self.keep == "last"
+
+    def _columns(self, chunk: pd.DataFrame) -> List[Any]:
+        return self.subset if self.subset is not None else list(chunk.columns)
+
+    def observe(self, chunk: pd.DataFrame) -> None:
+        self.table.add(row_fingerprints(chunk, self._columns(chunk), bits=64))
+
+    def _start_pass(self) -> None:
+        if self._candidates is None:
+            self._candidates = self.table.repeated()
+            self.table.close()
+        self._row = 0
+
+    def _candidate_rows(self, chunk: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        fp = row_fingerprints(chunk, self._columns(chunk), bits=64)
+        if self._candidates.size == 0:
+            return np.empty(0, dtype=np.intp), fp
+        pos = np.searchsorted(self._candidates, fp)
+        pos[pos == self._candidates.size] = 0
+        return np.flatnonzero(self._candidates[pos] == fp), fp
+
+    def confirm(self, chunk: pd.DataFrame) -> None:
+        """keep="last" only: record the last occurrence of every candidate row."""
+        if self._stage != "confirm":
+            self._start_pass()
+            self._stage = "confirm"
+        rows, fp = self._candidate_rows(chunk)
+        # Only the last local occurrence of each distinct row matters
+        rows = rows[~duplicated_rows(chunk.iloc[rows], self._columns(chunk), keep="last")]
+        keys = _exact_keys(chunk[self._columns(chunk)].iloc[rows])
+        for i, key in zip(rows, keys):
+            self._last[(fp[i], key)] = self._row + int(i)
+        self._row += len(chunk)
+
+    def filter(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Drop the duplicate rows of ``chunk`` (pass 2)."""
+        if self._stage != "filter":
+            if self.keep == "last":
+                if self._stage != "confirm":
+                    raise RuntimeError('keep="last" needs a confirm() pass before filter()')
+                self._keep_rows = np.sort(np.fromiter(self._last.values(), dtype=np.int64, count=len(self._last)))
+                self._last = {}
+            self._start_pass()
+            self._stage = "filter"
+        rows, fp = self._candidate_rows(chunk)
+        base = self._row
+        self._row += len(chunk)
+        if rows.size == 0:
+            return chunk
+        keep = np.ones(len(chunk), dtype=bool)
+        if self.keep == "first":
+            # Repeats within the chunk go regardless; first local occurrences
+            # go if an earlier chunk already had the row
+            local_dup = duplicated_rows(chunk.iloc[rows], self._columns(chunk), keep="first")
+            keep[rows[local_dup]] = False
+            rows = rows[~local_dup]
+            keys = _exact_keys(chunk[self._columns(chunk)].iloc[rows])
+            for i, key in zip(rows, keys):
+                k = (fp[i], key)
+                if k in self._seen:
+                    keep[i] = False
+                else:
+                    self._seen.add(k)
+        else:
+            # Candidate rows survive only at their recorded last occurrence
+            positions = base + rows
+            idx = np.searchsorted(self._keep_rows, positions)
+            idx[idx == self._keep_rows.size] = 0
+            keep[rows] = self._keep_rows[idx] == positions
+        dropped = int((~keep).sum())
+        self.removed += dropped
+        return chunk[keep] if dropped else chunk
+
+    def close(self) -> None:
+        self.table.close()
+        self._seen = set()
+        self._last = {}
+
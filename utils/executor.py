@@ -0,0 +1,207 @@
+"""
+Bounded execution layer for blocking pandas work in async handlers.
+
+``WorkerPool.run`` dispatches a callable to a process pool (or a thread pool
+for I/O-bound work and unpicklable arguments) without blocking the event
+loop. Each endpoint has its own concurrency limit and a bounded wait queue;
+when the queue is full the call fails fast with ``PoolBusyError`` (429), when
+the whole pool is saturated with ``PoolBusyError`` (503), and when the
+deadline passes with ``PoolTimeoutError`` (504). A request that times out
+(or whose client goes away) keeps its concurrency slot until the task has
+actually finished, so runaway work still counts against the limits.
+
+Worker processes are started with "forkserver" (or "spawn" where that is
+unavailable), never plain fork: the API runs job and audit threads, and
+forking a process with running threads can deadlock the child.
+
+Configuration (environment):
+- DATA_CLEANER_API_POOL: "process" (default) or "thread"
+- DATA_CLEANER_API_WORKERS: pool size (default: CPU count)
+- DATA_CLEANER_API_LIMITS: per-endpoint concurrency, e.g. "clean=2,profile=4"
+- DATA_CLEANER_API_QUEUE: max waiting requests per endpoint (default 16)
+- DATA_CLEANER_API_MAX_PENDING: max queued + running requests overall (default 64)
+- DATA_CLEANER_API_TIMEOUT: per-request deadline in seconds (default 120)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class PoolBusyError(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class PoolTimeoutError(Exception):
+    status_code = 504
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits: Dict[str, int] = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            limits[name.strip()] = max(1, int(value))
+    return limits
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        mode: str = "process",
+        workers: Optional[int] = None,
+        limits: Optional[Dict[str, int]] = None,
+        queue_size: int = 16,
+        max_pending: int = 64,
+        timeout: float = 120.0,
+    ):
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 2
+        self.limits = limits or {}
+        self.queue_size = queue_size
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._cpu_executor: Optional[Executor] = None
+        self._io_executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._waiting: Dict[str, int] = {}
+        self._active: Dict[str, int] = {}
+        self._pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @classmethod
+    def from_env(cls) -> "WorkerPool":
+        workers = os.getenv("DATA_CLEANER_API_WORKERS")
+        return cls(
+            mode=os.getenv("DATA_CLEANER_API_POOL", "process"),
+            workers=int(workers) if workers else None,
+            limits=_parse_limits(os.getenv("DATA_CLEANER_API_LIMITS", "")),
+            queue_size=int(os.getenv("DATA_CLEANER_API_QUEUE", "16")),
+            max_pending=int(os.getenv("DATA_CLEANER_API_MAX_PENDING", "64")),
+            timeout=float(os.getenv("DATA_CLEANER_API_TIMEOUT", "120")),
+        )
+
+    def _executor(self, in_thread: bool) -> Executor:
+        with self._executor_lock:
+            if in_thread or self.mode == "thread":
+                if self._io_executor is None:
+                    self._io_executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="data-cleaner")
+                return self._io_executor
+            if self._cpu_executor is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._cpu_executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context(method))
+            return self._cpu_executor
+
+    def _limit(self, endpoint: str) -> int:
+        return self.limits.get(endpoint, self.workers)
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(endpoint)
+        if sem is None:
+            sem = asyncio.Semaphore(self._limit(endpoint))
+            self._semaphores[endpoint] = sem
+        return sem
+
+    async def run(
+        self,
+        endpoint: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        in_thread: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Run ``fn(*args)`` off the event loop under ``endpoint``'s limits.
+
+        ``in_thread=True`` forces the thread pool (file handles, parsed uploads
+        and other arguments that cannot be pickled to a worker process). The
+        deadline covers both queueing and execution. A timed-out task that has
+        not started is cancelled; one that has keeps running, holding its
+        slot until it finishes, and its result is discarded.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        sem = self._semaphore(endpoint)
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolBusyError(503, "Server is at capacity, retry later", retry_after=5)
+        if self._active.get(endpoint, 0) >= self._limit(endpoint) + self.queue_size:
+            self.rejected += 1
+            raise PoolBusyError(429, f"Too many concurrent '{endpoint}' requests", retry_after=2)
+
+        self._pending += 1
+        self._active[endpoint] = self._active.get(endpoint, 0) + 1
+        self._waiting[endpoint] = self._waiting.get(endpoint, 0) + 1
+        loop = asyncio.get_running_loop()
+        future: Optional[Future] = None
+
+        def finish() -> None:
+            sem.release()
+            self._active[endpoint] -= 1
+            self._pending -= 1
+
+        def on_done(_: Future) -> None:
+            # Runs on a worker or executor thread; hand the release back to the loop
+            try:
+                loop.call_soon_threadsafe(finish)
+            except RuntimeError:
+                pass  # loop already closed at shutdown
+
+        try:
+            try:
+                await asyncio.wait_for(sem.acquire(), max(deadline - time.monotonic(), 0))
+            finally:
+                self._waiting[endpoint] -= 1
+            try:
+                future = self._executor(in_thread).submit(fn, *args)
+            except BaseException:
+                sem.release()
+                raise
+            # The slot is released when the task itself completes, not when we stop waiting
+            future.add_done_callback(on_done)
+            waiter = asyncio.wrap_future(future)
+            # A result nobody waits for any more is still retrieved, so it is never reported as lost
+            waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            return await asyncio.wait_for(asyncio.shield(waiter), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise PoolTimeoutError(f"'{endpoint}' did not finish within {timeout or self.timeout:.0f}s")
+        finally:
+            if future is None:
+                self._active[endpoint] -= 1
+                self._pending -= 1
+            elif not future.done():
+                future.cancel()  # only succeeds while it is still queued in the executor
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "pending": self._pending,
+            "waiting": {k: v for k, v in self._waiting.items() if v},
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            for executor in (self._cpu_executor, self._io_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+            self._cpu_executor = None
+            self._io_executor = None
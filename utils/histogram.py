@@ -0,0 +1,263 @@
+"""
+Batched histogram engine and mergeable quantile sketch.
+
+``compute_histograms`` bins every requested numeric column together: the
+columns are pulled into one float matrix (in groups, to bound memory), per
+column ranges/quantiles come from single batched NumPy reductions and the
+counts for all fixed-width columns come from one ``np.bincount`` over offset
+bin ids. Supported binning:
+
+- "fixed": ``bins`` equal-width bins between min and max
+- "quantile": ``bins`` bins holding roughly equal numbers of values
+- "fd": Freedman-Diaconis width (2 * IQR / n^(1/3)), capped at MAX_BINS
+
+``QuantileSketch`` is a relative-error log-bucket sketch (DDSketch style) for
+chunked or streamed inputs: sketches built per chunk merge by adding counts.
+"""
+
+from __future__ import annotations
+
+import math
+import warnings
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.profile import frame_cached
+
+BINNING_METHODS = ("fixed", "quantile", "fd")
+MAX_BINS = 1000
+# Cells per column group pulled into one float64 matrix (~64 MB)
+GROUP_CELLS = 8_000_000
+
+
+@dataclass(frozen=True)
+class Histogram:
+    counts: np.ndarray
+    edges: np.ndarray
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        return {"counts": self.counts.tolist(), "bin_edges": self.edges.tolist()}
+
+
+def numeric_matrix(df: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+    """``columns`` as one float64 matrix; non-numeric columns are coerced, NA becomes NaN."""
+    block = df[list(columns)]
+    if all(pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t) for t in block.dtypes):
+        return block.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.column_stack([
+        pd.to_numeric(block[c], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan) for c in columns
+    ])
+
+
+def _histogram_group(values: np.ndarray, bins: int, method: str) -> List[Optional[Histogram]]:
+    finite = np.isfinite(values)
+    n_valid = finite.sum(axis=0)
+    k = values.shape[1]
+    all_finite = bool(finite.all())
+    lo = np.where(n_valid > 0, np.min(values, axis=0, where=finite, initial=np.inf), 0.0)
+    hi = np.where(n_valid > 0, np.max(values, axis=0, where=finite, initial=-np.inf), 0.0)
+    if method in ("quantile", "fd"):
+        # +/-inf must not move the quantiles
+        ranked = values if all_finite else np.where(finite, values, np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+            if method == "quantile":
+                qs = np.nanquantile(ranked, np.linspace(0.0, 1.0, bins + 1), axis=0)
+            else:
+                q1, q3 = np.nanquantile(ranked, [0.25, 0.75], axis=0)
+
+    if method == "quantile":
+        out: List[Optional[Histogram]] = []
+        for j in range(k):
+            if n_valid[j] == 0:
+                out.append(None)
+                continue
+            edges = np.unique(qs[:, j])
+            if edges.size < 2:
+                edges = np.array([edges[0] - 0.5, edges[0] + 0.5])
+            col = values[finite[:, j], j]
+            idx = np.clip(np.searchsorted(edges, col, side="right") - 1, 0, edges.size - 2)
+            out.append(Histogram(np.bincount(idx, minlength=edges.size - 1).astype(np.int64), edges))
+        return out
+
+    if method == "fd":
+        with np.errstate(all="ignore"):
+            width = 2.0 * (q3 - q1) / np.cbrt(np.maximum(n_valid, 1))
+            nbins = np.where(width > 0, np.ceil((hi - lo) / np.where(width > 0, width, 1.0)), bins)
+        nbins = np.clip(np.nan_to_num(nbins, nan=bins), 1, MAX_BINS).astype(np.int64)
+    else:
+        nbins = np.full(k, bins, dtype=np.int64)
+
+    # Degenerate ranges get a unit-wide bin around the single value (numpy's behaviour)
+    span = hi - lo
+    lo = np.where(span > 0, lo, lo - 0.5)
+    hi = np.where(span > 0, hi, hi + 0.5)
+    scale = nbins / (hi - lo)
+    offsets = np.concatenate([[0], np.cumsum(nbins)[:-1]])
+
+    # One bincount over (column offset + bin id) for every cell in the group;
+    # non-finite cells go to a trailing overflow bin that is dropped
+    total = int(nbins.sum())
+    with np.errstate(all="ignore"):
+        idx = values - lo
+        idx *= scale
+    np.floor(idx, out=idx)
+    np.clip(idx, 0, nbins - 1, out=idx)  # max value lands in the last (closed) bin
+    idx += offsets
+    if not all_finite:
+        idx[~finite] = total
+    flat = np.bincount(idx.astype(np.intp).ravel(), minlength=total + 1)
+
+    out = []
+    for j in range(k):
+        if n_valid[j] == 0:
+            out.append(None)
+            continue
+        counts = flat[offsets[j]:offsets[j] + nbins[j]].astype(np.int64)
+        edges = np.linspace(lo[j], hi[j], nbins[j] + 1)
+        out.append(Histogram(counts, edges))
+    return out
+
+
+def compute_histograms(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[str]] = None,
+    bins: int = 30,
+    method: str = "fixed",
+) -> Dict[str, Histogram]:
+    """Histograms for ``columns`` (default: all numeric columns) in batched passes.
+
+    Non-numeric columns are coerced with ``pd.to_numeric(errors='coerce')``;
+    columns without any finite value are omitted from the result.
+    """
+    if method not in BINNING_METHODS:
+        raise ValueError(f"Unknown binning method '{method}'; choose from {BINNING_METHODS}")
+    bins = max(1, min(int(bins), MAX_BINS))
+    if columns is None:
+        columns = [c for c in df.select_dtypes(include=[np.number]).columns]
+    columns = [c for c in columns if c in df.columns]
+    if not columns or df.shape[0] == 0:
+        return {}
+
+    result: Dict[str, Histogram] = {}
+    per_group = max(1, GROUP_CELLS // max(df.shape[0], 1))
+    for start in range(0, len(columns), per_group):
+        group = columns[start:start + per_group]
+        for col, hist in zip(group, _histogram_group(numeric_matrix(df, group), bins, method)):
+            if hist is not None:
+                result[str(col)] = hist
+    return result
+
+
+def get_histograms(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[str]] = None,
+    bins: int = 30,
+    method: str = "fixed",
+) -> Dict[str, Histogram]:
+    """``compute_histograms`` cached per DataFrame object (i.e. per dataset version)."""
+    key = ("histograms", tuple(columns) if columns is not None else None, int(bins), method)
+    return frame_cached(df, key, lambda: compute_histograms(df, columns, bins, method))
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative accuracy ``alpha``.
+
+    Values are counted in logarithmic buckets (separately for positive and
+    negative values, plus an exact zero count); any quantile estimate is within
+    ``alpha`` relative error of a true sample value. Sketches over different
+    chunks combine with ``merge``.
+    """
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self.positive: Counter = Counter()
+        self.negative: Counter = Counter()
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _bucket_counts(self, magnitudes: np.ndarray) -> Dict[int, int]:
+        keys = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+        uniq, counts = np.unique(keys, return_counts=True)
+        return dict(zip(uniq.tolist(), counts.tolist()))
+
+    def update(self, values: Iterable[float]) -> "QuantileSketch":
+        if isinstance(values, np.ndarray) and values.dtype.kind in "iuf":
+            arr = values.astype(np.float64, copy=False)
+        else:
+            arr = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        arr = arr[np.isfinite(arr)]
+        if arr.size == 0:
+            return self
+        self.count += int(arr.size)
+        self.min = min(self.min, float(arr.min()))
+        self.max = max(self.max, float(arr.max()))
+        pos = arr[arr > 0]
+        neg = -arr[arr < 0]
+        self.zeros += int(arr.size - pos.size - neg.size)
+        if pos.size:
+            self.positive.update(self._bucket_counts(pos))
+        if neg.size:
+            self.negative.update(self._bucket_counts(neg))
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if not math.isclose(self.alpha, other.alpha):
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _value(self, key: int) -> float:
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def buckets(self) -> Iterator[Tuple[float, int]]:
+        """(representative value, count) from smallest to largest."""
+        for key in sorted(self.negative, reverse=True):
+            yield -self._value(key), self.negative[key]
+        if self.zeros:
+            yield 0.0, self.zeros
+        for key in sorted(self.positive):
+            yield self._value(key), self.positive[key]
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        if self.count == 0:
+            return [math.nan for _ in qs]
+        targets = sorted((max(0.0, min(1.0, q)) * (self.count - 1), i) for i, q in enumerate(qs))
+        out = [math.nan] * len(qs)
+        seen = 0
+        t = 0
+        for value, count in self.buckets():
+            seen += count
+            while t < len(targets) and targets[t][0] < seen:
+                out[targets[t][1]] = min(max(value, self.min), self.max)
+                t += 1
+        while t < len(targets):
+            out[targets[t][1]] = self.max
+            t += 1
+        return out
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def histogram(self, bins: int = 30) -> Optional[Histogram]:
+        """Approximate fixed-width histogram from the sketch buckets."""
+        if self.count == 0:
+            return None
+        lo, hi = (self.min, self.max) if self.max > self.min else (self.min - 0.5, self.max + 0.5)
+        edges = np.linspace(lo, hi, bins + 1)
+        values, counts = zip(*self.buckets())
+        idx = np.clip(np.searchsorted(edges, np.clip(values, lo, hi), side="right") - 1, 0, bins - 1)
+        return Histogram(np.bincount(idx, weights=counts, minlength=bins).astype(np.int64), edges)
@@ -0,0 +1,162 @@
+"""
+Memory-bounded undo/redo history for the Streamlit session.
+
+Instead of pushing a full ``df.copy()`` per action, each state after the base
+is stored as a delta against the previous state: the surviving row index,
+the final column order and only the columns whose values changed. Every
+``checkpoint_every`` states (and whenever rows cannot be aligned by index, e.g.
+after ``reset_index``) the state is kept as a full checkpoint instead. When
+the history exceeds its byte budget the oldest states are folded away.
+
+Checkpoints are held by reference, never copied: DataFrames passed in must be
+treated as immutable by the caller (the app already swaps in new frames rather
+than editing them in place). The base is the exception on the way out:
+``undo``/``redo`` back to it return a copy, because the base is the session's
+``df_original`` and may be the very frame the dataset cache holds.
+
+Sizes are counted with ``memory_usage(deep=True)``, so text columns count
+their strings (object) or Arrow buffers, not just one pointer per row.
+
+Configuration (environment):
+- DATA_CLEANER_HISTORY_MB: per-session budget (default 512)
+- DATA_CLEANER_HISTORY_CHECKPOINT: states between full checkpoints (default 5)
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+
+@dataclass
+class _State:
+    checkpoint: Optional[pd.DataFrame] = None
+    index: Optional[pd.Index] = None  # None: same index as the previous state
+    columns: List[str] = field(default_factory=list)
+    changed: Dict[str, pd.Series] = field(default_factory=dict)
+    nbytes: int = 0
+
+    @property
+    def is_checkpoint(self) -> bool:
+        return self.checkpoint is not None
+
+
+def _series_nbytes(s: pd.Series) -> int:
+    return int(s.memory_usage(index=False, deep=True))
+
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _make_delta(prev: pd.DataFrame, new: pd.DataFrame) -> Optional[_State]:
+    """Delta turning ``prev`` into ``new``; None when rows cannot be aligned by index."""
+    if not new.index.is_unique or not prev.index.is_unique:
+        return None
+    if new.columns.duplicated().any():
+        return None
+    same_index = new.index.equals(prev.index)
+    if not same_index and not new.index.isin(prev.index).all():
+        return None
+
+    aligned = prev if same_index else prev.loc[new.index]
+    changed: Dict[str, pd.Series] = {}
+    for col in new.columns:
+        if col not in aligned.columns or not new[col].equals(aligned[col]) or new[col].dtype != aligned[col].dtype:
+            changed[col] = new[col].copy()  # own the data; a view would pin the whole block
+    index = None if same_index else new.index
+    nbytes = sum(_series_nbytes(s) for s in changed.values())
+    if index is not None:
+        nbytes += int(index.memory_usage(deep=True))
+    return _State(index=index, columns=list(new.columns), changed=changed, nbytes=nbytes)
+
+
+def _apply_delta(prev: pd.DataFrame, state: _State) -> pd.DataFrame:
+    base = prev if state.index is None else prev.loc[state.index]
+    data = {col: (state.changed[col] if col in state.changed else base[col]) for col in state.columns}
+    return pd.DataFrame(data, index=base.index, columns=state.columns)
+
+
+class HistoryManager:
+    """Linear undo/redo timeline over DataFrame states, starting at ``base``."""
+
+    def __init__(self, base: pd.DataFrame, max_bytes: Optional[int] = None, checkpoint_every: Optional[int] = None):
+        self.base = base
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv("DATA_CLEANER_HISTORY_MB", "512")) * 1024 * 1024)
+        self.checkpoint_every = checkpoint_every or int(os.getenv("DATA_CLEANER_HISTORY_CHECKPOINT", "5"))
+        # The base is owned by the session (df_original), so it costs the history nothing
+        self._states: List[_State] = [_State(checkpoint=base)]
+        self._cursor = 0
+        self._current = base
+
+    @property
+    def current(self) -> pd.DataFrame:
+        return self._current
+
+    def can_undo(self) -> bool:
+        return self._cursor > 0
+
+    def can_redo(self) -> bool:
+        return self._cursor < len(self._states) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self._states)
+
+    def commit(self, new_df: pd.DataFrame) -> None:
+        """Record ``new_df`` as the next state; clears any redo states."""
+        del self._states[self._cursor + 1:]
+        if new_df is self.base:
+            state = _State(checkpoint=self.base)
+        else:
+            since_checkpoint = 0
+            for s in reversed(self._states):
+                if s.is_checkpoint:
+                    break
+                since_checkpoint += 1
+            state = None
+            if since_checkpoint + 1 < self.checkpoint_every:
+                state = _make_delta(self._current, new_df)
+            if state is None:
+                state = _State(checkpoint=new_df, nbytes=_frame_nbytes(new_df))
+        self._states.append(state)
+        self._cursor += 1
+        self._current = new_df
+        self._enforce_budget()
+
+    def undo(self) -> pd.DataFrame:
+        if self.can_undo():
+            self._cursor -= 1
+            self._current = self._materialize(self._cursor)
+        return self._handout()
+
+    def redo(self) -> pd.DataFrame:
+        if self.can_redo():
+            self._cursor += 1
+            self._current = self._materialize(self._cursor)
+        return self._handout()
+
+    def _handout(self) -> pd.DataFrame:
+        # The base is shared with the session and the dataset cache; never hand it out to be edited
+        return self._current.copy() if self._current is self.base else self._current
+
+    def _materialize(self, position: int) -> pd.DataFrame:
+        start = position
+        while not self._states[start].is_checkpoint:
+            start -= 1
+        df = self._states[start].checkpoint
+        for state in self._states[start + 1:position + 1]:
+            df = _apply_delta(df, state)
+        return df
+
+    def _enforce_budget(self) -> None:
+        # Drop the oldest states (never the current one); the new oldest becomes a checkpoint
+        while self.nbytes > self.max_bytes and self._cursor > 0:
+            if not self._states[1].is_checkpoint:
+                df = self._materialize(1)
+                self._states[1] = _State(checkpoint=df, nbytes=_frame_nbytes(df))
+            del self._states[0]
+            self._cursor -= 1
@@ -0,0 +1,353 @@
+"""
+Incremental profile updates for cell edits.
+
+Saving the spreadsheet editor swaps in a frame that differs from the previous
+one in a handful of cells. ``update_profile(before, after, ops)`` derives the
+new frame's ``DatasetProfile`` from the cached profile of ``before`` by
+looking only at the edited cells:
+
+- missing counts: +/- per edited cell
+- distinct counts: per-column counts of value hashes (old value out, new in)
+- duplicate rows: counts of whole-row hashes, rehashing only edited rows
+- numeric stats: count/mean/std by Welford add/remove; min/max from the new
+  values, rescanning the column only when an edit removes the old extreme;
+  quartiles re-selected only when an edit crosses one of them
+- IQR outlier counts: one comparison over each touched numeric column
+
+The hash counts and quartile neighbours are built on the first update of a
+frame (one hashing pass over the touched columns and one over the rows) and
+handed from frame to frame with every later update, so repeated edits cost
+O(edited cells). Analyzer outputs (quality score, summary, patterns, column
+info) are carried over; suggestions whose issue the edits resolved are
+dropped. Row or column changes and changed dtypes fall back to a full
+``build_profile``.
+
+Edits come from ``utils.diff_ops.create_manual_edit_ops`` (ops with a
+"column" and a "row"/"index" label); when the ops cannot be read as cell
+edits, ``cell_edits`` diffs the two frames column by column instead.
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.profile import (
+    DatasetProfile,
+    _VERSION_COUNTER,
+    frame_cache_peek,
+    frame_cache_pop,
+    frame_cached,
+    get_profile,
+)
+
+QUANTILES = (0.25, 0.5, 0.75)
+_QUANTILE_KEYS = ("q1", "median", "q3")
+_ROW_KEYS = ("row", "index", "row_index")
+_STATE_KEY = "profile_delta_state"
+
+Edits = Dict[Any, np.ndarray]  # column -> positions of edited rows
+
+
+def _hashes(values: Any) -> np.ndarray:
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+class _HashCounts:
+    """Multiset of uint64 hashes: sorted base array plus a dict for hashes added later."""
+
+    def __init__(self, hashes: np.ndarray):
+        keys = np.sort(hashes)
+        if keys.size:
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            self.keys = keys[starts]
+            self.counts = np.diff(np.r_[starts, keys.size])
+        else:
+            self.keys = keys
+            self.counts = np.zeros(0, dtype=np.intp)
+        self.extra: Dict[int, int] = {}
+        self.n_distinct = int(self.keys.size)
+
+    def update(self, hashes: np.ndarray, delta: int) -> None:
+        idx = np.searchsorted(self.keys, hashes)
+        found = idx < self.keys.size
+        found[found] = self.keys[idx[found]] == hashes[found]
+        for h, i, hit in zip(hashes.tolist(), idx.tolist(), found.tolist()):
+            before = int(self.counts[i]) if hit else self.extra.get(h, 0)
+            after = before + delta
+            if hit:
+                self.counts[i] = after
+            elif after:
+                self.extra[h] = after
+            else:
+                self.extra.pop(h, None)
+            self.n_distinct += (after > 0) - (before > 0)
+
+
+def _order_stats(values: np.ndarray) -> Dict[float, Tuple[float, float, float]]:
+    """``{q: (lower neighbour, upper neighbour, quantile)}`` with linear interpolation."""
+    if values.size == 0:
+        return {q: (np.nan, np.nan, np.nan) for q in QUANTILES}
+    pos = np.asarray(QUANTILES) * (values.size - 1)
+    below = np.floor(pos).astype(np.intp)
+    above = np.minimum(below + 1, values.size - 1)
+    part = np.partition(values, np.concatenate([below, above]))
+    return {
+        q: (float(part[b]), float(part[a]), float(part[b] + (part[a] - part[b]) * (p - b)))
+        for q, b, a, p in zip(QUANTILES, below, above, pos)
+    }
+
+
+@dataclass
+class _Moments:
+    count: int
+    mean: float
+    m2: float
+    minimum: float
+    maximum: float
+    order: Dict[float, Tuple[float, float, float]]
+
+    @classmethod
+    def of(cls, values: np.ndarray) -> "_Moments":
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return cls(0, 0.0, 0.0, np.nan, np.nan, _order_stats(values))
+        mean = float(values.mean())
+        return cls(int(values.size), mean, float(((values - mean) ** 2).sum()),
+                   float(values.min()), float(values.max()), _order_stats(values))
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x: float) -> None:
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        self.count -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (x - self.mean)
+
+    def apply(self, old: np.ndarray, new: np.ndarray, column: np.ndarray) -> None:
+        """Swap ``old`` for ``new`` (NaN = missing); ``column`` is the edited column's values."""
+        old_vals, new_vals = old[~np.isnan(old)], new[~np.isnan(new)]
+        for x in old_vals.tolist():
+            self.remove(x)
+        for x in new_vals.tolist():
+            self.add(x)
+        if self.count == 0:
+            self.minimum = self.maximum = np.nan
+        elif (old_vals <= self.minimum).any() or (old_vals >= self.maximum).any() or np.isnan(self.minimum):
+            self.minimum, self.maximum = float(np.nanmin(column)), float(np.nanmax(column))
+        elif new_vals.size:
+            self.minimum = min(self.minimum, float(new_vals.min()))
+            self.maximum = max(self.maximum, float(new_vals.max()))
+        if old_vals.size != new_vals.size or self._crosses(old, new):
+            self.order = _order_stats(column[~np.isnan(column)])
+
+    def _crosses(self, old: np.ndarray, new: np.ndarray) -> bool:
+        # An edit that stays strictly below (or above) both neighbours of a
+        # quantile cannot move it
+        for lo, hi, _ in self.order.values():
+            side_old = np.where(old < lo, -1, np.where(old > hi, 1, 0))
+            side_new = np.where(new < lo, -1, np.where(new > hi, 1, 0))
+            if (side_old == 0).any() or (side_old != side_new).any():
+                return True
+        return False
+
+    def stats(self) -> Mapping[str, Optional[float]]:
+        def clean(v: float) -> Optional[float]:
+            return None if v is None or np.isnan(v) else float(v)
+        std = np.sqrt(max(self.m2, 0.0) / (self.count - 1)) if self.count > 1 else np.nan
+        out = {
+            "mean": clean(self.mean if self.count else np.nan),
+            "std": clean(std),
+            "min": clean(self.minimum),
+            "max": clean(self.maximum),
+        }
+        out.update((key, clean(self.order[q][2])) for key, q in zip(_QUANTILE_KEYS, QUANTILES))
+        return MappingProxyType(out)
+
+
+@dataclass
+class _DeltaState:
+    rows: Optional[_HashCounts] = None
+    columns: Dict[str, _HashCounts] = field(default_factory=dict)
+    moments: Dict[str, _Moments] = field(default_factory=dict)
+
+
+def _same_structure(before: pd.DataFrame, after: pd.DataFrame) -> bool:
+    return (before.shape == after.shape and before.columns.equals(after.columns)
+            and before.index.equals(after.index) and before.dtypes.equals(after.dtypes)
+            and before.columns.is_unique)
+
+
+def cell_edits(before: pd.DataFrame, after: pd.DataFrame) -> Optional[Edits]:
+    """Edited cells of ``after`` relative to ``before``; None for row/column/dtype changes."""
+    if not _same_structure(before, after):
+        return None
+    edits: Edits = {}
+    for col in before.columns:
+        old, new = before[col], after[col]
+        if old is new:
+            continue
+        differs = old.ne(new)
+        if differs.dtype != bool:
+            differs = differs.fillna(True).astype(bool)
+        changed = differs.to_numpy() & ~(old.isna().to_numpy() & new.isna().to_numpy())
+        positions = np.flatnonzero(changed)
+        if positions.size:
+            edits[col] = positions
+    return edits
+
+
+def edits_from_ops(before: pd.DataFrame, ops: Iterable[Any]) -> Optional[Edits]:
+    """Cell edits named by manual edit ops (row labels of ``before``); None if any op is not a cell edit."""
+    labels: Dict[Any, list] = {}
+    for op in ops:
+        if not isinstance(op, Mapping) or op.get("column") not in before.columns:
+            return None
+        row_key = next((k for k in _ROW_KEYS if k in op), None)
+        if row_key is None:
+            return None
+        labels.setdefault(op["column"], []).append(op[row_key])
+    edits: Edits = {}
+    for col, rows in labels.items():
+        positions = before.index.get_indexer(rows)
+        if (positions < 0).any():
+            return None
+        edits[col] = np.unique(positions)
+    return edits
+
+
+def _float_values(values: pd.Series) -> np.ndarray:
+    return values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _non_missing_hashes(values: pd.Series) -> np.ndarray:
+    return _hashes(values[values.notna().to_numpy()])
+
+
+def _memory_delta(old: pd.Series, new: pd.Series, before_col: pd.Series, after_col: pd.Series) -> int:
+    if before_col.dtype == object:
+        # Deep usage of object columns is the sum of sys.getsizeof over the values
+        return sum(map(sys.getsizeof, new.tolist())) - sum(map(sys.getsizeof, old.tolist()))
+    if pd.api.types.is_numeric_dtype(before_col.dtype) or pd.api.types.is_bool_dtype(before_col.dtype):
+        return 0
+    return int(after_col.memory_usage(index=False, deep=True) - before_col.memory_usage(index=False, deep=True))
+
+
+def _outlier_counts(after: pd.DataFrame, columns: Sequence[Any], stats: Mapping[str, Mapping[str, Any]]) -> Dict[str, int]:
+    from utils.outliers import OUTLIER_METHOD, detect_outliers, iqr_bounds, outlier_mask
+    if not columns:
+        return {}
+    if OUTLIER_METHOD != "iqr":
+        return detect_outliers(after, list(columns)).counts
+    bounds = {}
+    for col in columns:
+        s = stats[str(col)]
+        if s.get("q1") is not None and s.get("q3") is not None:
+            bounds[str(col)] = iqr_bounds(s["q1"], s["q3"])
+    counts = {str(c): 0 for c in columns}
+    if bounds:
+        counts.update(outlier_mask(after[list(columns)], bounds)[1])
+    return counts
+
+
+def _prune_suggestions(suggestions: Mapping[str, Mapping[str, Any]], missing: Mapping[str, int],
+                       duplicates: int, outliers: Mapping[str, int]) -> Mapping[str, Mapping[str, Any]]:
+    kept = {}
+    for key, suggestion in suggestions.items():
+        t, col = suggestion.get("type"), str(suggestion.get("column"))
+        if t in ("missing_numeric", "missing_categorical") and missing.get(col) == 0:
+            continue
+        if t == "duplicates" and duplicates == 0:
+            continue
+        if t == "outliers" and col in outliers:
+            if outliers[col] == 0:
+                continue
+            suggestion = {**suggestion, "count": outliers[col]}
+        kept[key] = MappingProxyType(dict(suggestion))
+    return MappingProxyType(kept)
+
+
+def update_profile(before: pd.DataFrame, after: pd.DataFrame, ops: Optional[Iterable[Any]] = None) -> DatasetProfile:
+    """Profile of ``after`` (``before`` with some cells edited), derived from ``before``'s cached profile.
+
+    ``ops`` are the manual edit ops for the change; without them (or when
+    they are not plain cell edits) the frames are diffed. The new profile is
+    cached for ``after``, so ``get_profile(after)`` returns it.
+    """
+    with_analyzer = frame_cache_peek(before, "profile") is not None
+    base = frame_cache_peek(before, "profile") or frame_cache_peek(before, "profile_stats")
+    if base is None or not _same_structure(before, after):
+        return get_profile(after, with_analyzer=with_analyzer)
+    edits = edits_from_ops(before, ops) if ops is not None else None
+    if edits is None:
+        edits = cell_edits(before, after)
+        if edits is None:
+            return get_profile(after, with_analyzer=with_analyzer)
+
+    state = frame_cache_pop(before, _STATE_KEY) or _DeltaState()
+    missing = dict(base.missing)
+    cardinality = dict(base.cardinality)
+    numeric_stats = dict(base.numeric_stats)
+    memory = base.memory_bytes
+    numeric_touched = []
+    for col, positions in edits.items():
+        key = str(col)
+        before_col, after_col = before[col], after[col]
+        old, new = before_col.iloc[positions], after_col.iloc[positions]
+        old_na, new_na = old.isna().to_numpy(), new.isna().to_numpy()
+        missing[key] += int(new_na.sum()) - int(old_na.sum())
+
+        counts = state.columns.get(key)
+        if counts is None:
+            # First edit of this column: hash its values as they were before
+            counts = state.columns[key] = _HashCounts(_non_missing_hashes(before_col))
+        counts.update(_hashes(old[~old_na]), -1)
+        counts.update(_hashes(new[~new_na]), +1)
+        cardinality[key] = counts.n_distinct
+
+        if key in numeric_stats:
+            moments = state.moments.get(key)
+            if moments is None:
+                moments = state.moments[key] = _Moments.of(_float_values(before_col))
+            moments.apply(_float_values(old), _float_values(new), _float_values(after_col))
+            numeric_stats[key] = moments.stats()
+            numeric_touched.append(col)
+        memory += _memory_delta(old, new, before_col, after_col)
+
+    rows = np.unique(np.concatenate(list(edits.values()))) if edits else np.empty(0, dtype=np.intp)
+    if state.rows is None:
+        state.rows = _HashCounts(_hashes(before)) if rows.size else None
+    if state.rows is not None and rows.size:
+        state.rows.update(_hashes(before.iloc[rows]), -1)
+        state.rows.update(_hashes(after.iloc[rows]), +1)
+    duplicates = after.shape[0] - state.rows.n_distinct if state.rows is not None else base.duplicates
+
+    outliers = dict(base.outliers)
+    outliers.update(_outlier_counts(after, numeric_touched, numeric_stats))
+    profile = replace(
+        base,
+        version=next(_VERSION_COUNTER),
+        missing=MappingProxyType(missing),
+        missing_total=sum(missing.values()),
+        duplicates=int(duplicates),
+        cardinality=MappingProxyType(cardinality),
+        numeric_stats=MappingProxyType(numeric_stats),
+        memory_bytes=int(memory),
+        suggestions=_prune_suggestions(base.suggestions, missing, int(duplicates), outliers),
+        outliers=MappingProxyType(outliers),
+        base_version=base.version,
+    )
+    frame_cached(after, _STATE_KEY, lambda: state)
+    return frame_cached(after, "profile" if with_analyzer else "profile_stats", lambda: profile)
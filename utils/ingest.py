@@ -0,0 +1,403 @@
+"""
+Shared dataset ingestion and export for the Streamlit app, Dash prototype and API.
+
+CSV files go through the pyarrow CSV engine: column types are inferred from a
+leading sample, the file is parsed multi-threaded in fixed-size blocks and
+progress is reported per block. When pyarrow is unavailable (or the sample
+types do not hold for the whole file) we fall back to pandas' chunked C parser.
+
+Parquet, Feather and Arrow IPC are read and written through pyarrow directly;
+they keep their dtypes and avoid Excel's ~1M row sheet limit on export.
+``iter_export`` streams a frame as CSV, Parquet or an Arrow IPC stream in
+row slices, so a response body never holds more than one slice encoded.
+
+Tuning (environment):
+- DATA_CLEANER_CSV_BLOCK_MB: block size for chunked reads (default 16)
+- DATA_CLEANER_CSV_SAMPLE_KB: bytes used for dtype inference (default 1024)
+- DATA_CLEANER_STREAM_ROWS: rows per slice in streamed exports (default 65536)
+"""
+
+from __future__ import annotations
+
+import io
+import os
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    _ARROW_AVAILABLE = True
+except Exception:
+    pa = None  # type: ignore
+    pacsv = None  # type: ignore
+    feather = ipc = pq = None  # type: ignore
+    _ARROW_AVAILABLE = False
+
+ProgressCallback = Callable[[float], None]
+Source = Union[str, bytes, "os.PathLike[str]", Any]
+
+CSV_BLOCK_BYTES = int(float(os.getenv("DATA_CLEANER_CSV_BLOCK_MB", "16")) * 1024 * 1024)
+CSV_SAMPLE_BYTES = int(float(os.getenv("DATA_CLEANER_CSV_SAMPLE_KB", "1024")) * 1024)
+# Rows per chunk for the pandas fallback parser
+PANDAS_CHUNK_ROWS = 200_000
+STREAM_ROWS = int(os.getenv("DATA_CLEANER_STREAM_ROWS", "65536"))
+
+# Columnar formats: extension -> canonical format name
+COLUMNAR_EXTENSIONS = {
+    "parquet": "parquet",
+    "pq": "parquet",
+    "feather": "feather",
+    "arrow": "arrow",
+    "ipc": "arrow",
+    "arrows": "arrow",
+}
+
+# Export formats: name -> (file extension, mime type, compression codecs; first is default)
+EXPORT_FORMATS = {
+    "parquet": ("parquet", "application/vnd.apache.parquet", ["snappy", "zstd", "gzip", "brotli", "lz4", "none"]),
+    "feather": ("feather", "application/vnd.apache.arrow.file", ["lz4", "zstd", "none"]),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file", ["none", "lz4", "zstd"]),
+}
+
+# Streamed export formats: name -> (file extension, mime type)
+STREAM_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrows", "application/vnd.apache.arrow.stream"),
+}
+
+
+class _CountingReader(io.RawIOBase):
+    """Read-only file wrapper that counts consumed bytes.
+
+    The arrow reader pulls from this on its own IO thread, so it only counts;
+    callers report ``fraction()`` from the loop that consumes the batches.
+    """
+
+    def __init__(self, raw, total: Optional[int]):
+        self._raw = raw
+        self._total = total
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._raw.read(size)
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def fraction(self) -> Optional[float]:
+        if not self._total:
+            return None
+        return min(self.bytes_read / self._total, 1.0)
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def _open_source(source: Source):
+    """Return (binary file object, total size or None, should_close)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(bytes(source)), len(source), True
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "rb"), os.path.getsize(source), True
+    raw = getattr(source, "file", source)  # FastAPI UploadFile -> SpooledTemporaryFile
+    total = getattr(source, "size", None)
+    try:
+        if raw.seekable():
+            start = raw.tell()
+            raw.seek(0, io.SEEK_END)
+            total = raw.tell() - start
+            raw.seek(start)
+    except Exception:
+        pass
+    return raw, total, False
+
+
+def sample_column_types(source: Source) -> Dict[str, Any]:
+    """Arrow column types inferred from the head of a CSV (see ``iter_csv_chunks``)."""
+    if not _ARROW_AVAILABLE:
+        return {}
+    raw, _, should_close = _open_source(source)
+    try:
+        return _sample_column_types(raw)
+    finally:
+        if should_close:
+            raw.close()
+
+
+def _sample_column_types(raw) -> Dict[str, Any]:
+    """Infer arrow column types from the first CSV_SAMPLE_BYTES of a seekable file."""
+    start = raw.tell()
+    sample = raw.read(CSV_SAMPLE_BYTES)
+    raw.seek(start)
+    if isinstance(sample, str):
+        sample = sample.encode("utf-8")
+    if len(sample) == CSV_SAMPLE_BYTES:
+        # Drop the trailing partial line so the sample parses cleanly
+        cut = sample.rfind(b"\n")
+        if cut > 0:
+            sample = sample[:cut + 1]
+    table = pacsv.read_csv(
+        io.BytesIO(sample),
+        convert_options=_convert_options(None),
+    )
+    types = {}
+    for f in table.schema:
+        if pa.types.is_null(f.type):
+            continue  # entirely null in the sample: leave to block-level inference
+        if pa.types.is_temporal(f.type):
+            types[f.name] = pa.string()  # keep dates as text; parse_datetime owns that step
+        else:
+            types[f.name] = f.type
+    return types
+
+
+def _convert_options(column_types: Optional[Dict[str, Any]]):
+    return pacsv.ConvertOptions(
+        column_types=column_types or None,
+        strings_can_be_null=True,  # match pandas: empty cells become NaN
+        timestamp_parsers=[],
+    )
+
+
+def _open_arrow_reader(raw, block_bytes: int, column_types: Optional[Dict[str, Any]]):
+    return pacsv.open_csv(
+        raw,
+        read_options=pacsv.ReadOptions(block_size=block_bytes, use_threads=True),
+        convert_options=_convert_options(column_types),
+    )
+
+
+def _iter_batches(reader, counting: _CountingReader, progress: Optional[ProgressCallback]):
+    """Yield non-empty batches, reporting progress on the consuming thread."""
+    for batch in reader:
+        _report(counting, progress)
+        if batch.num_rows:
+            yield batch
+
+
+def _report(counting: _CountingReader, progress: Optional[ProgressCallback]) -> None:
+    if progress is not None:
+        fraction = counting.fraction()
+        if fraction is not None:
+            progress(fraction)
+
+
+def iter_csv_chunks(
+    source: Source,
+    block_bytes: int = CSV_BLOCK_BYTES,
+    progress: Optional[ProgressCallback] = None,
+    column_types: Optional[Dict[str, Any]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield a CSV file as a sequence of DataFrames of roughly ``block_bytes`` each.
+
+    Types are fixed from the leading sample (or ``column_types``, arrow types
+    by column name) so every chunk shares one schema. Intended for out-of-core
+    consumers; use ``read_csv_fast`` to materialize.
+    """
+    raw, total, should_close = _open_source(source)
+    try:
+        counting = _CountingReader(raw, total)
+        if _ARROW_AVAILABLE:
+            if column_types is None and _seekable(raw):
+                column_types = _sample_column_types(raw)
+            reader = _open_arrow_reader(counting, block_bytes, column_types)
+            for batch in _iter_batches(reader, counting, progress):
+                yield batch.to_pandas()
+        else:
+            for chunk in pd.read_csv(counting, chunksize=PANDAS_CHUNK_ROWS):
+                _report(counting, progress)
+                yield chunk
+        if progress is not None:
+            progress(1.0)
+    finally:
+        if should_close:
+            raw.close()
+
+
+def read_csv_fast(
+    source: Source,
+    block_bytes: int = CSV_BLOCK_BYTES,
+    progress: Optional[ProgressCallback] = None,
+) -> pd.DataFrame:
+    """Parse a whole CSV into a DataFrame using the multi-threaded arrow reader.
+
+    Batches are assembled into a single arrow table and converted to pandas in
+    one pass (``split_blocks``/``self_destruct``), which keeps peak memory close
+    to the size of the final frame instead of several times the file size.
+    """
+    raw, total, should_close = _open_source(source)
+    try:
+        if not _ARROW_AVAILABLE:
+            return _read_csv_pandas(raw, total, progress)
+        start = raw.tell() if _seekable(raw) else None
+        try:
+            column_types = _sample_column_types(raw) if start is not None else None
+            counting = _CountingReader(raw, total)
+            reader = _open_arrow_reader(counting, block_bytes, column_types)
+            # An explicit schema keeps header-only files (zero batches) readable
+            table = pa.Table.from_batches(list(_iter_batches(reader, counting, progress)), schema=reader.schema)
+        except pa.ArrowInvalid:
+            # The sample did not parse, or its types did not hold further down the file
+            if start is None:
+                raise
+            raw.seek(start)
+            return _read_csv_pandas(raw, total, progress)
+        if table.num_columns == 0:
+            return pd.DataFrame()
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+        if progress is not None:
+            progress(1.0)
+        return df
+    finally:
+        if should_close:
+            raw.close()
+
+
+def _read_csv_pandas(raw, total: Optional[int], progress: Optional[ProgressCallback]) -> pd.DataFrame:
+    counting = _CountingReader(raw, total)
+    chunks = []
+    for chunk in pd.read_csv(counting, chunksize=PANDAS_CHUNK_ROWS):
+        _report(counting, progress)
+        chunks.append(chunk)
+    if progress is not None:
+        progress(1.0)
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def _seekable(raw) -> bool:
+    try:
+        return bool(raw.seekable())
+    except Exception:
+        return False
+
+
+def read_columnar(source: Source, fmt: str) -> pd.DataFrame:
+    """Read a Parquet, Feather or Arrow IPC (file or stream) payload into a DataFrame."""
+    if not _ARROW_AVAILABLE:
+        raise ImportError("pyarrow is required for Parquet/Feather/Arrow files: pip install pyarrow")
+    fmt = COLUMNAR_EXTENSIONS.get(fmt.lower().lstrip("."), fmt.lower())
+    raw, _, should_close = _open_source(source)
+    try:
+        if fmt == "parquet":
+            table = pq.read_table(raw)
+        elif fmt == "feather":
+            table = feather.read_table(raw)
+        elif fmt == "arrow":
+            start = raw.tell() if _seekable(raw) else None
+            try:
+                table = ipc.open_file(raw).read_all()
+            except pa.ArrowInvalid:
+                # Not the random-access file format; try the streaming format
+                if start is None:
+                    raise
+                raw.seek(start)
+                table = ipc.open_stream(raw).read_all()
+        else:
+            raise ValueError(f"Unsupported columnar format: {fmt}")
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    finally:
+        if should_close:
+            raw.close()
+
+
+def export_dataframe(df: pd.DataFrame, fmt: str, compression: Optional[str] = None) -> bytes:
+    """Serialize ``df`` to Parquet, Feather or Arrow IPC bytes.
+
+    ``compression`` is one of the codecs listed in ``EXPORT_FORMATS`` for the
+    format; ``None`` picks the format's default and ``"none"`` disables it.
+    """
+    if not _ARROW_AVAILABLE:
+        raise ImportError("pyarrow is required for Parquet/Feather/Arrow export: pip install pyarrow")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    codecs = EXPORT_FORMATS[fmt][2]
+    codec = compression or codecs[0]
+    if codec not in codecs:
+        raise ValueError(f"Compression '{codec}' is not supported for {fmt}; choose from {codecs}")
+    codec_arg = None if codec == "none" else codec
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    if fmt == "parquet":
+        pq.write_table(table, sink, compression=codec_arg or "NONE")
+    elif fmt == "feather":
+        feather.write_feather(table, sink, compression=codec_arg or "uncompressed")
+    else:
+        options = ipc.IpcWriteOptions(compression=codec_arg)
+        with ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only file that hands its buffered bytes to the caller on ``drain``."""
+
+    def __init__(self):
+        self._parts: list = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_export(
+    df: pd.DataFrame,
+    fmt: str,
+    chunk_rows: Optional[int] = None,
+    metadata: Optional[Dict[str, str]] = None,
+) -> Iterator[bytes]:
+    """Encode ``df`` as ``fmt`` ("csv", "parquet" or "arrow") one row slice at a time.
+
+    Parquet writes one row group per slice and Arrow an IPC stream with one
+    record batch per slice; ``metadata`` goes into their schema metadata.
+    Joined, the yielded pieces form one valid file.
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Unsupported streaming format: {fmt}")
+    chunk_rows = max(1, chunk_rows or STREAM_ROWS)
+    slices = (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+    if fmt == "csv":
+        yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+        for part in slices:
+            yield part.to_csv(index=False, header=False).encode("utf-8")
+        return
+
+    if not _ARROW_AVAILABLE:
+        raise ImportError("pyarrow is required for Parquet/Arrow export: pip install pyarrow")
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    if metadata:
+        schema = schema.with_metadata({**(schema.metadata or {}), **{k.encode(): v.encode() for k, v in metadata.items()}})
+    sink = _DrainSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy") if fmt == "parquet" else ipc.new_stream(sink, schema)
+    try:
+        for part in slices:
+            writer.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
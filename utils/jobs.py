@@ -0,0 +1,557 @@
+"""
+Persistent batch jobs for long-running cleans.
+
+``JobQueue`` keeps jobs in SQLite (WAL mode) and runs them on local worker
+threads, so a client submits a dataset, polls for progress and downloads
+the full cleaned frame instead of holding one request open:
+
+- ``submit_file`` / ``submit_frame`` / ``submit_database`` store the input
+  under the job's directory (uploads byte for byte, in-memory frames as
+  Parquet, database loads as their connection parameters) and queue the job.
+  A database password is never written to disk: the stored URL has it
+  removed, the full URL stays in the memory of the submitting process and
+  the job is pinned to that process's workers.
+- Workers claim queued jobs in submission order inside one write
+  transaction, load and compact the input, profile it, compile and execute
+  the cleaning plan, recording every phase and plan stage as it starts, and
+  write the cleaned frame to ``result.parquet`` next to the input. CSV
+  uploads of DATA_CLEANER_JOBS_STREAM_MB or more are never loaded whole:
+  they go through ``utils.streaming_clean.stream_clean`` (two passes over
+  the file, chunk by chunk) and write the same result file.
+- Every process running a queue records a heartbeat in the database, and
+  a claimed job records which process runs it. Jobs whose process has not
+  beaten for DATA_CLEANER_JOBS_STALE seconds are queued again (up to
+  MAX_ATTEMPTS runs), checked on start and by idle workers, so jobs other
+  live processes are running are never touched; jobs pinned to a dead
+  process fail, as their credentials died with it. Finished jobs stay until
+  ``purge`` drops them after the retention period; it runs on start and
+  then every PURGE_SECONDS from idle workers.
+
+Job states: queued -> running -> done | failed.
+
+Configuration (environment):
+- DATA_CLEANER_JOBS_DIR: database and job files (default <tmp>/data_cleaner_jobs)
+- DATA_CLEANER_JOBS_WORKERS: worker threads (default 2)
+- DATA_CLEANER_JOBS_RETENTION: seconds finished jobs are kept (default 86400)
+- DATA_CLEANER_JOBS_STALE: seconds without a heartbeat before a process's
+  running jobs are taken over (default 60)
+- DATA_CLEANER_JOBS_STREAM_MB: CSV size from which jobs are cleaned out of
+  core (default 512)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+JOBS_DIR = os.getenv("DATA_CLEANER_JOBS_DIR") or os.path.join(tempfile.gettempdir(), "data_cleaner_jobs")
+JOBS_WORKERS = int(os.getenv("DATA_CLEANER_JOBS_WORKERS", "2"))
+JOBS_RETENTION = float(os.getenv("DATA_CLEANER_JOBS_RETENTION", "86400"))
+JOBS_STALE = float(os.getenv("DATA_CLEANER_JOBS_STALE", "60"))
+JOBS_STREAM_BYTES = int(float(os.getenv("DATA_CLEANER_JOBS_STREAM_MB", "512")) * 1024 * 1024)
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 1.0
+HEARTBEAT_SECONDS = 10.0
+PURGE_SECONDS = 600.0
+
+JOB_STATES = ("queued", "running", "done", "failed")
+RESULT_FILE = "result.parquet"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    progress TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    pinned_to TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+CREATE TABLE IF NOT EXISTS owners (
+    id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+# Columns added after the first release; older databases get them on open
+_ADDED_COLUMNS = {"owner": "TEXT", "pinned_to": "TEXT"}
+_LIVE_OWNERS = "SELECT id FROM owners WHERE heartbeat >= ?"
+
+
+@dataclass(frozen=True)
+class JobRecord:
+    id: str
+    status: str
+    source: Dict[str, Any]  # kind ("file", "frame", "database") and how to load it
+    progress: Dict[str, Any]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    attempts: int
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "JobRecord":
+        return cls(
+            id=row["id"],
+            status=row["status"],
+            source=json.loads(row["source"]),
+            progress=json.loads(row["progress"]),
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON view for the API; database credentials in the source are not echoed."""
+        source = {k: v for k, v in self.source.items() if k not in ("connection_url", "path")}
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "source": source,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def supported_upload(filename: str) -> bool:
+    from utils.ingest import COLUMNAR_EXTENSIONS
+    ext = filename.rsplit(".", 1)[-1].lower()
+    return ext in ("csv", "xlsx", "xls", "json") or ext in COLUMNAR_EXTENSIONS
+
+
+def _load_source(source: Dict[str, Any], rows_read: Optional[Callable[[int], None]] = None) -> pd.DataFrame:
+    from utils.compaction import compact_on_load
+    from utils.ingest import COLUMNAR_EXTENSIONS, read_columnar, read_csv_fast
+
+    kind = source["kind"]
+    if kind == "frame":
+        return pd.read_parquet(source["path"])
+    if kind == "database":
+        from utils.db_stream import read_from_database
+        return compact_on_load(read_from_database(source["connection_url"], table=source.get("table"),
+                                                  query=source.get("query"), progress=rows_read))
+    ext = source["filename"].rsplit(".", 1)[-1].lower()
+    path = source["path"]
+    if ext == "csv":
+        return compact_on_load(read_csv_fast(path))
+    if ext in ("xlsx", "xls"):
+        return compact_on_load(pd.read_excel(path))
+    if ext == "json":
+        return compact_on_load(pd.read_json(path))
+    if ext in COLUMNAR_EXTENSIONS:
+        return compact_on_load(read_columnar(path, ext))
+    raise ValueError(f"Unsupported file format: {source['filename']}")
+
+
+def clean_job(job: JobRecord, job_dir: str, progress: Callable[[str, Dict[str, Any]], None]) -> Dict[str, Any]:
+    """Load, profile and clean the job's input; the cleaned frame goes to ``job_dir/result.parquet``."""
+    from utils.cleaning_plan import compile_plan, execute_plan
+    from utils.ingest import export_dataframe
+    from utils.profile import get_profile
+
+    if _streams(job.source):
+        return _stream_clean_job(job.source["path"], job_dir, progress)
+    progress("load", {})
+    df = _load_source(job.source, rows_read=lambda rows: progress("load", {"rows_read": rows}))
+    progress("profile", {"rows": int(df.shape[0]), "cols": int(df.shape[1])})
+    suggestions = get_profile(df, with_analyzer=True).suggestions_copy()
+    plan = compile_plan(df, suggestions)
+    result = execute_plan(
+        df, plan, parallel="thread",
+        progress=lambda done, total, stage: progress("clean", {"done": done, "total": total, "stage": stage}),
+    )
+    progress("write", {})
+    path = os.path.join(job_dir, RESULT_FILE)
+    with open(path + ".tmp", "wb") as fh:
+        fh.write(export_dataframe(result.df, "parquet"))
+    os.replace(path + ".tmp", path)
+    return {
+        "rows_in": int(df.shape[0]),
+        "rows": int(result.df.shape[0]),
+        "cols": int(result.df.shape[1]),
+        "log": result.log,
+        "plan": result.report_frame().to_dict(orient="records"),
+        "bytes": os.path.getsize(path),
+    }
+
+
+def _streams(source: Dict[str, Any]) -> bool:
+    """Whether the job's input is a CSV upload too large to clean in memory."""
+    return (source["kind"] == "file" and source["filename"].rsplit(".", 1)[-1].lower() == "csv"
+            and os.path.getsize(source["path"]) >= JOBS_STREAM_BYTES)
+
+
+def _stream_clean_job(path: str, job_dir: str, progress: Callable[[str, Dict[str, Any]], None]) -> Dict[str, Any]:
+    """Clean a large CSV out of core; suggestions come from the first chunk."""
+    import pyarrow.parquet as pq
+
+    from utils.streaming_clean import stream_clean
+
+    progress("clean", {"streamed": True, "fraction": 0.0})
+    out = os.path.join(job_dir, RESULT_FILE)
+    result = stream_clean(path, out + ".tmp", fmt="parquet",
+                          progress=lambda fraction: progress("clean", {"streamed": True, "fraction": round(fraction, 3)}))
+    os.replace(out + ".tmp", out)
+    return {
+        "rows_in": result.rows_in,
+        "rows": result.rows_out,
+        "cols": pq.read_metadata(out).num_columns,
+        "log": result.log,
+        "plan": [],
+        "skipped": result.skipped,
+        "streamed": True,
+        "bytes": os.path.getsize(out),
+    }
+
+
+Handler = Callable[[JobRecord, str, Callable[[str, Dict[str, Any]], None]], Dict[str, Any]]
+
+
+class JobQueue:
+    """SQLite-backed job queue with a local pool of worker threads."""
+
+    def __init__(self, root: str = JOBS_DIR, workers: int = JOBS_WORKERS,
+                 retention: float = JOBS_RETENTION, handler: Handler = clean_job):
+        self.root = root
+        self.workers = max(1, workers)
+        self.retention = retention
+        self.handler = handler
+        self.db_path = os.path.join(root, "jobs.sqlite")
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            existing = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in _ADDED_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._credentials: Dict[str, str] = {}  # job id -> full connection URL, never persisted
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self._next_recover = 0.0
+        self._next_purge = 0.0
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Autocommit connection per call: workers and request handlers never share one
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, job_id)
+
+    # --- Submission ---
+
+    def _insert(self, job_id: str, source: Dict[str, Any], pinned: bool = False) -> JobRecord:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, source, progress, created_at, pinned_to) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(source), json.dumps({"phase": "queued"}), time.time(),
+                 self.owner if pinned else None),
+            )
+        with self._wake:
+            self._wake.notify()
+        return self.get(job_id)
+
+    def _new_job(self) -> str:
+        job_id = "job_" + uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        return job_id
+
+    def submit_file(self, fileobj: BinaryIO, filename: str) -> JobRecord:
+        """Queue a job for an uploaded file (copied to the job directory as is)."""
+        job_id = self._new_job()
+        path = os.path.join(self.job_dir(job_id), "input." + filename.rsplit(".", 1)[-1].lower())
+        with open(path, "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1024 * 1024)
+        return self._insert(job_id, {"kind": "file", "filename": filename, "path": path})
+
+    def submit_frame(self, df: pd.DataFrame, label: Optional[str] = None) -> JobRecord:
+        """Queue a job for an in-memory frame (e.g. a stored dataset), saved as Parquet."""
+        from utils.ingest import export_dataframe
+        job_id = self._new_job()
+        path = os.path.join(self.job_dir(job_id), "input.parquet")
+        with open(path, "wb") as out:
+            out.write(export_dataframe(df, "parquet"))
+        return self._insert(job_id, {"kind": "frame", "label": label, "path": path})
+
+    def submit_database(self, connection_url: str, table: Optional[str] = None, query: Optional[str] = None) -> JobRecord:
+        """Queue a job that reads its input from a database when it runs.
+
+        A password in ``connection_url`` is kept in this process only; the job
+        can then only run here and fails if the process exits first.
+        """
+        from sqlalchemy.engine import URL, make_url
+
+        url = make_url(connection_url)
+        job_id = self._new_job()
+        source = {"kind": "database", "connection_url": connection_url, "table": table, "query": query}
+        if url.password is None:
+            return self._insert(job_id, source)
+        # URL.set(password=None) means "unchanged"; rebuild without it
+        bare = URL.create(url.drivername, url.username, None, url.host, url.port, url.database, url.query)
+        source["connection_url"] = bare.render_as_string(hide_password=False)
+        source["password_in_memory"] = True
+        self._credentials[job_id] = connection_url
+        return self._insert(job_id, source, pinned=True)
+
+    # --- Status ---
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return JobRecord.from_row(row) if row is not None else None
+
+    def recent(self, status: Optional[str] = None, limit: int = 100) -> List[JobRecord]:
+        with self._connect() as conn:
+            if status:
+                rows = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY seq DESC LIMIT ?", (status, limit))
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY seq DESC LIMIT ?", (limit,))
+            return [JobRecord.from_row(r) for r in rows.fetchall()]
+
+    def result_path(self, job_id: str) -> Optional[str]:
+        """Cleaned Parquet file of a finished job, or None."""
+        job = self.get(job_id)
+        if job is None or job.status != "done":
+            return None
+        path = os.path.join(self.job_dir(job_id), RESULT_FILE)
+        return path if os.path.exists(path) else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {**{s: 0 for s in JOB_STATES}, **{r[0]: r[1] for r in rows}}
+
+    # --- Workers ---
+
+    def _claim(self) -> Optional[JobRecord]:
+        with self._connect() as conn:
+            # The write lock is taken before reading, so two workers never claim the same job
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' AND (pinned_to IS NULL OR pinned_to = ?) "
+                    "ORDER BY seq LIMIT 1", (self.owner,),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, progress = ?, "
+                        "owner = ? WHERE id = ?",
+                        (time.time(), json.dumps({"phase": "starting"}), self.owner, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def _report(self, job_id: str, started: float, phases: List[Dict[str, Any]]) -> Callable[[str, Dict[str, Any]], None]:
+        def progress(phase: str, info: Dict[str, Any]) -> None:
+            now = time.time()
+            if not phases or phases[-1]["phase"] != phase:
+                if phases:
+                    phases[-1]["seconds"] = round(now - phases[-1].pop("_start"), 4)
+                phases.append({"phase": phase, "_start": now})
+            state = {"phase": phase, **info, "elapsed": round(now - started, 3),
+                     "phases": [{k: v for k, v in p.items() if k != "_start"} for p in phases]}
+            with self._connect() as conn:
+                conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(state, default=str), job_id))
+        return progress
+
+    def _finish(self, job_id: str, status: str, progress: Dict[str, Any],
+                result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                # Only while we still own it: a job taken over after going stale belongs to its new runner
+                "UPDATE jobs SET status = ?, progress = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND owner = ?",
+                (status, json.dumps(progress, default=str), json.dumps(result, default=str) if result is not None else None,
+                 error, time.time(), job_id, self.owner),
+            )
+
+    def run_one(self) -> bool:
+        """Claim and run the oldest queued job; False when the queue is empty."""
+        job = self._claim()
+        if job is None:
+            return False
+        started = time.time()
+        phases: List[Dict[str, Any]] = []
+        with self._active_lock:
+            self._active += 1
+        try:
+            if job.source.get("password_in_memory"):
+                url = self._credentials.get(job.id)
+                if url is None:
+                    raise RuntimeError("Database credentials are no longer available; resubmit the job")
+                job = replace(job, source={**job.source, "connection_url": url})
+            result = self.handler(job, self.job_dir(job.id), self._report(job.id, started, phases))
+        except Exception as e:
+            status, result, error = "failed", None, f"{type(e).__name__}: {e}"
+        else:
+            status, error = "done", None
+        finally:
+            with self._active_lock:
+                self._active -= 1
+        self._credentials.pop(job.id, None)
+        now = time.time()
+        if phases:
+            phases[-1]["seconds"] = round(now - phases[-1].pop("_start"), 4)
+        self._finish(job.id, status, {"phase": status, "elapsed": round(now - started, 3), "phases": phases},
+                     result, error)
+        return True
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.run_one():
+                    continue
+                self._maintain()
+            except sqlite3.Error:
+                pass  # database busy beyond the timeout; retry on the next poll
+            # Polling also picks up jobs submitted by other processes sharing the directory
+            with self._wake:
+                self._wake.wait(POLL_SECONDS)
+
+    def _maintain(self) -> None:
+        """Idle-worker housekeeping: recovery and retention, each on its own interval."""
+        now = time.time()
+        if now >= self._next_recover:
+            # Take over jobs whose process died since we started
+            self._next_recover = now + JOBS_STALE / 2
+            self.recover()
+        if now >= self._next_purge:
+            # A long-running process enforces retention too, not just at start
+            self._next_purge = now + PURGE_SECONDS
+            self.purge()
+
+    def heartbeat(self) -> None:
+        """Record that this process is alive (and still running its claimed jobs)."""
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO owners (id, heartbeat) VALUES (?, ?)", (self.owner, time.time()))
+
+    def _heartbeat_loop(self) -> None:
+        # Keeps beating after stop() while a job is still running, so nobody takes it over
+        while not self._stop.is_set() or self._active:
+            try:
+                self.heartbeat()
+            except sqlite3.Error:
+                pass
+            if self._stop.is_set():
+                time.sleep(HEARTBEAT_SECONDS)
+            else:
+                self._stop.wait(HEARTBEAT_SECONDS)
+
+    def recover(self, stale_after: float = JOBS_STALE) -> int:
+        """Requeue running jobs whose process stopped beating; returns how many.
+
+        Jobs out of attempts fail, and so do jobs pinned to a dead process
+        (their database password was only in its memory).
+        """
+        now = time.time()
+        live = now - stale_after
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stale = f"(owner IS NULL OR owner NOT IN ({_LIVE_OWNERS}))"
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE status IN ('queued', 'running') "
+                    f"AND pinned_to IS NOT NULL AND pinned_to NOT IN ({_LIVE_OWNERS})",
+                    ("Database credentials were held by a process that exited; resubmit the job", now, live),
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Interrupted too many times', finished_at = ? "
+                    f"WHERE status = 'running' AND attempts >= ? AND {stale}",
+                    (now, MAX_ATTEMPTS, live),
+                )
+                requeued = conn.execute(
+                    f"UPDATE jobs SET status = 'queued', owner = NULL, progress = ? WHERE status = 'running' AND {stale}",
+                    (json.dumps({"phase": "queued", "requeued": True}), live),
+                ).rowcount
+                conn.execute("DELETE FROM owners WHERE heartbeat < ?", (now - max(self.retention, stale_after),))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if requeued:
+            with self._wake:
+                self._wake.notify_all()
+        return requeued
+
+    def start(self) -> None:
+        """Recover interrupted jobs and start the worker threads (idempotent)."""
+        if self._threads:
+            return
+        self._stop.clear()
+        self.heartbeat()
+        self.recover()
+        self.purge()
+        self._next_recover = time.time() + JOBS_STALE / 2
+        self._next_purge = time.time() + PURGE_SECONDS
+        threads = [threading.Thread(target=self._heartbeat_loop, name="data-cleaner-job-heartbeat", daemon=True)]
+        threads += [threading.Thread(target=self._worker, name=f"data-cleaner-job-{i}", daemon=True)
+                    for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop taking new jobs. A job still running keeps its heartbeat and finishes;
+        if the process exits first, another process requeues it once it goes stale."""
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def purge(self, older_than: Optional[float] = None) -> int:
+        """Delete finished jobs (and their files) older than ``older_than`` seconds (default: retention)."""
+        cutoff = time.time() - (self.retention if older_than is None else older_than)
+        with self._connect() as conn:
+            ids = [r["id"] for r in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,))]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in ids])
+        for job_id in ids:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return len(ids)
@@ -0,0 +1,97 @@
+"""
+Aggregated missingness summary for large datasets.
+
+Rows are split into a fixed number of contiguous buckets and, for every column
+that has nulls, the per-bucket null fraction is computed with vectorized
+reductions over blocks of whole buckets. Null co-occurrence (rows where two
+columns are both missing) is accumulated in the same pass as a small matrix
+product per block. Compute is O(rows x cols); memory and rendering are
+O(buckets x cols), so the heatmap stays cheap on million-row frames.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from utils.profile import cached_profile, frame_cached
+
+# Rows per block: bounds the transient boolean mask to ~block x null-columns bytes
+BLOCK_ROWS = 65_536
+
+
+@dataclass(frozen=True)
+class MissingnessSummary:
+    columns: List[str]
+    bucket_starts: np.ndarray  # first row position of each bucket
+    fractions: np.ndarray  # buckets x columns null fraction
+    null_counts: np.ndarray  # per column
+    co_occurrence: np.ndarray  # columns x columns rows where both are null
+    n_rows: int
+
+    @property
+    def total_missing(self) -> int:
+        return int(self.null_counts.sum())
+
+    def to_frame(self) -> pd.DataFrame:
+        """Bucket x column null fractions, labelled by row range, for plotting."""
+        ends = np.append(self.bucket_starts[1:], self.n_rows) - 1
+        labels = [f"{a:,}-{b:,}" for a, b in zip(self.bucket_starts, ends)]
+        return pd.DataFrame(self.fractions, index=labels, columns=self.columns)
+
+    def nullity_correlation(self) -> pd.DataFrame:
+        """Phi coefficient between null indicators of columns that have (but are not all) nulls."""
+        n = self.n_rows
+        counts = self.null_counts.astype(np.float64)
+        keep = (counts > 0) & (counts < n)
+        c = counts[keep]
+        both = self.co_occurrence[np.ix_(keep, keep)].astype(np.float64)
+        denom = np.sqrt(np.outer(c * (n - c), c * (n - c)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = (n * both - np.outer(c, c)) / denom
+        cols = [col for col, k in zip(self.columns, keep) if k]
+        return pd.DataFrame(corr, index=cols, columns=cols)
+
+
+def summarize_missingness(df: pd.DataFrame, buckets: int = 100) -> MissingnessSummary:
+    n_rows, n_cols = df.shape
+    columns = [str(c) for c in df.columns]
+    buckets = max(1, min(buckets, n_rows))
+    starts = np.linspace(0, n_rows, buckets + 1).astype(np.int64)[:-1] if n_rows else np.zeros(1, dtype=np.int64)
+    fractions = np.zeros((len(starts), n_cols), dtype=np.float64)
+    co = np.zeros((n_cols, n_cols), dtype=np.int64)
+
+    profile = cached_profile(df)
+    if profile is not None:
+        null_counts = np.array([profile.missing.get(c, 0) for c in columns], dtype=np.int64)
+    else:
+        null_counts = np.array([int(df.iloc[:, i].isna().sum()) for i in range(n_cols)], dtype=np.int64)
+    null_cols = np.flatnonzero(null_counts > 0)
+    if n_rows == 0 or null_cols.size == 0:
+        return MissingnessSummary(columns, starts, fractions, null_counts, co, n_rows)
+
+    sub = df.iloc[:, null_cols]
+    ends = np.append(starts[1:], n_rows)
+    sizes = (ends - starts).astype(np.float64)
+    b = 0
+    while b < len(starts):
+        # Take whole buckets until the block reaches BLOCK_ROWS
+        e = b + 1
+        while e < len(starts) and ends[e] - starts[b] <= BLOCK_ROWS:
+            e += 1
+        lo, hi = int(starts[b]), int(ends[e - 1])
+        mask = sub.iloc[lo:hi].isna().to_numpy(dtype=np.uint8)
+        per_bucket = np.add.reduceat(mask, starts[b:e] - lo, axis=0, dtype=np.int64)
+        fractions[b:e, null_cols] = per_bucket / sizes[b:e, None]
+        m = mask.astype(np.float32)
+        co[np.ix_(null_cols, null_cols)] += np.rint(m.T @ m).astype(np.int64)
+        b = e
+    return MissingnessSummary(columns, starts, fractions, null_counts, co, n_rows)
+
+
+def get_missingness(df: pd.DataFrame, buckets: int = 100) -> MissingnessSummary:
+    """Cached ``summarize_missingness`` for this DataFrame object."""
+    return frame_cached(df, ("missingness", buckets), lambda: summarize_missingness(df, buckets))
@@ -0,0 +1,470 @@
+"""
+Near-duplicate detection with MinHash LSH.
+
+``find_near_duplicates`` clusters rows whose text columns are nearly the same
+("John Smith" / "john  smith" / "Jon Smith") without comparing every pair:
+
+1. Normalise: the selected text columns are lower-cased, stripped of
+   punctuation and whitespace runs (on distinct values, ``utils.text_ops``);
+   rows whose normalised columns are all identical collapse to one record.
+2. Shingle: every distinct value of each column becomes its set of padded
+   character 3-grams, built for all values at once from one byte buffer.
+3. MinHash: NUM_PERM hash functions; each value's minimum per function
+   comes from one ``np.minimum.reduceat`` over the shingle array.
+4. LSH: signatures are cut into BANDS bands; records sharing a band bucket
+   in any filled column (and a blocking key, when ``block_on`` is given)
+   become candidates, so a blank e-mail cannot hide a matching name. Each
+   bucket contributes a chain of neighbour pairs, so work stays linear in
+   the bucket size and pathological buckets cannot go quadratic.
+5. Verify: the score of a pair is its lowest per-column 3-gram Jaccard
+   similarity over the columns filled in both rows, so text many rows share
+   (an e-mail domain) cannot carry a match on its own. Candidates whose
+   signature agreement is far below the threshold are dropped first; pairs
+   scoring at or above ``threshold`` are merged into clusters (vectorized
+   union-find).
+
+A one-letter typo in a short name costs about half its 3-grams ("john
+smith" / "jon smith" is 0.58), hence the 0.55 default.
+
+The result assigns a ``cluster_id`` to every row that has at least one near
+duplicate (NA otherwise) and lists the pairs behind each cluster (rows that
+normalise to identical text with similarity 1.0, then the verified pairs),
+so clusters can be reviewed before ``drop_near_duplicates`` keeps one row
+per cluster.
+
+Columns are only picked automatically when they look like free text that
+identifies a record: repetitive columns (status, country), near-unique ones
+(every value distinct) and identifier-shaped ones (e-mail addresses, codes
+such as ``ORD-000123``) are left out, because 3-grams of ``user17@...`` or
+``ORD-000017`` make unrelated rows look alike. The suggestion is dropped when
+its clusters would swallow most rows, and it is never applied unattended:
+cleaning plans skip it unless it carries ``"confirmed": True``, which the app
+sets only after the user has reviewed the clusters.
+
+Configuration (environment):
+- DATA_CLEANER_NEAR_DUP_THRESHOLD: Jaccard similarity on 3-grams (default 0.55)
+- DATA_CLEANER_NEAR_DUP_SAMPLE: rows sampled when deciding whether to raise
+  the "near_duplicates" suggestion (default 20000)
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.profile import frame_cached
+from utils.text_ops import map_unique
+
+THRESHOLD = float(os.getenv("DATA_CLEANER_NEAR_DUP_THRESHOLD", "0.55"))
+SUGGESTION_SAMPLE = int(os.getenv("DATA_CLEANER_NEAR_DUP_SAMPLE", "20000"))
+# 20 bands of 3 rows: pairs at 0.55 similarity share a bucket ~98% of the time, at 0.3 ~42%
+BANDS = 20
+ROWS_PER_BAND = 3
+NUM_PERM = BANDS * ROWS_PER_BAND
+# Columns repeating more than this share of values (status, country, ...) add
+# the same shingles to unrelated rows and are not used by default
+MIN_DISTINCT_RATIO = 0.1
+# Columns with nearly one value per row (keys, e-mails) say nothing about duplicates
+MAX_DISTINCT_RATIO = 0.98
+# Share of sampled values that must look like identifiers (no spaces, with a digit or "@")
+IDENTIFIER_SHARE = 0.8
+IDENTIFIER_SAMPLE = 1000
+# A suggestion whose clusters would remove more than this share of rows is not raised
+MAX_REMOVABLE_RATIO = 0.5
+# Candidates whose signature agreement is this far below the threshold skip exact scoring
+ESTIMATE_SLACK = 0.2
+PAIR_BATCH = 250_000
+
+_SEP = 1  # record separator byte in the shingle buffer; normalisation removes control characters
+_PUNCT_RE = r"[^\w\s]|[\x00-\x1f]"
+
+
+@dataclass(frozen=True)
+class NearDuplicateResult:
+    cluster_ids: pd.Series  # Int64 per row; NA for rows without a near duplicate
+    pairs: pd.DataFrame  # left, right, similarity: identical-normalised rows, then verified pairs
+    columns: List[Any]
+    threshold: float
+    n_candidates: int
+
+    @property
+    def n_clusters(self) -> int:
+        return int(self.cluster_ids.nunique(dropna=True))
+
+    @property
+    def rows_in_clusters(self) -> int:
+        return int(self.cluster_ids.notna().sum())
+
+    @property
+    def removable_rows(self) -> int:
+        """Rows ``drop_near_duplicates`` would remove (all but one per cluster)."""
+        return self.rows_in_clusters - self.n_clusters
+
+    def review_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rows that belong to a cluster, grouped by ``cluster_id`` for review."""
+        in_cluster = self.cluster_ids.notna().to_numpy()
+        out = df[in_cluster].copy()
+        out.insert(0, "cluster_id", self.cluster_ids[in_cluster].to_numpy())
+        return out.sort_values("cluster_id", kind="stable")
+
+    def summary(self) -> str:
+        return (f"{self.rows_in_clusters:,} rows in {self.n_clusters:,} near-duplicate clusters "
+                f"(columns {', '.join(map(str, self.columns))}; similarity >= {self.threshold:g})")
+
+
+def _identifier_like(values: pd.Series) -> bool:
+    """Whether most values are single tokens with a digit or an "@" (ids, codes, e-mails)."""
+    sample = values.dropna().drop_duplicates().head(IDENTIFIER_SAMPLE).astype(str).str.strip()
+    if sample.empty:
+        return False
+    shaped = ~sample.str.contains(r"\s", regex=True) & sample.str.contains(r"[\d@]", regex=True)
+    return bool(shaped.mean() >= IDENTIFIER_SHARE)
+
+
+def default_columns(df: pd.DataFrame, cardinality: Optional[Mapping[str, int]] = None) -> List[Any]:
+    """Free-text columns distinctive enough to identify a record (names, addresses).
+
+    Repetitive, near-unique and identifier-shaped columns are skipped.
+    """
+    n = max(len(df), 1)
+    columns = []
+    for col, dtype in df.dtypes.items():
+        if not (pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)):
+            continue
+        distinct = cardinality.get(str(col)) if cardinality is not None else None
+        if distinct is None:
+            distinct = df[col].nunique(dropna=True)
+        present = max(int(df[col].notna().sum()), 1)
+        if distinct <= MIN_DISTINCT_RATIO * n or distinct >= MAX_DISTINCT_RATIO * present:
+            continue
+        if not _identifier_like(df[col]):
+            columns.append(col)
+    return columns
+
+
+def _normalize(values: pd.Series) -> pd.Series:
+    def clean(u: pd.Series) -> pd.Series:
+        text = u.astype(str).str.lower().str.replace(_PUNCT_RE, " ", regex=True)
+        return text.str.replace(r"\s+", " ", regex=True).str.strip()
+    return map_unique(values, clean).fillna("")
+
+
+def _records(parts: Sequence[pd.Series]) -> pd.Series:
+    """One key per row for telling identical normalised rows apart."""
+    record = None
+    for part in parts:
+        part = part.astype(object)
+        record = part if record is None else record + chr(_SEP) + part
+    return record
+
+
+def _shingles(records: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted distinct 3-gram codes of every record as CSR (indptr, grams)."""
+    buffer = np.frombuffer(("\x01".join(f" {r} " for r in records) + "\x01").encode("utf-8"), dtype=np.uint8)
+    sep = buffer == _SEP
+    grams = (buffer[:-2].astype(np.uint64) << np.uint64(16)) | (buffer[1:-1].astype(np.uint64) << np.uint64(8)) | buffer[2:]
+    owner = np.cumsum(sep)[:-2].astype(np.uint64)
+    valid = ~(sep[:-2] | sep[1:-1] | sep[2:])
+    keys = np.sort((owner[valid] << np.uint64(32)) | grams[valid])
+    if keys.size:
+        # np.unique is much slower than sort + adjacent compare on large arrays
+        distinct = np.empty(keys.size, dtype=bool)
+        distinct[0] = True
+        np.not_equal(keys[1:], keys[:-1], out=distinct[1:])
+        keys = keys[distinct]
+    owners = (keys >> np.uint64(32)).astype(np.intp)
+    indptr = np.searchsorted(owners, np.arange(len(records) + 1))
+    return indptr, keys & np.uint64(0xFFFFFFFF)
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finaliser
+    x = x ^ (x >> np.uint64(30))
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def _signatures(indptr: np.ndarray, grams: np.ndarray, num_perm: int) -> np.ndarray:
+    """(records, num_perm) MinHash signature, the top 32 bits of each minimum."""
+    n = len(indptr) - 1
+    sig = np.full((n, num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    nonempty = np.diff(indptr) > 0
+    starts = indptr[:-1][nonempty]
+    # Each permutation is an odd multiply of the mixed gram plus one xorshift: a bijection of uint64
+    multipliers = _mix(np.arange(1, num_perm + 1, dtype=np.uint64)) | np.uint64(1)
+    hashed = _mix(grams)
+    with np.errstate(over="ignore"):
+        for p in range(num_perm):
+            x = hashed * multipliers[p]
+            x ^= x >> np.uint64(29)
+            sig[nonempty, p] = np.minimum.reduceat(x, starts) >> np.uint64(32)
+    return sig
+
+
+def _band_keys(sig: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """(bands, values) bucket key of each band of each signature."""
+    keys = np.zeros((bands, sig.shape[0]), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for b in range(bands):
+            for r in range(rows):
+                keys[b] = _mix(keys[b] ^ sig[:, b * rows + r].astype(np.uint64))
+    return keys
+
+
+def _unique_pairs(pairs: np.ndarray, n: int) -> np.ndarray:
+    """Distinct (low, high) rows of an (m, 2) pair array over ``n`` nodes."""
+    if pairs.size == 0:
+        return np.empty((0, 2), dtype=np.intp)
+    pairs = np.sort(pairs, axis=1)
+    codes = pairs[:, 0].astype(np.int64) * n + pairs[:, 1]
+    codes.sort()
+    keep = np.empty(codes.size, dtype=bool)
+    keep[0] = True
+    np.not_equal(codes[1:], codes[:-1], out=keep[1:])
+    codes = codes[keep]
+    return np.stack([codes // n, codes % n], axis=1).astype(np.intp)
+
+
+def _candidate_pairs(keys: np.ndarray, codes: np.ndarray, members: np.ndarray,
+                     blocks: Optional[np.ndarray]) -> np.ndarray:
+    """Pairs of ``members`` (records) whose values (``codes``) share a band bucket (``keys``)."""
+    pairs = []
+    member_codes = codes[members]
+    with np.errstate(over="ignore"):
+        for band in keys:
+            key = band[member_codes]
+            if blocks is not None:
+                key = _mix(key ^ blocks[members])
+            order = np.argsort(key, kind="stable")
+            same = key[order[1:]] == key[order[:-1]]
+            # Chain each bucket: consecutive members in record order
+            pairs.append(np.stack([members[order[:-1][same]], members[order[1:][same]]], axis=1))
+    return np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.intp)
+
+
+def _jaccard(pairs: np.ndarray, indptr: np.ndarray, grams: np.ndarray) -> np.ndarray:
+    """Exact Jaccard similarity of the 3-gram sets of each pair."""
+    sizes = np.diff(indptr)
+    out = np.empty(len(pairs), dtype=np.float64)
+    for start in range(0, len(pairs), PAIR_BATCH):
+        batch = pairs[start:start + PAIR_BATCH]
+        ids = np.arange(len(batch), dtype=np.uint64)
+        keys = []
+        for side in (0, 1):
+            rec = batch[:, side]
+            lengths = sizes[rec]
+            offsets = np.repeat(indptr[rec] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            keys.append((np.repeat(ids, lengths) << np.uint64(32)) | grams[offsets])
+        merged = np.sort(np.concatenate(keys))
+        # Each set is duplicate-free, so an equal neighbour is a shared gram
+        shared = merged[1:][merged[1:] == merged[:-1]] >> np.uint64(32)
+        inter = np.bincount(shared.astype(np.intp), minlength=len(batch))
+        union = sizes[batch[:, 0]] + sizes[batch[:, 1]] - inter
+        out[start:start + len(batch)] = np.where(union > 0, inter / np.maximum(union, 1), 1.0)
+    return out
+
+
+@dataclass
+class _ColumnIndex:
+    """Shingles and MinHash signatures of one column's distinct normalised values."""
+    codes: np.ndarray  # value code of each distinct record
+    filled: np.ndarray  # per value: not blank
+    indptr: np.ndarray
+    grams: np.ndarray
+    sig: np.ndarray
+
+    @classmethod
+    def build(cls, part: pd.Series, first_row: np.ndarray) -> "_ColumnIndex":
+        codes, values = pd.factorize(part)
+        indptr, grams = _shingles(list(values))
+        filled = np.array([bool(v) for v in values], dtype=bool)
+        return cls(codes[first_row], filled, indptr, grams, _signatures(indptr, grams, NUM_PERM))
+
+    def compared(self, pairs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Value codes of each record pair and whether both sides are filled."""
+        pair_codes = self.codes[pairs]
+        return pair_codes, self.filled[pair_codes[:, 0]] & self.filled[pair_codes[:, 1]]
+
+
+def _lowest(pairs: np.ndarray, columns: Sequence[_ColumnIndex], score) -> np.ndarray:
+    """Smallest ``score(column, value_pairs)`` over the columns filled in both records of each pair.
+
+    Columns that are blank in either record are skipped (a missing e-mail does
+    not make two records different); pairs with no column filled on both sides
+    score 0.
+    """
+    lowest = np.full(len(pairs), np.inf)
+    for column in columns:
+        pair_codes, compared = column.compared(pairs)
+        different = compared & (pair_codes[:, 0] != pair_codes[:, 1])
+        values = np.ones(len(pairs), dtype=np.float64)
+        if different.any():
+            values[different] = score(column, pair_codes[different])
+        lowest = np.where(compared, np.minimum(lowest, values), lowest)
+    return np.where(np.isfinite(lowest), lowest, 0.0)
+
+
+def _estimate(column: _ColumnIndex, pairs: np.ndarray) -> np.ndarray:
+    """Share of MinHash positions two values agree on (an estimate of their Jaccard)."""
+    return np.concatenate([
+        (column.sig[pairs[s:s + PAIR_BATCH, 0]] == column.sig[pairs[s:s + PAIR_BATCH, 1]]).mean(axis=1)
+        for s in range(0, len(pairs), PAIR_BATCH)
+    ])
+
+
+def _exact(column: _ColumnIndex, pairs: np.ndarray) -> np.ndarray:
+    return _jaccard(pairs, column.indptr, column.grams)
+
+
+def _components(n: int, pairs: np.ndarray) -> np.ndarray:
+    """Connected-component label (smallest member) of each node."""
+    labels = np.arange(n)
+    if len(pairs) == 0:
+        return labels
+    left, right = pairs[:, 0], pairs[:, 1]
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        before = labels.copy()
+        np.minimum.at(labels, left, low)
+        np.minimum.at(labels, right, low)
+        # Pointer jumping until every node points at a root
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, before):
+            return labels
+
+
+def find_near_duplicates(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[Any]] = None,
+    threshold: Optional[float] = None,
+    block_on: Optional[Sequence[Any]] = None,
+) -> NearDuplicateResult:
+    """Cluster rows of ``df`` whose normalised ``columns`` are near-identical.
+
+    ``columns`` defaults to ``default_columns(df)``; ``block_on`` columns must
+    match exactly for two rows to be compared (e.g. a postcode).
+    """
+    threshold = THRESHOLD if threshold is None else float(threshold)
+    columns = list(columns) if columns is not None else default_columns(df)
+    columns = [c for c in columns if c in df.columns]
+    empty_ids = pd.Series(pd.array([pd.NA] * len(df), dtype="Int64"), index=df.index, name="cluster_id")
+    no_pairs = pd.DataFrame({"left": pd.Series(dtype=df.index.dtype), "right": pd.Series(dtype=df.index.dtype),
+                             "similarity": pd.Series(dtype="float64")})
+    if not columns or len(df) < 2:
+        return NearDuplicateResult(empty_ids, no_pairs, columns, threshold, 0)
+
+    parts = [_normalize(df[col]) for col in columns]
+    records = _records(parts)
+    if block_on:
+        block_codes = pd.MultiIndex.from_frame(df[list(block_on)].astype(str)).factorize()[0]
+        keyed = pd.Series(list(zip(block_codes, records)), index=df.index)
+        row_codes, distinct = pd.factorize(keyed)
+        blocks = np.array([b for b, _ in distinct], dtype=np.uint64)
+    else:
+        row_codes, distinct = pd.factorize(records)
+        blocks = None
+    n = len(distinct)
+    # First row holding each distinct record
+    first_row = np.full(n, -1, dtype=np.intp)
+    first_row[row_codes[::-1]] = np.arange(len(df))[::-1]
+
+    # Distinct records: identical normalised rows are already one node. Candidates
+    # come from each column on its own, so a blank column does not hide a match
+    index = [_ColumnIndex.build(part, first_row) for part in parts]
+    blank = ~np.logical_or.reduce([column.filled[column.codes] for column in index])
+    found = []
+    for column in index:
+        members = np.flatnonzero(column.filled[column.codes])
+        keys = _band_keys(column.sig, BANDS, ROWS_PER_BAND)
+        found.append(_candidate_pairs(keys, column.codes, members, blocks))
+    candidates = _unique_pairs(np.concatenate(found), n)
+    n_candidates = len(candidates)
+    verified = np.empty((0, 2), dtype=np.intp)
+    similarity = np.empty(0)
+    if n_candidates:
+        candidates = candidates[_lowest(candidates, index, _estimate) >= threshold - ESTIMATE_SLACK]
+        # Every filled column has to match on its own, so text many rows share (an
+        # e-mail domain) or one near-identical column cannot carry a match
+        scores = _lowest(candidates, index, _exact)
+        good = scores >= threshold
+        verified, similarity = candidates[good], scores[good]
+
+    labels = _components(n, verified)
+    row_labels = labels[row_codes]
+    row_labels = np.where(blank[row_codes], -1 - np.arange(len(df)), row_labels)  # blanks never cluster
+    sizes = pd.Series(row_labels).map(pd.Series(row_labels).value_counts()).to_numpy()
+    clustered = sizes > 1
+    cluster_ids = empty_ids.copy()
+    if clustered.any():
+        # Number clusters by first appearance
+        ids, _ = pd.factorize(row_labels[clustered])
+        cluster_ids[clustered] = ids
+
+    # Pairs for review: rows whose normalised text is identical (similarity 1.0)
+    # against the first row holding it, then verified pairs between distinct
+    # records, reported by their first rows
+    positions = np.arange(len(df))
+    repeat = (positions != first_row[row_codes]) & ~blank[row_codes]
+    left = np.concatenate([first_row[row_codes[repeat]], first_row[verified[:, 0]]])
+    right = np.concatenate([positions[repeat], first_row[verified[:, 1]]])
+    pairs = pd.DataFrame({
+        "left": df.index[left],
+        "right": df.index[right],
+        "similarity": np.concatenate([np.ones(int(repeat.sum())), similarity]),
+    }) if len(left) else no_pairs
+    return NearDuplicateResult(cluster_ids, pairs, columns, threshold, n_candidates)
+
+
+def get_near_duplicates(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[Any]] = None,
+    threshold: Optional[float] = None,
+    block_on: Optional[Sequence[Any]] = None,
+) -> NearDuplicateResult:
+    """``find_near_duplicates`` cached per DataFrame object (i.e. per dataset version)."""
+    key = ("near_duplicates", tuple(columns) if columns is not None else None,
+           THRESHOLD if threshold is None else float(threshold), tuple(block_on) if block_on else None)
+    return frame_cached(df, key, lambda: find_near_duplicates(df, columns, threshold, block_on))
+
+
+def drop_near_duplicates(df: pd.DataFrame, result: NearDuplicateResult, keep: str = "first") -> pd.DataFrame:
+    """Keep one row per cluster (``keep`` = "first" or "last"); unclustered rows stay."""
+    ids = result.cluster_ids
+    duplicate = ids.notna() & ids.duplicated(keep=keep)
+    return df[~duplicate.to_numpy()]
+
+
+def near_duplicate_suggestion(df: pd.DataFrame, cardinality: Optional[Mapping[str, int]] = None) -> Optional[Dict[str, Any]]:
+    """A "near_duplicates" suggestion when a row sample already contains clusters.
+
+    It is marked ``requires_confirmation``; plans skip it until the caller
+    sets ``"confirmed": True`` after reviewing the clusters.
+    """
+    columns = default_columns(df, cardinality)
+    if not columns or len(df) < 2:
+        return None
+    sample = df if len(df) <= SUGGESTION_SAMPLE else df.sample(SUGGESTION_SAMPLE, random_state=0)
+    result = find_near_duplicates(sample, columns)
+    if result.n_clusters == 0 or result.removable_rows > MAX_REMOVABLE_RATIO * len(sample):
+        return None
+    scope = "" if sample is df else f" in a sample of {len(sample):,} rows"
+    return {
+        "type": "near_duplicates",
+        "columns": [str(c) for c in columns],
+        "threshold": result.threshold,
+        "issue": f"{result.removable_rows:,} rows look like near-duplicates of other rows{scope}",
+        "action": "Review the clusters, then keep one row per cluster",
+        "details": result.summary(),
+        "requires_confirmation": True,
+    }
@@ -0,0 +1,299 @@
+"""
+Vectorized outlier engine.
+
+Every method reduces to per-column ``[lower, upper]`` bounds, computed for all
+requested numeric columns together from one float matrix (in column groups,
+like the histogram engine): moments are single batched NumPy reductions and
+quantiles one ``np.partition`` per column:
+
+- "iqr": ``[q1 - k*IQR, q3 + k*IQR]`` from one ``nanquantile`` call (k=1.5)
+- "zscore": ``mean +/- k*std`` (k=3.0)
+- "mad": ``median +/- k*MAD/0.6745``, the modified z-score (k=3.5); columns
+  whose MAD is 0 fall back to the mean absolute deviation
+
+Flagging is one broadcast comparison of the matrix against the bound vectors;
+``remove_outliers`` ORs the column masks and filters the frame once. Missing
+values are never outliers; +/-inf always are.
+
+``ApproxOutlierStats`` gives the same bounds for chunked or streamed input
+from mergeable summaries (a ``QuantileSketch`` for iqr/mad, running moments
+for zscore), so the streaming cleaner needs no second copy of the data.
+
+Configuration (environment):
+- DATA_CLEANER_OUTLIER_METHOD: method used by cleaning plans and the profile
+  (default "iqr")
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import warnings
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.histogram import GROUP_CELLS, QuantileSketch, numeric_matrix
+from utils.profile import frame_cached
+
+OUTLIER_METHODS = ("iqr", "zscore", "mad")
+DEFAULT_THRESHOLDS = {"iqr": 1.5, "zscore": 3.0, "mad": 3.5}
+OUTLIER_METHOD = os.getenv("DATA_CLEANER_OUTLIER_METHOD", "iqr")
+# Consistency constant: MAD / 0.6745 estimates the standard deviation of normal data
+_MAD_SCALE = 0.6745
+# Mean absolute deviation / 0.7979 does the same, used when MAD is 0
+_MEANAD_SCALE = 0.7979
+
+Bounds = Dict[str, Tuple[float, float]]
+
+
+@dataclass(frozen=True)
+class OutlierReport:
+    method: str
+    threshold: float
+    bounds: Bounds
+    counts: Dict[str, int]  # rows outside the bounds, per column
+    mask: np.ndarray  # rows outside the bounds in any column
+
+    @property
+    def rows_flagged(self) -> int:
+        return int(self.mask.sum())
+
+    def message(self) -> str:
+        per_column = ", ".join(f"'{c}': {n}" for c, n in self.counts.items() if n)
+        return (f"Removed {self.rows_flagged} outlier rows ({self.method}, threshold {self.threshold:g})"
+                + (f" - {per_column}" if per_column else ""))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "threshold": self.threshold,
+            "rows_flagged": self.rows_flagged,
+            "counts": dict(self.counts),
+            "bounds": {c: [lo, hi] for c, (lo, hi) in self.bounds.items()},
+        }
+
+
+def _resolve(method: Optional[str], threshold: Optional[float]) -> Tuple[str, float]:
+    method = method or OUTLIER_METHOD
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unknown outlier method '{method}'; choose from {OUTLIER_METHODS}")
+    return method, float(DEFAULT_THRESHOLDS[method] if threshold is None else threshold)
+
+
+def iqr_bounds(q1: Any, q3: Any, k: float = 1.5) -> Tuple[Any, Any]:
+    iqr = q3 - q1
+    return q1 - k * iqr, q3 + k * iqr
+
+
+def _column_quantiles(values: np.ndarray, qs: Sequence[float]) -> np.ndarray:
+    """Linear-interpolated quantiles of each column ignoring NaN, shape (len(qs), k).
+
+    One ``np.partition`` per column for all requested quantiles: measurably
+    faster than ``np.nanquantile(axis=0)``, which sorts far more than needed.
+    """
+    out = np.full((len(qs), values.shape[1]), np.nan)
+    for j in range(values.shape[1]):
+        col = values[:, j]
+        col = col[~np.isnan(col)]
+        if col.size == 0:
+            continue
+        pos = np.asarray(qs, dtype=np.float64) * (col.size - 1)
+        below = np.floor(pos).astype(np.intp)
+        above = np.minimum(below + 1, col.size - 1)
+        part = np.partition(col, np.unique(np.concatenate([below, above])))
+        out[:, j] = part[below] + (part[above] - part[below]) * (pos - below)
+    return out
+
+
+def _matrix_bounds(values: np.ndarray, method: str, k: float) -> Tuple[np.ndarray, np.ndarray]:
+    finite = np.isfinite(values)
+    # +/-inf must not move the statistics
+    ranked = values if finite.all() else np.where(finite, values, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+        if method == "iqr":
+            q1, q3 = _column_quantiles(ranked, [0.25, 0.75])
+            lo, hi = iqr_bounds(q1, q3, k)
+        elif method == "zscore":
+            mean = np.nanmean(ranked, axis=0)
+            std = np.nanstd(ranked, axis=0, ddof=1)
+            lo, hi = mean - k * std, mean + k * std
+        else:
+            median = _column_quantiles(ranked, [0.5])[0]
+            deviation = np.abs(ranked - median)
+            scale = _column_quantiles(deviation, [0.5])[0] / _MAD_SCALE
+            fallback = np.nanmean(deviation, axis=0) / _MEANAD_SCALE
+            scale = np.where(scale > 0, scale, fallback)
+            lo, hi = median - k * scale, median + k * scale
+    # Too few values for a spread: nothing is an outlier
+    undefined = ~(np.isfinite(lo) & np.isfinite(hi)) | (finite.sum(axis=0) < 2)
+    return np.where(undefined, -np.inf, lo), np.where(undefined, np.inf, hi)
+
+
+def _outside(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    # NaN compares False on both sides, so missing values are never flagged
+    return (values < lo) | (values > hi)
+
+
+def _numeric_columns(df: pd.DataFrame, columns: Optional[Sequence[Any]]) -> list:
+    if columns is None:
+        return list(df.select_dtypes(include=[np.number]).columns)
+    return [c for c in columns if c in df.columns]
+
+
+def _groups(df: pd.DataFrame, columns: list):
+    per_group = max(1, GROUP_CELLS // max(df.shape[0], 1))
+    for start in range(0, len(columns), per_group):
+        group = columns[start:start + per_group]
+        yield group, numeric_matrix(df, group)
+
+
+def compute_bounds(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[Any]] = None,
+    method: Optional[str] = None,
+    threshold: Optional[float] = None,
+) -> Bounds:
+    """``{column: (lower, upper)}`` for ``columns`` (default: all numeric)."""
+    method, k = _resolve(method, threshold)
+    bounds: Bounds = {}
+    for group, values in _groups(df, _numeric_columns(df, columns)):
+        lo, hi = _matrix_bounds(values, method, k)
+        bounds.update((str(c), (float(l), float(h))) for c, l, h in zip(group, lo, hi))
+    return bounds
+
+
+def outlier_mask(df: pd.DataFrame, bounds: Mapping[str, Tuple[float, float]]) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Rows of ``df`` outside precomputed ``bounds`` in any column, and per-column counts.
+
+    Used for chunks of a larger input, where the bounds come from
+    ``ApproxOutlierStats`` or from statistics computed elsewhere.
+    """
+    columns = [c for c in df.columns if str(c) in bounds]
+    mask = np.zeros(len(df), dtype=bool)
+    counts: Dict[str, int] = {}
+    for group, values in _groups(df, columns):
+        lo = np.array([bounds[str(c)][0] for c in group])
+        hi = np.array([bounds[str(c)][1] for c in group])
+        outside = _outside(values, lo, hi)
+        counts.update(zip(map(str, group), outside.sum(axis=0).tolist()))
+        mask |= outside.any(axis=1)
+    return mask, counts
+
+
+def detect_outliers(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[Any]] = None,
+    method: Optional[str] = None,
+    threshold: Optional[float] = None,
+) -> OutlierReport:
+    """Bounds, per-column counts and the combined row mask in one pass per column group."""
+    method, k = _resolve(method, threshold)
+    bounds: Bounds = {}
+    counts: Dict[str, int] = {}
+    mask = np.zeros(len(df), dtype=bool)
+    for group, values in _groups(df, _numeric_columns(df, columns)):
+        lo, hi = _matrix_bounds(values, method, k)
+        outside = _outside(values, lo, hi)
+        bounds.update((str(c), (float(l), float(h))) for c, l, h in zip(group, lo, hi))
+        counts.update(zip(map(str, group), outside.sum(axis=0).tolist()))
+        mask |= outside.any(axis=1)
+    return OutlierReport(method, k, bounds, counts, mask)
+
+
+def get_outliers(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[Any]] = None,
+    method: Optional[str] = None,
+    threshold: Optional[float] = None,
+) -> OutlierReport:
+    """``detect_outliers`` cached per DataFrame object (i.e. per dataset version)."""
+    method, k = _resolve(method, threshold)
+    key = ("outliers", tuple(columns) if columns is not None else None, method, k)
+    return frame_cached(df, key, lambda: detect_outliers(df, columns, method, k))
+
+
+def remove_outliers(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[Any]] = None,
+    method: Optional[str] = None,
+    threshold: Optional[float] = None,
+) -> Tuple[pd.DataFrame, OutlierReport]:
+    """Drop every row that is an outlier in any of ``columns``, with a single filter."""
+    report = detect_outliers(df, columns, method, threshold)
+    if not report.mask.any():
+        return df, report
+    return df[~report.mask], report
+
+
+class ApproxOutlierStats:
+    """Mergeable per-column summary that yields approximate outlier bounds.
+
+    Quantiles (iqr, mad) come from a ``QuantileSketch`` with relative error
+    ``alpha``; the zscore bounds use exact running moments.
+    """
+
+    def __init__(self, alpha: float = 0.01):
+        self.sketch = QuantileSketch(alpha)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values: Any) -> "ApproxOutlierStats":
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[np.isfinite(arr)]
+        if arr.size == 0:
+            return self
+        self.sketch.update(arr)
+        other = ApproxOutlierStats.__new__(ApproxOutlierStats)
+        other.count, other.mean = int(arr.size), float(arr.mean())
+        other.m2 = float(((arr - other.mean) ** 2).sum())
+        self._merge_moments(other)
+        return self
+
+    def _merge_moments(self, other: "ApproxOutlierStats") -> None:
+        # Chan et al. pairwise combination of (count, mean, M2)
+        n = self.count + other.count
+        if n == 0:
+            return
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / n
+        self.mean += delta * other.count / n
+        self.count = n
+
+    def merge(self, other: "ApproxOutlierStats") -> "ApproxOutlierStats":
+        self.sketch.merge(other.sketch)
+        self._merge_moments(other)
+        return self
+
+    def _mad(self, median: float) -> float:
+        deviations = sorted((abs(value - median), count) for value, count in self.sketch.buckets())
+        half = self.sketch.count / 2
+        seen = 0
+        for deviation, count in deviations:
+            seen += count
+            if seen >= half:
+                return deviation
+        return 0.0
+
+    def bounds(self, method: Optional[str] = None, threshold: Optional[float] = None) -> Tuple[float, float]:
+        method, k = _resolve(method, threshold)
+        if self.count < 2:
+            return -math.inf, math.inf
+        if method == "iqr":
+            q1, q3 = self.sketch.quantiles([0.25, 0.75])
+            lo, hi = iqr_bounds(q1, q3, k)
+            return float(lo), float(hi)
+        if method == "zscore":
+            std = math.sqrt(self.m2 / (self.count - 1))
+            return self.mean - k * std, self.mean + k * std
+        median = self.sketch.quantile(0.5)
+        scale = self._mad(median) / _MAD_SCALE
+        if scale <= 0:
+            scale = sum(abs(v - median) * c for v, c in self.sketch.buckets()) / self.sketch.count / _MEANAD_SCALE
+        if scale <= 0:
+            return -math.inf, math.inf
+        return median - k * scale, median + k * scale
@@ -0,0 +1,229 @@
+"""
+Shared, versioned dataset profile.
+
+``build_profile`` computes every column statistic the UI and API need in one
+vectorized pass (a single ``isna`` matrix, one ``duplicated`` scan, one
+``nunique`` and one batched ``quantile``/``agg`` over the numeric block, whose
+quartiles also give the per-column IQR outlier counts). That is all a
+profile holds by default. With ``with_analyzer=True`` it additionally runs
+the ``DataAnalyzer`` (quality score, suggestions, summary, patterns, column
+info), which makes its own passes over the frame, and adds the "compact"
+(``utils.compaction``) and near-duplicate suggestions; callers that show
+those outputs ask for them explicitly. The resulting ``DatasetProfile`` is
+immutable; ``get_profile`` caches it per DataFrame object so Streamlit reruns,
+Dash callbacks and API handlers all read the same instance, and a full
+profile also answers stats-only calls. Frames produced by
+cell edits get their profile derived from the previous one instead
+(``utils.incremental_profile``).
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import weakref
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+_VERSION_COUNTER = itertools.count(1)
+
+
+@dataclass(frozen=True)
+class DatasetProfile:
+    version: int
+    n_rows: int
+    n_cols: int
+    dtypes: Mapping[str, str]
+    missing: Mapping[str, int]
+    missing_total: int
+    duplicates: int
+    cardinality: Mapping[str, int]
+    numeric_stats: Mapping[str, Mapping[str, float]]
+    memory_bytes: int
+    quality_score: float
+    suggestions: Mapping[str, Mapping[str, Any]]
+    summary: str
+    patterns: Mapping[str, Any]
+    outliers: Mapping[str, int] = field(default_factory=dict)  # rows outside the outlier bounds, per column
+    base_version: Optional[int] = None  # profile this one was updated from by cell edits (utils.incremental_profile)
+    column_info: Optional[pd.DataFrame] = field(default=None, repr=False, compare=False)
+
+    @property
+    def missing_pct(self) -> float:
+        cells = self.n_rows * self.n_cols
+        return (self.missing_total / cells * 100) if cells else 0.0
+
+    def suggestions_copy(self) -> Dict[str, Dict[str, Any]]:
+        """Mutable copy of the suggestions for callers that merge in plugin rules."""
+        return {k: dict(v) for k, v in self.suggestions.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready view used by the API /profile endpoint."""
+        return {
+            "version": self.version,
+            "shape": [self.n_rows, self.n_cols],
+            "dtypes": dict(self.dtypes),
+            "missing": dict(self.missing),
+            "missing_total": self.missing_total,
+            "duplicates": self.duplicates,
+            "cardinality": dict(self.cardinality),
+            "numeric_stats": {c: dict(v) for c, v in self.numeric_stats.items()},
+            "memory_bytes": self.memory_bytes,
+            "outliers": dict(self.outliers),
+            "quality_score": self.quality_score,
+            "base_version": self.base_version,
+        }
+
+
+def _numeric_stats(df: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    num = df.select_dtypes(include=[np.number])
+    if num.shape[1] == 0:
+        return {}
+    aggs = num.agg(["mean", "std", "min", "max"])
+    quants = num.quantile([0.25, 0.5, 0.75], numeric_only=True)
+    stats = pd.concat([aggs, quants.set_axis(["q1", "median", "q3"])])
+    return {
+        str(c): MappingProxyType({k: (None if pd.isna(v) else float(v)) for k, v in stats[c].items()})
+        for c in stats.columns
+    }
+
+
+def _outlier_counts(df: pd.DataFrame, numeric_stats: Dict[str, Mapping[str, Any]]) -> Dict[str, int]:
+    from utils.outliers import OUTLIER_METHOD, detect_outliers, iqr_bounds, outlier_mask
+    if OUTLIER_METHOD != "iqr":
+        return detect_outliers(df).counts
+    # IQR bounds reuse the quartiles already computed for numeric_stats
+    bounds = {}
+    for col, stats in numeric_stats.items():
+        if stats.get("q1") is not None and stats.get("q3") is not None:
+            bounds[col] = iqr_bounds(stats["q1"], stats["q3"])
+    return outlier_mask(df, bounds)[1] if bounds else {}
+
+
+def build_profile(df: pd.DataFrame, with_analyzer: bool = False) -> DatasetProfile:
+    """Profile ``df`` in one pass; ``with_analyzer=True`` adds the DataAnalyzer outputs and suggestions."""
+    missing = df.isna().sum()
+    cardinality = df.nunique(dropna=True)
+    duplicates = int(df.duplicated().sum()) if df.shape[1] else 0
+
+    quality_score = 100.0
+    suggestions: Dict[str, Dict[str, Any]] = {}
+    summary = ""
+    patterns: Dict[str, Any] = {}
+    column_info = None
+    if with_analyzer:
+        from utils.data_analyzer import DataAnalyzer
+        analyzer = DataAnalyzer(df)
+        quality_score = analyzer.get_data_quality_score()
+        suggestions = analyzer.generate_suggestions() or {}
+        summary = analyzer.generate_natural_language_summary()
+        patterns = analyzer.detect_patterns() or {}
+        column_info = analyzer.get_column_info()
+
+    numeric_stats = _numeric_stats(df)
+    outliers = _outlier_counts(df, numeric_stats)
+    if with_analyzer:
+        for suggestion in suggestions.values():
+            if suggestion.get("type") == "outliers" and str(suggestion.get("column")) in outliers:
+                suggestion.setdefault("count", outliers[str(suggestion["column"])])
+        from utils.compaction import compaction_suggestion
+        compact = compaction_suggestion(df, cardinality.rename(index=str), numeric_stats)
+        if compact is not None:
+            suggestions["Compact Column Types"] = compact
+        from utils.near_dedup import near_duplicate_suggestion
+        near = near_duplicate_suggestion(df, cardinality.rename(index=str))
+        if near is not None:
+            suggestions["Near-Duplicate Rows"] = near
+
+    return DatasetProfile(
+        version=next(_VERSION_COUNTER),
+        n_rows=int(df.shape[0]),
+        n_cols=int(df.shape[1]),
+        dtypes=MappingProxyType({str(c): str(t) for c, t in df.dtypes.items()}),
+        missing=MappingProxyType({str(c): int(v) for c, v in missing.items()}),
+        missing_total=int(missing.sum()),
+        duplicates=duplicates,
+        cardinality=MappingProxyType({str(c): int(v) for c, v in cardinality.items()}),
+        numeric_stats=MappingProxyType(numeric_stats),
+        memory_bytes=int(df.memory_usage(index=True, deep=True).sum()),
+        quality_score=quality_score,
+        suggestions=MappingProxyType({k: MappingProxyType(dict(v)) for k, v in suggestions.items()}),
+        summary=summary,
+        patterns=MappingProxyType(dict(patterns)),
+        outliers=MappingProxyType(outliers),
+        column_info=column_info,
+    )
+
+
+# Derived results cached by DataFrame identity; entries drop when the frame is collected
+_FRAME_CACHE: Dict[Tuple[int, Hashable], Tuple[Any, Any]] = {}
+_FRAME_CACHE_LOCK = threading.Lock()
+
+
+def _forget_frame(frame_id: int) -> None:
+    with _FRAME_CACHE_LOCK:
+        for key in [k for k in _FRAME_CACHE if k[0] == frame_id]:
+            del _FRAME_CACHE[key]
+
+
+def frame_cached(df: pd.DataFrame, key: Hashable, builder: Callable[[], Any]) -> Any:
+    """Memoize ``builder()`` for this DataFrame object under ``key``.
+
+    Shared by the profile, missingness and histogram engines so each derived
+    result is computed once per dataset version (frames are swapped, not
+    mutated, whenever the data changes).
+    """
+    cache_key = (id(df), key)
+    with _FRAME_CACHE_LOCK:
+        entry = _FRAME_CACHE.get(cache_key)
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        first_for_frame = not any(k[0] == id(df) for k in _FRAME_CACHE)
+    value = builder()
+    with _FRAME_CACHE_LOCK:
+        _FRAME_CACHE[cache_key] = (weakref.ref(df), value)
+    if first_for_frame:
+        weakref.finalize(df, _forget_frame, id(df))
+    return value
+
+
+def frame_cache_peek(df: pd.DataFrame, key: Hashable) -> Any:
+    """Value cached for this DataFrame object under ``key``, or None (never computes)."""
+    with _FRAME_CACHE_LOCK:
+        entry = _FRAME_CACHE.get((id(df), key))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+    return None
+
+
+def frame_cache_pop(df: pd.DataFrame, key: Hashable) -> Any:
+    """Remove and return the value cached for this DataFrame object under ``key``, or None."""
+    with _FRAME_CACHE_LOCK:
+        entry = _FRAME_CACHE.pop((id(df), key), None)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    return None
+
+
+def cached_profile(df: pd.DataFrame) -> Optional[DatasetProfile]:
+    """Already-built profile for this DataFrame object, if any (never computes)."""
+    for key in ("profile", "profile_stats"):
+        profile = frame_cache_peek(df, key)
+        if profile is not None:
+            return profile
+    return None
+
+
+def get_profile(df: pd.DataFrame, with_analyzer: bool = False) -> DatasetProfile:
+    """Return the cached profile for this DataFrame object, building it on first use."""
+    if not with_analyzer:
+        # Any existing profile already answers every stats-only question
+        profile = cached_profile(df)
+        if profile is not None:
+            return profile
+        return frame_cached(df, "profile_stats", lambda: build_profile(df, with_analyzer=False))
+    return frame_cached(df, "profile", lambda: build_profile(df, with_analyzer=True))
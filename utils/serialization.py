@@ -0,0 +1,160 @@
+"""
+Response serialization for the API: fast JSON and Arrow IPC.
+
+JSON: ``dumps`` writes NumPy arrays and scalars directly (orjson with
+``OPT_SERIALIZE_NUMPY`` when installed), so handlers pass arrays instead of
+``tolist()``-ing them into boxed Python floats. Non-finite floats (NaN,
++/-inf) become ``null`` everywhere, for arrays and plain floats alike,
+because JSON has no spelling for them. Without orjson the stdlib encoder
+is used after the same conversion. ``FastJSONResponse`` renders with it.
+
+Arrow: matrix and tabular payloads (correlation matrices, histograms, the
+per-column profile table) are also available as an Arrow IPC stream when
+the client sends ``Accept: application/vnd.apache.arrow.stream``
+(``wants_arrow``; JSON is served when pyarrow is not installed). Values keep
+their binary form there (NaN stays NaN), and scalar context goes into the
+schema metadata as JSON.
+
+``bench_serialization.py`` at the repository root compares time and
+payload size of the default encoder, ``dumps`` and Arrow.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Dict, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse, Response
+
+from utils.ingest import STREAM_FORMATS
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except Exception:
+    pa = ipc = None  # type: ignore
+
+try:
+    import orjson
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+except Exception:
+    orjson = None  # type: ignore
+
+ARROW_STREAM = STREAM_FORMATS["arrow"][1]
+
+
+def _plain(value: Any) -> Any:
+    """Fallback conversion for the stdlib encoder: arrays to lists, non-finite to None."""
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "f":
+            out = value.astype(object)
+            out[~np.isfinite(value)] = None
+            return out.tolist()
+        return value.tolist()
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, np.generic):
+        return _plain(value.item())
+    if isinstance(value, Mapping):
+        return {k if isinstance(k, str) else str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _default(value: Any) -> Any:
+    # Types orjson does not write natively
+    if isinstance(value, np.ndarray):
+        return np.ascontiguousarray(value) if value.dtype.kind in "biuf" else value.tolist()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    if value is pd.NA or value is pd.NaT:
+        return None
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON bytes with NumPy support; NaN and +/-inf become null."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(_plain(obj), default=lambda v: _plain(_default(v)), separators=(",", ":"),
+                      allow_nan=False).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def wants_arrow(accept: Optional[str]) -> bool:
+    """Whether the client asked for an Arrow IPC stream (and pyarrow is installed)."""
+    return pa is not None and bool(accept) and ARROW_STREAM in accept
+
+
+def arrow_response(table: Union["pa.Table", pd.DataFrame], metadata: Optional[Dict[str, Any]] = None) -> Response:
+    """``table`` as one Arrow IPC stream response; ``metadata`` values are stored as JSON."""
+    if isinstance(table, pd.DataFrame):
+        table = pa.Table.from_pandas(table, preserve_index=False)
+    if metadata:
+        meta = {k.encode(): dumps(v) for k, v in metadata.items()}
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **meta})
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue().to_pybytes(), media_type=ARROW_STREAM)
+
+
+def matrix_table(columns: Sequence[Any], matrix: np.ndarray, index_name: str = "column") -> "pa.Table":
+    """Square matrix as a table: one row label column, then one float column per input column.
+
+    Built from the arrays directly; ``Table.from_pandas`` spends most of its
+    time on per-column metadata for wide frames.
+    """
+    names = [str(c) for c in columns]
+    values = np.asfortranarray(np.asarray(matrix, dtype=np.float64).reshape(len(names), len(names)))
+    arrays = [pa.array(names, type=pa.string())] + [pa.array(values[:, j]) for j in range(len(names))]
+    return pa.Table.from_arrays(arrays, names=[index_name] + names)
+
+
+def histogram_table(histograms: Mapping[str, Mapping[str, np.ndarray]]) -> "pa.Table":
+    """Long table of histogram bins: column (dictionary-encoded), bin_start, bin_end, count."""
+    names = [str(c) for c in histograms]
+    edges = [np.asarray(h["bin_edges"], dtype=np.float64) for h in histograms.values()]
+    counts = [np.asarray(h["counts"], dtype=np.int64) for h in histograms.values()]
+    lengths = np.array([len(c) for c in counts], dtype=np.int64)
+    column = pa.DictionaryArray.from_arrays(
+        pa.array(np.repeat(np.arange(len(names), dtype=np.int32), lengths)), pa.array(names, type=pa.string()))
+    empty = np.empty(0)
+    return pa.Table.from_arrays([
+        column,
+        pa.array(np.concatenate([e[:-1] for e in edges]) if edges else empty),
+        pa.array(np.concatenate([e[1:] for e in edges]) if edges else empty),
+        pa.array(np.concatenate(counts) if counts else np.empty(0, dtype=np.int64)),
+    ], names=["column", "bin_start", "bin_end", "count"])
+
+
+def profile_frame(profile: Mapping[str, Any]) -> pd.DataFrame:
+    """Per-column part of a ``DatasetProfile.to_dict()`` as a table."""
+    stats = profile.get("numeric_stats", {})
+    stat_keys = ["mean", "std", "min", "max", "q1", "median", "q3"]
+    rows = []
+    for col, dtype in profile.get("dtypes", {}).items():
+        row = {
+            "column": col,
+            "dtype": dtype,
+            "missing": profile.get("missing", {}).get(col),
+            "cardinality": profile.get("cardinality", {}).get(col),
+            "outliers": profile.get("outliers", {}).get(col),
+        }
+        col_stats = stats.get(col, {})
+        row.update((k, col_stats.get(k)) for k in stat_keys)
+        rows.append(row)
+    frame = pd.DataFrame(rows, columns=["column", "dtype", "missing", "cardinality", "outliers"] + stat_keys)
+    for k in stat_keys:
+        frame[k] = pd.to_numeric(frame[k], errors="coerce").astype("float64")
+    for k in ("missing", "cardinality", "outliers"):
+        frame[k] = frame[k].astype("Int64")
+    return frame
@@ -0,0 +1,388 @@
+"""
+Out-of-core, two-pass cleaning for CSV files larger than memory.
+
+Pass 1 reads the file in chunks (``iter_csv_chunks``) and collects what the
+stateful ops need: sums/counts for mean fills, value counts for mode fills,
+mergeable summaries for outlier bounds (``ApproxOutlierStats``), datetime formats and whether a
+"constant" column really is constant past the sample. Pass 2 re-reads the
+file, applies the resolved ops chunk by chunk and appends each cleaned chunk
+to a Parquet or CSV file, so memory stays bounded by the chunk size.
+
+Elementwise ops (whitespace, case, boolean text, percentages, type
+conversion) are chunk-independent and run through the same single-column
+DataCleaner stages as in-memory plans. Differences from in-memory cleaning:
+
+- fills use statistics over all rows seen in pass 1 (before duplicate and
+  outlier rows are dropped), and iqr/mad outlier bounds come from a quantile
+  sketch (~1% relative error)
+- modes of very high-cardinality columns are approximate (value counts are
+  pruned to the most frequent MODE_MAX_VALUES)
+
+Duplicate removal stays exact: pass 1 also fingerprints every raw row
+(``ChunkedDeduplicator``, spilling to disk over its budget) and pass 2 drops
+confirmed repeats before any other op, as the in-memory plan does.
+
+Usage: ``python -m utils.streaming_clean input.csv output.parquet``
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.cleaning_plan import COLUMN_OP_ORDER, PlanOp, run_column_stage
+from utils.datetime_parse import infer_datetime_format, parse_datetime_series
+from utils.dedup import ChunkedDeduplicator
+from utils.ingest import CSV_BLOCK_BYTES, iter_csv_chunks, sample_column_types
+from utils.outliers import OUTLIER_METHOD, ApproxOutlierStats, outlier_mask
+from utils.profile import get_profile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    _ARROW_AVAILABLE = True
+except ImportError:  # pragma: no cover - pyarrow is a hard dependency of the app
+    _ARROW_AVAILABLE = False
+
+OUTPUT_FORMATS = ("parquet", "csv")
+# Elementwise ops: same result whether applied per chunk or to the whole file
+STATELESS_OPS = {"whitespace", "text_case", "boolean_text", "percentage_string", "data_type"}
+MODE_MAX_VALUES = 100_000
+# Fall back to mixed-format parsing when more non-null values than this fail the inferred format
+DATETIME_MAX_FAILURE = 0.05
+DATETIME_SAMPLE = 1_000
+
+ProgressCallback = Callable[[float], None]
+
+
+@dataclass
+class _ColumnStats:
+    total: float = 0.0
+    count: int = 0
+    counts: Counter = field(default_factory=Counter)
+    spread: Optional[ApproxOutlierStats] = None
+    first: Any = None
+    constant: bool = True
+    dt_format: Optional[str] = None
+    dt_checked: int = 0
+    dt_failed: int = 0
+
+
+@dataclass
+class StreamCleanResult:
+    output: str
+    fmt: str
+    rows_in: int
+    rows_out: int
+    chunks: int
+    log: List[str]
+    skipped: Dict[str, str]  # suggestion key -> reason
+    seconds: float
+
+
+def suggest_from_sample(source: Any, block_bytes: int = CSV_BLOCK_BYTES) -> Dict[str, Dict[str, Any]]:
+    """Analyzer suggestions computed on the first chunk of ``source``."""
+    for chunk in iter_csv_chunks(source, block_bytes):
+        return get_profile(chunk, with_analyzer=True).suggestions_copy()
+    return {}
+
+
+class _ChunkWriter:
+    def __init__(self, path: str, fmt: str):
+        self.path = path
+        self.fmt = fmt
+        self._parquet = None
+        self._schema = None
+        self._wrote_header = False
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self.fmt == "csv":
+            chunk.to_csv(self.path, mode="a" if self._wrote_header else "w", header=not self._wrote_header, index=False)
+            self._wrote_header = True
+            return
+        if self._schema is None:
+            schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            # A column that is all-null in the first chunk would pin the file to the null type
+            self._schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in schema])
+            self._parquet = pq.ParquetWriter(self.path, self._schema, compression="snappy")
+        table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False, safe=False)
+        self._parquet.write_table(table)
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+        elif self.fmt == "parquet" and self._schema is None:
+            pq.write_table(pa.table({}), self.path)
+        elif self.fmt == "csv" and not self._wrote_header:
+            open(self.path, "w").close()
+
+
+def _widen_types(types: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: (pa.float64() if pa.types.is_integer(t) else t) for name, t in types.items()}
+
+
+def _numeric(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values
+    return pd.to_numeric(values, errors="coerce")
+
+
+class _Pipeline:
+    """Suggestions resolved into per-column op groups for chunked execution."""
+
+    def __init__(self, suggestions: Dict[str, Dict[str, Any]], columns: List[Any]):
+        self.stateless: Dict[Any, List[PlanOp]] = {}
+        self.datetime_cols: List[Any] = []
+        self.outlier_cols: List[Any] = []
+        self.fill_numeric: List[Any] = []
+        self.fill_categorical: List[Any] = []
+        self.drop_cols: List[Any] = []
+        self.skipped: Dict[str, str] = {}
+        self.dedup = False
+        targets = {
+            "datetime_parse": self.datetime_cols,
+            "outliers": self.outlier_cols,
+            "missing_numeric": self.fill_numeric,
+            "missing_categorical": self.fill_categorical,
+            "constant_column": self.drop_cols,
+        }
+        for key, suggestion in suggestions.items():
+            t = suggestion.get("type")
+            col = suggestion.get("column")
+            if t == "duplicates":
+                self.dedup = True
+            elif t == "compact":
+                self.skipped[key] = "dtype compaction applies to in-memory frames"
+            elif t == "near_duplicates":
+                self.skipped[key] = "near-duplicate clustering needs the whole table"
+            elif col not in columns:
+                self.skipped[key] = f"column '{col}' not found"
+            elif t in STATELESS_OPS:
+                params = {"target_type": suggestion.get("target_type", "numeric")} if t == "data_type" else {}
+                ops = self.stateless.setdefault(col, [])
+                if all(op.type != t for op in ops):
+                    ops.append(PlanOp(key, t, col, params))
+            elif t in targets:
+                if col not in targets[t]:
+                    targets[t].append(col)
+            else:
+                self.skipped[key] = f"unsupported operation '{t}'"
+        for ops in self.stateless.values():
+            ops.sort(key=lambda o: COLUMN_OP_ORDER.index(o.type))
+        self.stats_cols = set(self.outlier_cols) | set(self.fill_numeric) | set(self.fill_categorical) | set(self.drop_cols)
+
+    def transform(self, chunk: pd.DataFrame, col: Any) -> pd.Series:
+        ops = self.stateless.get(col)
+        return run_column_stage(col, chunk[col], ops, True).values if ops else chunk[col]
+
+
+def _collect(
+    pipeline: _Pipeline,
+    chunks: Iterator[pd.DataFrame],
+    stats: Dict[Any, _ColumnStats],
+    dedup: Optional[ChunkedDeduplicator],
+) -> tuple:
+    rows = n_chunks = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        n_chunks += 1
+        if dedup is not None:
+            dedup.observe(chunk)
+        for col in pipeline.stats_cols:
+            st = stats[col]
+            values = pipeline.transform(chunk, col)
+            if col in pipeline.fill_numeric:
+                num = _numeric(values)
+                st.total += float(num.sum())
+                st.count += int(num.count())
+            if col in pipeline.fill_categorical:
+                st.counts.update(values.value_counts(dropna=True).to_dict())
+                if len(st.counts) > MODE_MAX_VALUES:
+                    st.counts = Counter(dict(st.counts.most_common(MODE_MAX_VALUES // 2)))
+            if col in pipeline.outlier_cols:
+                st.spread.update(_numeric(values).to_numpy(dtype=np.float64, na_value=np.nan))
+            if col in pipeline.drop_cols and st.constant:
+                present = values.dropna()
+                if len(present):
+                    if st.first is None:
+                        st.first = present.iloc[0]
+                    st.constant = bool((present == st.first).all())
+        for col in pipeline.datetime_cols:
+            st = stats[col]
+            present = chunk[col].dropna()
+            if st.dt_format is None and len(present):
+                st.dt_format = infer_datetime_format(present)
+            if st.dt_format is not None and len(present):
+                parsed = parse_datetime_series(present.head(DATETIME_SAMPLE), format=st.dt_format)
+                st.dt_checked += parsed.n_values
+                st.dt_failed += parsed.n_failed
+    return rows, n_chunks
+
+
+def stream_clean(
+    source: Any,
+    output: str,
+    suggestions: Optional[Dict[str, Dict[str, Any]]] = None,
+    fmt: str = "parquet",
+    block_bytes: int = CSV_BLOCK_BYTES,
+    progress: Optional[ProgressCallback] = None,
+) -> StreamCleanResult:
+    """Clean the CSV ``source`` (path or seekable file) into ``output`` in two passes.
+
+    ``suggestions`` defaults to the analyzer's suggestions for the first chunk.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format '{fmt}'; choose from {OUTPUT_FORMATS}")
+    if not _ARROW_AVAILABLE:
+        raise RuntimeError("Streaming cleaning requires pyarrow")
+    started = time.perf_counter()
+    start_pos = None if isinstance(source, (str, bytes, os.PathLike)) else source.tell()
+
+    def rewind() -> None:
+        if start_pos is not None:
+            source.seek(start_pos)
+
+    def chunks(types: Dict[str, Any], lo: float) -> Iterator[pd.DataFrame]:
+        rewind()
+        report = (lambda f: progress(lo + f / 2)) if progress is not None else None
+        return iter_csv_chunks(source, block_bytes, report, column_types=types)
+
+    column_types = sample_column_types(source)
+    rewind()
+    if suggestions is None:
+        suggestions = suggest_from_sample(source, block_bytes)
+
+    # Pass 1: statistics. Types come from the head of the file; when a later
+    # block does not fit them, retry with integers widened, then as text.
+    attempts = [column_types, _widen_types(column_types), None]
+    dedup: Optional[ChunkedDeduplicator] = None
+    for i, types in enumerate(attempts):
+        names: List[Any] = []
+        try:
+            first = next(iter(chunks(types or {}, 0.0)), None)
+            names = list(first.columns) if first is not None else []
+            if types is None:
+                types = {name: pa.string() for name in names}
+            pipeline = _Pipeline(suggestions, names)
+            stats = {col: _ColumnStats(spread=ApproxOutlierStats() if col in pipeline.outlier_cols else None)
+                     for col in pipeline.stats_cols | set(pipeline.datetime_cols)}
+            dedup = ChunkedDeduplicator() if pipeline.dedup else None
+            rows_in, n_chunks = _collect(pipeline, chunks(types, 0.0), stats, dedup)
+            column_types = types
+            break
+        except pa.ArrowInvalid:
+            if dedup is not None:
+                dedup.close()
+            if i == len(attempts) - 1:
+                raise
+
+    # Resolve statistics into concrete parameters
+    log: List[str] = []
+    means: Dict[Any, float] = {}
+    modes: Dict[Any, Any] = {}
+    bounds: Dict[Any, tuple] = {}
+    formats: Dict[Any, str] = {}
+    for col in pipeline.fill_numeric:
+        if stats[col].count:
+            means[col] = stats[col].total / stats[col].count
+    for col in pipeline.fill_categorical:
+        if stats[col].counts:
+            modes[col] = stats[col].counts.most_common(1)[0][0]
+    for col in pipeline.outlier_cols:
+        if stats[col].spread.count:
+            bounds[str(col)] = stats[col].spread.bounds(OUTLIER_METHOD)
+    for col in pipeline.datetime_cols:
+        st = stats[col]
+        if st.dt_format is None or st.dt_failed > DATETIME_MAX_FAILURE * max(st.dt_checked, 1):
+            formats[col] = "mixed"
+        else:
+            formats[col] = st.dt_format
+    drop_cols = [col for col in pipeline.drop_cols if stats[col].constant]
+    for col in pipeline.drop_cols:
+        if col not in drop_cols:
+            log.append(f"Kept '{col}': not constant beyond the sample")
+
+    # Pass 2: apply and write
+    filled: Counter = Counter()
+    outliers: Counter = Counter()
+    outlier_rows = 0
+    unparsed: Counter = Counter()
+    rows_out = 0
+    writer = _ChunkWriter(output, fmt)
+    try:
+        for chunk in chunks(column_types, 0.5):
+            if dedup is not None:
+                chunk = dedup.filter(chunk)
+            for col in pipeline.stateless:
+                chunk[col] = pipeline.transform(chunk, col)
+            for col, dt_format in formats.items():
+                parsed = parse_datetime_series(chunk[col], format=dt_format)
+                chunk[col] = parsed.values
+                unparsed[col] += parsed.n_failed
+            if bounds:
+                flagged, counts = outlier_mask(chunk, bounds)
+                outliers.update(counts)
+                outlier_rows += int(flagged.sum())
+                if flagged.any():
+                    chunk = chunk[~flagged]
+            for col, value in list(means.items()) + list(modes.items()):
+                missing = int(chunk[col].isna().sum())
+                if missing:
+                    chunk[col] = chunk[col].fillna(value)
+                    filled[col] += missing
+            if drop_cols:
+                chunk = chunk.drop(columns=drop_cols)
+            rows_out += len(chunk)
+            writer.write(chunk)
+    finally:
+        writer.close()
+        if dedup is not None:
+            dedup.close()
+
+    if dedup is not None:
+        log.append(f"Removed {dedup.removed} duplicate rows")
+    for col, ops in pipeline.stateless.items():
+        log.append(f"Applied {', '.join(op.type for op in ops)} to '{col}'")
+    for col, dt_format in formats.items():
+        log.append(f"Parsed '{col}' as datetime ({dt_format}; {unparsed[col]} unparseable values)")
+    if bounds:
+        log.append(f"Removed {outlier_rows} outlier rows ({OUTLIER_METHOD})")
+    for col, (lo, hi) in bounds.items():
+        log.append(f"- '{col}': {outliers[col]} values outside [{lo:.4g}, {hi:.4g}]")
+    for col, value in means.items():
+        log.append(f"Filled {filled[col]} missing values in '{col}' with mean ({value:.4g})")
+    for col, value in modes.items():
+        log.append(f"Filled {filled[col]} missing values in '{col}' with mode ({value})")
+    if drop_cols:
+        log.append(f"Removed constant columns {drop_cols}")
+    if progress is not None:
+        progress(1.0)
+    return StreamCleanResult(output, fmt, rows_in, rows_out, n_chunks, log, pipeline.skipped,
+                             time.perf_counter() - started)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Clean a large CSV in two streaming passes")
+    parser.add_argument("source", help="input CSV path")
+    parser.add_argument("output", help="output file path")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, help="output format (default: from the output extension)")
+    parser.add_argument("--block-mb", type=float, default=CSV_BLOCK_BYTES / (1024 * 1024), help="chunk size in MB")
+    args = parser.parse_args(argv)
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "parquet")
+    result = stream_clean(args.source, args.output, fmt=fmt, block_bytes=int(args.block_mb * 1024 * 1024))
+    print(f"{result.rows_in:,} rows in, {result.rows_out:,} rows out ({result.chunks} chunks, {result.seconds:.1f}s)")
+    for entry in result.log:
+        print(f"- {entry}")
+    for key, reason in result.skipped.items():
+        print(f"- skipped {key}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+String cleaning on distinct values.
+
+Text columns such as status, region or yes/no flags repeat a handful of
+values across millions of rows. ``map_unique`` factorizes a column once,
+runs a string transform on the distinct values only and broadcasts the
+result back through the integer codes (``broadcast_codes``), so cost scales
+with cardinality instead of row count. The cleaning plan runs its fused
+whitespace/case/boolean/percentage stages this way (the DataCleaner ops
+applied to the distinct values), ``utils.near_dedup`` normalises with it, and
+``boolean_mapping`` is the true/false token check ``utils.compaction`` uses,
+which looks at distinct values only. ``bench_text_ops.py`` at the repository
+root measures per-row vs distinct-value execution on low- and
+high-cardinality columns.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+TRUE_TOKENS = frozenset({"true", "yes", "y", "t", "1"})
+FALSE_TOKENS = frozenset({"false", "no", "n", "f", "0"})
+# Distinct spellings a boolean column may plausibly carry ("Yes", "yes ", "YES", ...)
+MAX_BOOLEAN_VARIANTS = 32
+
+
+def map_unique(
+    values: pd.Series,
+    func: Callable[[pd.Series], pd.Series],
+    include_na: bool = False,
+) -> pd.Series:
+    """Apply ``func`` to the distinct values of ``values`` and broadcast back.
+
+    ``func`` receives a Series of distinct values and must return a Series of
+    the same length and order. Missing values stay missing unless
+    ``include_na`` passes them to ``func`` as one more distinct value.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=not include_na)
+    return broadcast_codes(func(pd.Series(uniques, name=values.name)), codes, values)
+
+
+def broadcast_codes(mapped: pd.Series, codes: np.ndarray, like: pd.Series) -> pd.Series:
+    """Expand per-distinct-value results to rows of ``like`` (``codes`` from ``pd.factorize``)."""
+    mapped = mapped.reset_index(drop=True)
+    # The -1 codes of missing values fall outside the RangeIndex and come back missing
+    out = mapped.reindex(codes) if (codes < 0).any() else mapped.iloc[codes]
+    out.index = like.index
+    out.name = like.name
+    return out
+
+
+def _distinct_text(values: pd.Series) -> pd.Index:
+    """Distinct non-missing values, as text."""
+    return pd.Index(pd.unique(values.dropna())).astype(str)
+
+
+def boolean_mapping(values: pd.Series) -> Optional[Dict[str, bool]]:
+    """``{distinct value: bool}`` when every value is a true/false token, else None."""
+    uniques = _distinct_text(values)
+    if len(uniques) == 0 or len(uniques) > MAX_BOOLEAN_VARIANTS:
+        return None
+    mapping = {}
+    for value in uniques:
+        token = value.strip().lower()
+        if token in TRUE_TOKENS:
+            mapping[value] = True
+        elif token in FALSE_TOKENS:
+            mapping[value] = False
+        else:
+            return None
+    return mapping
+